@@ -0,0 +1,27 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+schema = """
+CREATE TABLE IF NOT EXISTS api_tokens (
+    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id              INTEGER NOT NULL,     -- vendedor por omisión de lo que se cargue
+    nombre                  TEXT NOT NULL,        -- quién lo usa (ej. "ERP")
+    token_hash              TEXT NOT NULL UNIQUE, -- sha256 del token; el token no se guarda
+    activo                  INTEGER NOT NULL DEFAULT 1,
+    creado_en               DATETIME DEFAULT CURRENT_TIMESTAMP,
+    ultimo_uso              DATETIME,
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+);
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+    conn.commit()
+    conn.close()
+    print("Tabla api_tokens creada/actualizada correctamente.")
+
+if __name__ == "__main__":
+    main()
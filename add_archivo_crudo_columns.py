@@ -0,0 +1,29 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+# (tabla, columna, tipo)
+COLUMNAS = [
+    ("archivos_movimientos", "archivo_crudo", "TEXT"),
+    ("pagos_detectados", "archivo_id", "INTEGER"),
+]
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    # Intentamos agregar cada columna. Si ya existe, ignoramos el error.
+    for tabla, nombre, tipo in COLUMNAS:
+        try:
+            cur.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo};")
+            print(f"Columna {nombre} agregada a {tabla}.")
+        except Exception as e:
+            print("Posiblemente la columna ya existe:", e)
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pagos_detectados_archivo ON pagos_detectados(archivo_id);")
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
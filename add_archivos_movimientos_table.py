@@ -0,0 +1,28 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+schema = """
+CREATE TABLE IF NOT EXISTS archivos_movimientos (
+    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre_archivo          TEXT NOT NULL,
+    hash_contenido          TEXT UNIQUE,
+    banco                   TEXT NOT NULL,
+    cuenta_bancaria_id      INTEGER,
+    nuevos                  INTEGER NOT NULL DEFAULT 0,
+    duplicados              INTEGER NOT NULL DEFAULT 0,
+    importado_en            DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cuenta_bancaria_id) REFERENCES cuentas_bancarias(id)
+);
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+    conn.commit()
+    conn.close()
+    print("Tabla archivos_movimientos creada/actualizada correctamente.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+# Índices de texto completo del buscador (modules/busqueda.py) y triggers que los
+# mantienen al día. El UPDATE solo toca el índice cuando cambian las columnas indexadas,
+# no con cada cambio de estado de conciliación.
+schema = """
+CREATE VIRTUAL TABLE IF NOT EXISTS pagos_fts USING fts5(
+    referencia, referencia_ampliada, concepto,
+    content='pagos_detectados', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS ventas_fts USING fts5(
+    folio, cliente_nombre,
+    content='ventas', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS pagos_fts_ai AFTER INSERT ON pagos_detectados BEGIN
+    INSERT INTO pagos_fts (rowid, referencia, referencia_ampliada, concepto)
+    VALUES (new.id, new.referencia, new.referencia_ampliada, new.concepto);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pagos_fts_ad AFTER DELETE ON pagos_detectados BEGIN
+    INSERT INTO pagos_fts (pagos_fts, rowid, referencia, referencia_ampliada, concepto)
+    VALUES ('delete', old.id, old.referencia, old.referencia_ampliada, old.concepto);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pagos_fts_au AFTER UPDATE OF referencia, referencia_ampliada, concepto ON pagos_detectados BEGIN
+    INSERT INTO pagos_fts (pagos_fts, rowid, referencia, referencia_ampliada, concepto)
+    VALUES ('delete', old.id, old.referencia, old.referencia_ampliada, old.concepto);
+    INSERT INTO pagos_fts (rowid, referencia, referencia_ampliada, concepto)
+    VALUES (new.id, new.referencia, new.referencia_ampliada, new.concepto);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ventas_fts_ai AFTER INSERT ON ventas BEGIN
+    INSERT INTO ventas_fts (rowid, folio, cliente_nombre)
+    VALUES (new.id, new.folio, new.cliente_nombre);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ventas_fts_ad AFTER DELETE ON ventas BEGIN
+    INSERT INTO ventas_fts (ventas_fts, rowid, folio, cliente_nombre)
+    VALUES ('delete', old.id, old.folio, old.cliente_nombre);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ventas_fts_au AFTER UPDATE OF folio, cliente_nombre ON ventas BEGIN
+    INSERT INTO ventas_fts (ventas_fts, rowid, folio, cliente_nombre)
+    VALUES ('delete', old.id, old.folio, old.cliente_nombre);
+    INSERT INTO ventas_fts (rowid, folio, cliente_nombre)
+    VALUES (new.id, new.folio, new.cliente_nombre);
+END;
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+
+    # Indexa lo que ya había (también repara el índice si quedó desfasado)
+    cur.execute("INSERT INTO pagos_fts (pagos_fts) VALUES ('rebuild');")
+    cur.execute("INSERT INTO ventas_fts (ventas_fts) VALUES ('rebuild');")
+
+    conn.commit()
+    conn.close()
+    print("Índices de búsqueda pagos_fts y ventas_fts creados/actualizados correctamente.")
+
+if __name__ == "__main__":
+    main()
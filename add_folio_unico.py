@@ -0,0 +1,40 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+schema = """
+CREATE TABLE IF NOT EXISTS secuencias_folio (
+    prefijo                 TEXT PRIMARY KEY,
+    ultimo                  INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+
+    # El índice único no se puede crear si ya hay folios repetidos: se listan para corregirlos
+    cur.execute(
+        """
+        SELECT folio, COUNT(*), GROUP_CONCAT(id)
+        FROM ventas
+        GROUP BY folio
+        HAVING COUNT(*) > 1
+        """
+    )
+    repetidos = cur.fetchall()
+    if repetidos:
+        print("No se creó el índice único de folio. Folios repetidos (folio, veces, ids de venta):")
+        for folio, veces, ids in repetidos:
+            print(f"  {folio}: {veces} ({ids})")
+        print("Corrige esos folios y vuelve a correr este script.")
+    else:
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ventas_folio ON ventas(folio);")
+        print("Tabla secuencias_folio e índice único de ventas.folio creados/actualizados correctamente.")
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+# Índices de las consultas frecuentes (ver verificar_planes.py; los del listado de pagos
+# están en add_pagos_detectados_indices.py):
+#   pagos por cuenta (marcas de agua, verificación de saldos, última actualización),
+#   filtro por monto del listado, cierre diario por fecha de venta, "Mis ventas" y
+#   candidatos de conciliación por cuenta + monto
+schema = """
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_cuenta_fecha ON pagos_detectados(cuenta_bancaria_id, fecha_operacion);
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_monto ON pagos_detectados(monto);
+CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha_creacion);
+CREATE INDEX IF NOT EXISTS idx_ventas_vendedor_fecha ON ventas(vendedor_id, fecha_creacion);
+CREATE INDEX IF NOT EXISTS idx_ventas_cuenta_monto ON ventas(cuenta_bancaria_id, monto);
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+    # Estadísticas para que el planificador elija bien entre índices
+    cur.execute("ANALYZE;")
+    conn.commit()
+    conn.close()
+    print("Índices de consultas creados/actualizados correctamente.")
+
+if __name__ == "__main__":
+    main()
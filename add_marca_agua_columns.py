@@ -0,0 +1,27 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+COLUMNAS = [
+    ("ultima_fecha_importada", "DATE"),
+    ("ultimo_saldo_importado", "REAL"),
+    ("ultima_posicion_importada", "INTEGER"),
+]
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    # Intentamos agregar cada columna. Si ya existe, ignoramos el error.
+    for nombre, tipo in COLUMNAS:
+        try:
+            cur.execute(f"ALTER TABLE cuentas_bancarias ADD COLUMN {nombre} {tipo};")
+            print(f"Columna {nombre} agregada a cuentas_bancarias.")
+        except Exception as e:
+            print("Posiblemente la columna ya existe:", e)
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
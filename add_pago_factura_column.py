@@ -0,0 +1,27 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+# (tabla, columna, tipo)
+# Requiere la tabla facturas (add_facturas_table.py y add_facturas_uuid_column.py)
+COLUMNAS = [
+    ("pagos_detectados", "factura_id", "INTEGER"),
+]
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    # Intentamos agregar cada columna. Si ya existe, ignoramos el error.
+    for tabla, nombre, tipo in COLUMNAS:
+        try:
+            cur.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo};")
+            print(f"Columna {nombre} agregada a {tabla}.")
+        except Exception as e:
+            print("Posiblemente la columna ya existe:", e)
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
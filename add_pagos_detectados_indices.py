@@ -0,0 +1,22 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+# Índices para el listado de pagos detectados (paginación por fecha_operacion, id, sin
+# filtro, por estado o por banco)
+schema = """
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_fecha ON pagos_detectados(fecha_operacion, id);
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_estado_fecha ON pagos_detectados(estado_conciliacion, fecha_operacion, id);
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_banco_fecha ON pagos_detectados(banco, fecha_operacion, id);
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+    conn.commit()
+    conn.close()
+    print("Índices de pagos_detectados creados/actualizados correctamente.")
+
+if __name__ == "__main__":
+    main()
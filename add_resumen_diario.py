@@ -0,0 +1,157 @@
+import sqlite3
+
+from modules.resumen_diario import reconstruir_resumen
+
+DB_PATH = "azyco_pagos.db"
+
+# Resumen por día y cuenta del cierre diario (modules/resumen_diario.py) y triggers que lo
+# mantienen al día: cada INSERT / DELETE suma o resta la fila en su (fecha, cuenta), y un
+# UPDATE de las columnas que cuentan resta la versión vieja y suma la nueva.
+schema = """
+CREATE TABLE IF NOT EXISTS resumen_diario (
+    fecha                   TEXT NOT NULL,                -- YYYY-MM-DD
+    cuenta_bancaria_id      INTEGER NOT NULL,             -- 0: pagos sin cuenta identificada
+    ventas                  INTEGER NOT NULL DEFAULT 0,
+    monto_ventas            REAL NOT NULL DEFAULT 0,
+    ventas_pagadas          INTEGER NOT NULL DEFAULT 0,
+    ventas_pendientes       INTEGER NOT NULL DEFAULT 0,
+    pagos                   INTEGER NOT NULL DEFAULT 0,
+    monto_pagos             REAL NOT NULL DEFAULT 0,
+    pagos_con_venta         INTEGER NOT NULL DEFAULT 0,
+    monto_pagos_con_venta   REAL NOT NULL DEFAULT 0,
+    pagos_sin_venta         INTEGER NOT NULL DEFAULT 0,
+    monto_pagos_sin_venta   REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, cuenta_bancaria_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS resumen_ventas_ai AFTER INSERT ON ventas BEGIN
+    INSERT INTO resumen_diario (fecha, cuenta_bancaria_id, ventas, monto_ventas, ventas_pagadas, ventas_pendientes)
+    SELECT date(new.fecha_creacion), new.cuenta_bancaria_id, 1, new.monto,
+           new.estado_banco = 'PAGADO', new.estado_banco != 'PAGADO'
+    WHERE date(new.fecha_creacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        ventas = ventas + excluded.ventas,
+        monto_ventas = monto_ventas + excluded.monto_ventas,
+        ventas_pagadas = ventas_pagadas + excluded.ventas_pagadas,
+        ventas_pendientes = ventas_pendientes + excluded.ventas_pendientes;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumen_ventas_ad AFTER DELETE ON ventas BEGIN
+    INSERT INTO resumen_diario (fecha, cuenta_bancaria_id, ventas, monto_ventas, ventas_pagadas, ventas_pendientes)
+    SELECT date(old.fecha_creacion), old.cuenta_bancaria_id, -1, -old.monto,
+           -(old.estado_banco = 'PAGADO'), -(old.estado_banco != 'PAGADO')
+    WHERE date(old.fecha_creacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        ventas = ventas + excluded.ventas,
+        monto_ventas = monto_ventas + excluded.monto_ventas,
+        ventas_pagadas = ventas_pagadas + excluded.ventas_pagadas,
+        ventas_pendientes = ventas_pendientes + excluded.ventas_pendientes;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumen_ventas_au
+AFTER UPDATE OF fecha_creacion, cuenta_bancaria_id, monto, estado_banco ON ventas BEGIN
+    INSERT INTO resumen_diario (fecha, cuenta_bancaria_id, ventas, monto_ventas, ventas_pagadas, ventas_pendientes)
+    SELECT date(old.fecha_creacion), old.cuenta_bancaria_id, -1, -old.monto,
+           -(old.estado_banco = 'PAGADO'), -(old.estado_banco != 'PAGADO')
+    WHERE date(old.fecha_creacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        ventas = ventas + excluded.ventas,
+        monto_ventas = monto_ventas + excluded.monto_ventas,
+        ventas_pagadas = ventas_pagadas + excluded.ventas_pagadas,
+        ventas_pendientes = ventas_pendientes + excluded.ventas_pendientes;
+    INSERT INTO resumen_diario (fecha, cuenta_bancaria_id, ventas, monto_ventas, ventas_pagadas, ventas_pendientes)
+    SELECT date(new.fecha_creacion), new.cuenta_bancaria_id, 1, new.monto,
+           new.estado_banco = 'PAGADO', new.estado_banco != 'PAGADO'
+    WHERE date(new.fecha_creacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        ventas = ventas + excluded.ventas,
+        monto_ventas = monto_ventas + excluded.monto_ventas,
+        ventas_pagadas = ventas_pagadas + excluded.ventas_pagadas,
+        ventas_pendientes = ventas_pendientes + excluded.ventas_pendientes;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumen_pagos_ai AFTER INSERT ON pagos_detectados BEGIN
+    INSERT INTO resumen_diario (
+        fecha, cuenta_bancaria_id, pagos, monto_pagos,
+        pagos_con_venta, monto_pagos_con_venta, pagos_sin_venta, monto_pagos_sin_venta
+    )
+    SELECT date(new.fecha_operacion), COALESCE(new.cuenta_bancaria_id, 0), 1, new.monto,
+           new.venta_id IS NOT NULL, CASE WHEN new.venta_id IS NOT NULL THEN new.monto ELSE 0 END,
+           new.venta_id IS NULL, CASE WHEN new.venta_id IS NULL THEN new.monto ELSE 0 END
+    WHERE date(new.fecha_operacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        pagos = pagos + excluded.pagos,
+        monto_pagos = monto_pagos + excluded.monto_pagos,
+        pagos_con_venta = pagos_con_venta + excluded.pagos_con_venta,
+        monto_pagos_con_venta = monto_pagos_con_venta + excluded.monto_pagos_con_venta,
+        pagos_sin_venta = pagos_sin_venta + excluded.pagos_sin_venta,
+        monto_pagos_sin_venta = monto_pagos_sin_venta + excluded.monto_pagos_sin_venta;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumen_pagos_ad AFTER DELETE ON pagos_detectados BEGIN
+    INSERT INTO resumen_diario (
+        fecha, cuenta_bancaria_id, pagos, monto_pagos,
+        pagos_con_venta, monto_pagos_con_venta, pagos_sin_venta, monto_pagos_sin_venta
+    )
+    SELECT date(old.fecha_operacion), COALESCE(old.cuenta_bancaria_id, 0), -1, -old.monto,
+           -(old.venta_id IS NOT NULL), CASE WHEN old.venta_id IS NOT NULL THEN -old.monto ELSE 0 END,
+           -(old.venta_id IS NULL), CASE WHEN old.venta_id IS NULL THEN -old.monto ELSE 0 END
+    WHERE date(old.fecha_operacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        pagos = pagos + excluded.pagos,
+        monto_pagos = monto_pagos + excluded.monto_pagos,
+        pagos_con_venta = pagos_con_venta + excluded.pagos_con_venta,
+        monto_pagos_con_venta = monto_pagos_con_venta + excluded.monto_pagos_con_venta,
+        pagos_sin_venta = pagos_sin_venta + excluded.pagos_sin_venta,
+        monto_pagos_sin_venta = monto_pagos_sin_venta + excluded.monto_pagos_sin_venta;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumen_pagos_au
+AFTER UPDATE OF fecha_operacion, cuenta_bancaria_id, monto, venta_id ON pagos_detectados BEGIN
+    INSERT INTO resumen_diario (
+        fecha, cuenta_bancaria_id, pagos, monto_pagos,
+        pagos_con_venta, monto_pagos_con_venta, pagos_sin_venta, monto_pagos_sin_venta
+    )
+    SELECT date(old.fecha_operacion), COALESCE(old.cuenta_bancaria_id, 0), -1, -old.monto,
+           -(old.venta_id IS NOT NULL), CASE WHEN old.venta_id IS NOT NULL THEN -old.monto ELSE 0 END,
+           -(old.venta_id IS NULL), CASE WHEN old.venta_id IS NULL THEN -old.monto ELSE 0 END
+    WHERE date(old.fecha_operacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        pagos = pagos + excluded.pagos,
+        monto_pagos = monto_pagos + excluded.monto_pagos,
+        pagos_con_venta = pagos_con_venta + excluded.pagos_con_venta,
+        monto_pagos_con_venta = monto_pagos_con_venta + excluded.monto_pagos_con_venta,
+        pagos_sin_venta = pagos_sin_venta + excluded.pagos_sin_venta,
+        monto_pagos_sin_venta = monto_pagos_sin_venta + excluded.monto_pagos_sin_venta;
+    INSERT INTO resumen_diario (
+        fecha, cuenta_bancaria_id, pagos, monto_pagos,
+        pagos_con_venta, monto_pagos_con_venta, pagos_sin_venta, monto_pagos_sin_venta
+    )
+    SELECT date(new.fecha_operacion), COALESCE(new.cuenta_bancaria_id, 0), 1, new.monto,
+           new.venta_id IS NOT NULL, CASE WHEN new.venta_id IS NOT NULL THEN new.monto ELSE 0 END,
+           new.venta_id IS NULL, CASE WHEN new.venta_id IS NULL THEN new.monto ELSE 0 END
+    WHERE date(new.fecha_operacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        pagos = pagos + excluded.pagos,
+        monto_pagos = monto_pagos + excluded.monto_pagos,
+        pagos_con_venta = pagos_con_venta + excluded.pagos_con_venta,
+        monto_pagos_con_venta = monto_pagos_con_venta + excluded.monto_pagos_con_venta,
+        pagos_sin_venta = pagos_sin_venta + excluded.pagos_sin_venta,
+        monto_pagos_sin_venta = monto_pagos_sin_venta + excluded.monto_pagos_sin_venta;
+END;
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+
+    # Carga lo que ya había (también repara el resumen si quedó desfasado)
+    reconstruir_resumen(conn)
+
+    conn.commit()
+    conn.close()
+    print("Tabla resumen_diario creada/actualizada correctamente.")
+
+if __name__ == "__main__":
+    main()
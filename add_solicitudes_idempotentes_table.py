@@ -0,0 +1,31 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+schema = """
+CREATE TABLE IF NOT EXISTS solicitudes_idempotentes (
+    usuario_id              INTEGER NOT NULL,
+    ruta                    TEXT NOT NULL,
+    clave                   TEXT NOT NULL,
+    estado                  TEXT NOT NULL CHECK (estado IN ('EN_PROCESO', 'LISTO')) DEFAULT 'EN_PROCESO',
+    status                  INTEGER,              -- respuesta original (cuando está LISTO)
+    mimetype                TEXT,
+    location                TEXT,                 -- destino si fue redirect
+    cuerpo                  BLOB,
+    creado_en               DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (usuario_id, ruta, clave)
+);
+
+CREATE INDEX IF NOT EXISTS idx_solicitudes_idempotentes_creado ON solicitudes_idempotentes(creado_en);
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+    conn.commit()
+    conn.close()
+    print("Tabla solicitudes_idempotentes creada/actualizada correctamente.")
+
+if __name__ == "__main__":
+    main()
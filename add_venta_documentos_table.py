@@ -0,0 +1,47 @@
+import sqlite3
+
+from modules.venta_rapida import guardar_documentos, parsear_detalle_nota
+
+DB_PATH = "azyco_pagos.db"
+
+schema = """
+CREATE TABLE IF NOT EXISTS venta_documentos (
+    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    venta_id                INTEGER NOT NULL,
+    documento               TEXT NOT NULL,
+    neto_editado            REAL NOT NULL,
+    neto_original           REAL NOT NULL,
+    FOREIGN KEY (venta_id) REFERENCES ventas(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_venta_documentos_venta ON venta_documentos(venta_id);
+CREATE INDEX IF NOT EXISTS idx_venta_documentos_documento ON venta_documentos(documento);
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+
+    # Backfill: ventas rápidas que todavía no tienen documentos, a partir de su nota
+    cur.execute(
+        """
+        SELECT v.id, v.nota
+        FROM ventas v
+        WHERE v.nota LIKE '%Venta rápida%'
+          AND NOT EXISTS (SELECT 1 FROM venta_documentos d WHERE d.venta_id = v.id)
+        """
+    )
+    documentos = [
+        (venta_id, d)
+        for venta_id, nota in cur.fetchall()
+        for d in parsear_detalle_nota(nota)
+    ]
+    guardar_documentos(conn, documentos)
+
+    conn.commit()
+    conn.close()
+    print(f"Tabla venta_documentos creada/actualizada. Documentos recuperados de notas: {len(documentos)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+# (tabla, columna, tipo)
+COLUMNAS = [
+    ("venta_rapida_facturas", "neto_editado", "REAL"),
+    ("venta_rapida_facturas", "seleccionada", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    # Intentamos agregar cada columna. Si ya existe, ignoramos el error.
+    for tabla, nombre, tipo in COLUMNAS:
+        try:
+            cur.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo};")
+            print(f"Columna {nombre} agregada a {tabla}.")
+        except Exception as e:
+            print("Posiblemente la columna ya existe:", e)
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_venta_rapida_facturas_neto ON venta_rapida_facturas(token, neto);")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_venta_rapida_facturas_sel ON venta_rapida_facturas(token) WHERE seleccionada = 1;"
+    )
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
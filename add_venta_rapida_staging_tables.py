@@ -0,0 +1,35 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+schema = """
+CREATE TABLE IF NOT EXISTS venta_rapida_cargas (
+    token                   TEXT PRIMARY KEY,
+    usuario_id              INTEGER NOT NULL,
+    creado_en               DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+);
+
+CREATE TABLE IF NOT EXISTS venta_rapida_facturas (
+    token                   TEXT NOT NULL,
+    idx                     INTEGER NOT NULL,  -- posición en el reporte
+    cliente                 TEXT NOT NULL,
+    documento               TEXT NOT NULL,
+    neto                    REAL NOT NULL,
+    PRIMARY KEY (token, idx),
+    FOREIGN KEY (token) REFERENCES venta_rapida_cargas(token)
+);
+
+CREATE INDEX IF NOT EXISTS idx_venta_rapida_cargas_creado ON venta_rapida_cargas(creado_en);
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+    conn.commit()
+    conn.close()
+    print("Tablas venta_rapida_cargas y venta_rapida_facturas creadas/actualizadas correctamente.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import sqlite3
+
+DB_PATH = "azyco_pagos.db"
+
+schema = """
+CREATE TABLE IF NOT EXISTS salud_cuentas (
+    cuenta_bancaria_id      INTEGER PRIMARY KEY,
+    estado                  TEXT NOT NULL CHECK (estado IN ('OK', 'HUECOS', 'SIN_SALDO')),
+    movimientos             INTEGER NOT NULL DEFAULT 0,
+    huecos                  INTEGER NOT NULL DEFAULT 0,
+    monto_faltante          REAL NOT NULL DEFAULT 0,
+    verificado_en           DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cuenta_bancaria_id) REFERENCES cuentas_bancarias(id)
+);
+
+CREATE TABLE IF NOT EXISTS huecos_saldo (
+    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    cuenta_bancaria_id      INTEGER NOT NULL,
+    desde_fecha             DATE,
+    hasta_fecha             DATE,
+    pago_anterior_id        INTEGER,
+    pago_siguiente_id       INTEGER,
+    monto_faltante          REAL NOT NULL,
+    FOREIGN KEY (cuenta_bancaria_id) REFERENCES cuentas_bancarias(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_huecos_saldo_cuenta ON huecos_saldo(cuenta_bancaria_id);
+"""
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.executescript(schema)
+    conn.commit()
+    conn.close()
+    print("Tablas salud_cuentas y huecos_saldo creadas/actualizadas correctamente.")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,67 @@
-from flask import Flask, render_template, request, redirect, url_for, session, g
-from flask import Response
+from flask import Flask, render_template, request, redirect, url_for, session, g, jsonify, make_response
+from flask import Response, stream_with_context
 import sqlite3
 from werkzeug.security import check_password_hash
 from functools import wraps
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import pandas as pd
 import hashlib
+import json
 import numpy as np
 from modules.conciliacion import run_conciliacion
+from modules.verificacion_saldos import verificar_saldos
+from modules.busqueda import buscar_pagos, buscar_ventas
+from modules.consultas import (
+    CURSOR_ANTES,
+    CURSOR_DESPUES,
+    SQL_CANDIDATOS_PAGO,
+    SQL_CORTE_DIA,
+    SQL_MIS_VENTAS,
+    SQL_PAGOS_DIA,
+    SQL_ULTIMA_ACTUALIZACION_CUENTA,
+    SQL_VENTAS_PENDIENTES_DIA,
+    filtros_pagos,
+    sql_conteo_pagos,
+    sql_listado_pagos,
+)
+from modules.resumen_diario import resumen_dia, tendencia
+from modules.api_tokens import usuario_de_token
+from modules.idempotencia import (
+    MAX_LARGO_CLAVE,
+    esperar_resultado,
+    guardar_respuesta,
+    liberar_clave,
+    nueva_clave,
+    reservar_clave,
+)
+from modules.ingesta_ventas import ingerir_ventas, leer_registros
+from modules.antiguedad import facturas_antiguedad
+from modules.importacion import (
+    ArchivoInvalido,
+    cargar_marcas,
+    guardar_lote,
+    hash_contenido,
+    olfatear_archivo,
+    parsear_archivo,
+    validar_cuenta,
+)
+from modules.venta_rapida import (
+    carga_de_usuario,
+    crear_ventas_rapidas,
+    descartar_staging,
+    documentos_venta,
+    facturas_seleccionadas,
+    guardar_staging,
+    marcar_facturas,
+    marcar_filtradas,
+    pagina_facturas,
+    resumen_seleccion,
+)
 import os
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from flask import send_from_directory
+from io import BytesIO, TextIOWrapper
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 COMPROBANTES_FOLDER = os.path.join(BASE_DIR, "uploads", "comprobantes")
@@ -31,6 +81,9 @@ DB_PATH = "azyco_pagos.db"
 app = Flask(__name__)
 app.secret_key = "cambia_esto_por_algo_mas_seguro"  # cambia en producción
 
+# Campo oculto idempotency_key de los formularios (ver idempotente)
+app.jinja_env.globals["clave_idempotencia"] = nueva_clave
+
 def get_db():
     if "db" not in g:
         g.db = sqlite3.connect(DB_PATH)
@@ -76,6 +129,74 @@ def roles_required(*roles):
     return decorator
 
 
+def api_token_required(view_func):
+    """Para /api/...: token en "Authorization: Bearer <token>" (ver crear_token_api.py)."""
+    @wraps(view_func)
+    def wrapped_view(**kwargs):
+        encabezado = request.headers.get("Authorization", "")
+        token = encabezado[7:].strip() if encabezado.startswith("Bearer ") else ""
+        usuario_id = usuario_de_token(get_db(), token)
+        if usuario_id is None:
+            return jsonify({"error": "Token inválido o inactivo."}), 401
+        g.api_usuario_id = usuario_id
+        return view_func(**kwargs)
+    return wrapped_view
+
+
+def solicitud_procesada():
+    """
+    La vista ya confirmó su trabajo (commit): con @idempotente, su respuesta se guarda
+    para los reintentos. Si no se llama (errores de validación, nada que procesar), la
+    clave se libera y el usuario puede corregir y reenviar el mismo formulario.
+    """
+    g.solicitud_procesada = True
+
+
+def idempotente(view_func):
+    """
+    Para POST que no se deben repetir (va debajo de role_required). Con clave de
+    idempotencia (encabezado Idempotency-Key o campo idempotency_key), un reintento con la
+    misma clave recibe la respuesta original en lugar de volver a procesar. Solo se guarda
+    la respuesta de una solicitud que llamó a solicitud_procesada().
+    """
+    @wraps(view_func)
+    def wrapped_view(**kwargs):
+        clave = request.headers.get("Idempotency-Key") or request.form.get("idempotency_key")
+        if request.method != "POST" or not clave:
+            return view_func(**kwargs)
+        if len(clave) > MAX_LARGO_CLAVE:
+            return "Clave de idempotencia demasiado larga.", 400
+
+        db = get_db()
+        usuario_id = session["user_id"]
+        previa = reservar_clave(db, usuario_id, request.path, clave)
+        if previa is not None and previa["estado"] == "EN_PROCESO":
+            # La original sigue en curso (doble clic, reintento del proxy): se espera su resultado
+            previa = esperar_resultado(db, usuario_id, request.path, clave)
+            if previa is None:
+                return "Esta solicitud ya se está procesando. Espera un momento y recarga la página.", 409
+        if previa is not None:
+            respuesta = Response(previa["cuerpo"], status=previa["status"], mimetype=previa["mimetype"])
+            if previa["location"]:
+                respuesta.headers["Location"] = previa["location"]
+            return respuesta
+
+        try:
+            respuesta = make_response(view_func(**kwargs))
+        except Exception:
+            db.rollback()
+            liberar_clave(db, usuario_id, request.path, clave)
+            raise
+        if respuesta.status_code >= 500 or respuesta.is_streamed or not g.get("solicitud_procesada"):
+            liberar_clave(db, usuario_id, request.path, clave)
+        else:
+            guardar_respuesta(
+                db, usuario_id, request.path, clave, respuesta.status_code,
+                respuesta.mimetype, respuesta.headers.get("Location"), respuesta.get_data(),
+            )
+        return respuesta
+    return wrapped_view
+
 
 # ---------- Rutas de autenticación ----------
 
@@ -144,7 +265,42 @@ def conciliar():
 @app.route("/dashboard/admin")
 @role_required("admin")
 def dashboard_admin():
-    return render_template("dashboard_admin.html")
+    db = get_db()
+
+    # Salud de cuentas (verificación de cadena de saldos)
+    cur = db.execute(
+        """
+        SELECT c.id, c.banco, c.alias,
+               s.estado, s.movimientos, s.huecos, s.monto_faltante, s.verificado_en
+        FROM cuentas_bancarias c
+        LEFT JOIN salud_cuentas s ON s.cuenta_bancaria_id = c.id
+        WHERE c.activa = 1
+        ORDER BY c.banco, c.alias
+        """
+    )
+    salud_cuentas = cur.fetchall()
+
+    cur = db.execute(
+        """
+        SELECT h.*, c.alias AS cuenta_alias
+        FROM huecos_saldo h
+        JOIN cuentas_bancarias c ON h.cuenta_bancaria_id = c.id
+        ORDER BY h.monto_faltante DESC
+        LIMIT 20
+        """
+    )
+    huecos = cur.fetchall()
+
+    return render_template("dashboard_admin.html", salud_cuentas=salud_cuentas, huecos=huecos)
+
+
+@app.route("/cuentas/verificar-saldos", methods=["POST"])
+@role_required("admin")
+def verificar_saldos_cuentas():
+    db = get_db()
+    verificar_saldos(db)
+    db.commit()
+    return redirect(url_for("dashboard_admin"))
 
 
 @app.route("/dashboard/direccion")
@@ -160,16 +316,7 @@ def ventas_listado():
     db = get_db()
     vendedor_id = session.get("user_id")
 
-    cur = db.execute(
-        """
-        SELECT v.*, c.alias AS cuenta_alias, c.banco
-        FROM ventas v
-        JOIN cuentas_bancarias c ON v.cuenta_bancaria_id = c.id
-        WHERE v.vendedor_id = ?
-        ORDER BY v.fecha_creacion DESC
-        """,
-        (vendedor_id,),
-    )
+    cur = db.execute(SQL_MIS_VENTAS, (vendedor_id,))
     ventas = cur.fetchall()
 
     return render_template("ventas_listado.html", ventas=ventas)
@@ -210,6 +357,7 @@ def descargar_comprobante(venta_id):
 
 @app.route("/ventas/nueva", methods=["GET", "POST"])
 @role_required("vendedor")
+@idempotente
 def ventas_nueva():
     db = get_db()
     vendedor_id = session.get("user_id")
@@ -263,26 +411,41 @@ def ventas_nueva():
 
         # Insertar en la BD
         ahora = datetime.now().isoformat(sep=" ", timespec="seconds")
-        db.execute(
-            """
-            INSERT INTO ventas (
-                folio, cliente_nombre, monto, cuenta_bancaria_id,
-                vendedor_id, estado_banco, fecha_creacion, fecha_ultimo_cambio, nota
+        try:
+            db.execute(
+                """
+                INSERT INTO ventas (
+                    folio, cliente_nombre, monto, cuenta_bancaria_id,
+                    vendedor_id, estado_banco, fecha_creacion, fecha_ultimo_cambio, nota
+                )
+                VALUES (?, ?, ?, ?, ?, 'PENDIENTE', ?, ?, ?)
+                """,
+                (
+                    folio,
+                    cliente_nombre,
+                    monto,
+                    cuenta_bancaria_id,
+                    vendedor_id,
+                    ahora,
+                    ahora,
+                    nota,
+                ),
+            )
+        except sqlite3.IntegrityError:
+            # Índice único de ventas.folio
+            db.rollback()
+            return render_template(
+                "ventas_nueva.html",
+                cuentas=cuentas,
+                errors=[f"Ya existe una venta con el folio {folio}."],
+                folio=folio,
+                cliente_nombre=cliente_nombre,
+                monto=request.form.get("monto"),
+                cuenta_bancaria_id=cuenta_bancaria_id,
+                nota=nota,
             )
-            VALUES (?, ?, ?, ?, ?, 'PENDIENTE', ?, ?, ?)
-            """,
-            (
-                folio,
-                cliente_nombre,
-                monto,
-                cuenta_bancaria_id,
-                vendedor_id,
-                ahora,
-                ahora,
-                nota,
-            ),
-        )
         db.commit()
+        solicitud_procesada()
         try:
             run_conciliacion()
         except Exception:
@@ -293,6 +456,43 @@ def ventas_nueva():
 
     return render_template("ventas_nueva.html", cuentas=cuentas)
 
+@app.route("/api/ventas/lote", methods=["POST"])
+@api_token_required
+def api_ventas_lote():
+    """
+    Carga masiva de ventas desde el ERP. El cuerpo es NDJSON (Content-Type
+    application/x-ndjson, un objeto por línea) o CSV con encabezados (text/csv o
+    ?formato=csv), con los campos folio, cliente_nombre, monto, cuenta_bancaria_id y
+    opcionales vendedor_id, moneda, fecha, nota.
+
+    La respuesta es NDJSON en streaming: un resultado por línea
+    ({"linea": 3, "ok": true, "folio": ..., "venta_id": ...} o con "errores") conforme se
+    confirma cada lote, y al final {"resumen": {...}}. La conciliación corre una vez al
+    terminar, solo para las cuentas que recibieron ventas.
+    """
+    formato = request.args.get("formato", "").lower()
+    if not formato:
+        formato = "csv" if request.mimetype in ("text/csv", "application/csv") else "ndjson"
+    if formato not in ("csv", "ndjson"):
+        return jsonify({"error": "formato debe ser csv o ndjson."}), 400
+
+    db = get_db()
+    vendedor_id = g.api_usuario_id
+
+    def generar():
+        # El cuerpo se lee por línea conforme se procesan los lotes
+        lineas = TextIOWrapper(request.stream, encoding="utf-8-sig", newline="" if formato == "csv" else None)
+        for resultado in ingerir_ventas(db, leer_registros(lineas, formato), vendedor_id):
+            if "resumen" in resultado:
+                try:
+                    resultado["resumen"]["conciliados"] = run_conciliacion(cuentas=resultado["resumen"]["cuentas"])
+                except Exception:
+                    # Como en ventas_nueva: si falla la conciliación, las ventas ya quedaron
+                    resultado["resumen"]["conciliados"] = None
+            yield json.dumps(resultado, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generar()), mimetype="application/x-ndjson")
+
 @app.route("/ventas/<int:venta_id>/editar", methods=["GET", "POST"])
 @role_required("vendedor")
 def venta_editar(venta_id):
@@ -354,6 +554,11 @@ def venta_editar(venta_id):
         if not cuenta_bancaria_id:
             errores.append("Debes seleccionar una cuenta bancaria.")
 
+        if not errores and db.execute(
+            "SELECT 1 FROM ventas WHERE folio = ? AND id <> ?", (folio, venta_id)
+        ).fetchone():
+            errores.append(f"Ya existe otra venta con el folio {folio}.")
+
         if not errores:
             db.execute(
                 """
@@ -529,47 +734,12 @@ def venta_detalle(venta_id):
             else:
                 mensaje_ok = "Se marcó la venta como 'EN ESPERA DE CONCILIACIÓN'. Aún no se detecta el pago en banco."
 
-    # --------- Parsear detalle de venta rápida desde nota ---------
-    detalle_venta_rapida = []
-    nota = venta["nota"] or ""
-    if "Venta rápida" in nota:
-        lineas = nota.splitlines()
-        for linea in lineas:
-            linea = linea.strip()
-            if not linea.startswith("Doc "):
-                continue
-            try:
-                sin_prefijo = linea[4:]
-                parte_doc, resto = sin_prefijo.split(":", 1)
-                documento = parte_doc.strip()
-
-                resto = resto.strip()
-                if "(original" in resto:
-                    monto_edit_str, parte_original = resto.split("(original", 1)
-                    monto_edit = float(monto_edit_str.strip())
-                    monto_orig_str = parte_original.replace(")", "").strip()
-                    monto_orig = float(monto_orig_str)
-                else:
-                    monto_edit = float(resto.strip())
-                    monto_orig = monto_edit
-
-                detalle_venta_rapida.append(
-                    {
-                        "documento": documento,
-                        "neto_editado": monto_edit,
-                        "neto_original": monto_orig,
-                    }
-                )
-            except Exception:
-                continue
+    # --------- Detalle de venta rápida (documentos) ---------
+    detalle_venta_rapida = documentos_venta(db, venta["id"])
 
     # Buscar última actualización de pagos para la cuenta de esta venta
     cur = db.execute(
-        """
-        SELECT MAX(creado_en) AS ultima_actualizacion
-        FROM pagos_detectados
-        WHERE cuenta_bancaria_id = ?
-        """,
+        SQL_ULTIMA_ACTUALIZACION_CUENTA,
         (venta["cuenta_bancaria_id"],),
     )
     row_update = cur.fetchone()
@@ -589,339 +759,76 @@ def venta_detalle(venta_id):
 
 @app.route("/pagos/subir", methods=["GET", "POST"])
 @role_required("admin")
+@idempotente
 def pagos_subir():
     db = get_db()
-    mensaje_ok = None
+    mensajes_ok = []
     errores = []
 
     if request.method == "POST":
-        banco_sel = request.form.get("banco")
-        archivo = request.files.get("archivo")
-
-        if not banco_sel:
-            errores.append("Debes seleccionar un banco.")
-        if not archivo or archivo.filename == "":
-            errores.append("Debes seleccionar un archivo de movimientos.")
+        # "AUTO": el banco se reconoce por el encabezado de cada archivo (se pueden subir varios)
+        banco_sel = request.form.get("banco") or "AUTO"
+        archivos = [a for a in request.files.getlist("archivo") if a and a.filename]
 
-        if not errores:
-            filename = archivo.filename.lower()
+        if not archivos:
+            errores.append("Debes seleccionar al menos un archivo de movimientos.")
 
+        varios = len(archivos) > 1
+        hubo_carga = False
+        for archivo in archivos:
+            prefijo = f"{archivo.filename}: " if varios else ""
             try:
-                insertados = 0
-
-                # =========================
-                # BANCO: BBVA (Excel)
-                # =========================
-                if banco_sel == "BBVA":
-                    if not (filename.endswith(".xlsb") or filename.endswith(".xlsx") or filename.endswith(".xls")):
-                        errores.append("Para BBVA usa un archivo Excel (.xls, .xlsx o .xlsb).")
-                    else:
-                        import pandas as pd
-                        import hashlib
-                        import numpy as np
-
-                        # Leer Excel de BBVA
-                        if filename.endswith(".xlsb"):
-                            df = pd.read_excel(archivo, engine="pyxlsb")
-                        else:
-                            df = pd.read_excel(archivo)
-
-                        # Cuenta de AZYCO (columna 1 en la fila de encabezado original)
-                        cuenta_azyco = str(df.columns[1]).strip()
-
-                        # Encabezado real está en la fila 0
-                        header_row = df.iloc[0]
-                        data = df.iloc[1:].copy()
-                        data.columns = header_row
-
-                        if "Abono" not in data.columns:
-                            errores.append("No se encontró la columna 'Abono' en el archivo de BBVA.")
-                        else:
-                            data["Abono"] = pd.to_numeric(data["Abono"], errors="coerce")
-                            data["Saldo"] = pd.to_numeric(data.get("Saldo", pd.Series(dtype=float)), errors="coerce")
-
-                            data = data[data["Abono"].notna() & (data["Abono"] > 0)]
-
-                            # Convertir fecha Excel (número) a fecha real
-                            if "Fecha Operación" in data.columns:
-                                numeros_fecha = pd.to_numeric(data["Fecha Operación"], errors="coerce")
-                                base_date = pd.Timestamp("1899-12-30")
-                                fechas = numeros_fecha.apply(
-                                    lambda x: base_date + pd.Timedelta(days=float(x))
-                                    if not pd.isna(x) else pd.NaT
-                                )
-                            else:
-                                fechas = pd.Series([pd.NaT] * len(data), index=data.index)
-
-                            # Buscar cuenta BBVA (por numero_cuenta)
-                            cur = db.execute(
-                                """
-                                SELECT id FROM cuentas_bancarias
-                                WHERE banco = 'BBVA' AND numero_cuenta = ?
-                                """,
-                                (cuenta_azyco,),
-                            )
-                            row_cuenta = cur.fetchone()
-                            cuenta_bancaria_id = row_cuenta["id"] if row_cuenta else None
-
-                            for idx, row in data.iterrows():
-                                fecha = fechas.loc[idx] if idx in fechas.index else pd.NaT
-                                if pd.isna(fecha):
-                                    continue
-                                fecha_str = fecha.date().isoformat()
-
-                                monto = float(row["Abono"]) if not pd.isna(row["Abono"]) else None
-                                if monto is None:
-                                    continue
-
-                                referencia = str(row.get("Referencia", "")).strip()
-                                ref_amp = str(row.get("Referencia Ampliada", "")).strip()
-                                concepto = str(row.get("Concepto", "")).strip()
-                                saldo_post = row.get("Saldo", None)
-                                if not pd.isna(saldo_post):
-                                    saldo_post = float(saldo_post)
-                                else:
-                                    saldo_post = None
-
-                                raw = f"BBVA|{cuenta_azyco}|{fecha_str}|{monto}|{referencia}|{ref_amp}|{saldo_post}"
-                                hash_unico = hashlib.sha256(raw.encode("utf-8")).hexdigest()
-
-                                db.execute(
-                                    """
-                                    INSERT OR IGNORE INTO pagos_detectados (
-                                        banco, cuenta_bancaria_id, fecha_operacion, hora_operacion,
-                                        monto, referencia, referencia_ampliada, concepto,
-                                        saldo_posterior, fuente_archivo, hash_unico
-                                    )
-                                    VALUES (?, ?, ?, NULL, ?, ?, ?, ?, ?, ?, ?)
-                                    """,
-                                    (
-                                        "BBVA",
-                                        cuenta_bancaria_id,
-                                        fecha_str,
-                                        monto,
-                                        referencia,
-                                        ref_amp,
-                                        concepto,
-                                        saldo_post,
-                                        archivo.filename,
-                                        hash_unico,
-                                    ),
-                                )
-                                insertados += 1
-
-                # =========================
-                # BANCO: BANAMEX (CSV)
-                # =========================
-                elif banco_sel == "BANAMEX":
-                    if not filename.endswith(".csv"):
-                        errores.append("Para Banamex usa un archivo CSV.")
-                    else:
-                        import pandas as pd
-                        import hashlib
-
-                        df = pd.read_csv(archivo, encoding="latin1")
-
-                        col0 = df.columns[0]
-                        # fila donde empieza el detalle (la que dice 'Fecha')
-                        hdr_idx = df[df[col0] == "Fecha"].index[0]
-                        header = df.iloc[hdr_idx]
-                        data = df.iloc[hdr_idx + 1 :].copy()
-                        data.columns = header
-
-                        # Solo depósitos
-                        data = data[data["Fecha"].notna()]
-                        data = data[
-                            data["Depósitos"].notna()
-                            & (data["Depósitos"].astype(str).str.strip() != "-")
-                        ]
-
-                        def clean_amount(x):
-                            s = str(x)
-                            s = (
-                                s.replace("$", "")
-                                .replace(",", "")
-                                .strip()
-                            )
-                            if not s:
-                                return None
-                            return float(s)
-
-                        data["monto"] = data["Depósitos"].apply(clean_amount)
-                        data["fecha"] = pd.to_datetime(
-                            data["Fecha"], format="%d/%m/%Y"
-                        ).dt.date
-
-                        # Buscar cuenta Banamex (primer cuenta activa)
-                        cur = db.execute(
-                            """
-                            SELECT id FROM cuentas_bancarias
-                            WHERE banco = 'BANAMEX' AND activa = 1
-                            ORDER BY id
-                            LIMIT 1
-                            """
-                        )
-                        row_cuenta = cur.fetchone()
-                        cuenta_bancaria_id = row_cuenta["id"] if row_cuenta else None
-
-                        for _, row in data.iterrows():
-                            if row["monto"] is None:
-                                continue
-
-                            fecha_str = row["fecha"].isoformat()
-                            monto = row["monto"]
-                            concepto = str(row.get("Descripción", "")).strip()
-                            referencia = ""  # el CSV no trae referencia corta clara
-                            saldo_post = None  # opcional
-
-                            raw = f"BANAMEX|{cuenta_bancaria_id}|{fecha_str}|{monto}|{referencia}|{concepto}|{saldo_post}"
-                            hash_unico = hashlib.sha256(raw.encode("utf-8")).hexdigest()
-
-                            db.execute(
-                                """
-                                INSERT OR IGNORE INTO pagos_detectados (
-                                    banco, cuenta_bancaria_id, fecha_operacion, hora_operacion,
-                                    monto, referencia, referencia_ampliada, concepto,
-                                    saldo_posterior, fuente_archivo, hash_unico
-                                )
-                                VALUES (?, ?, ?, NULL, ?, ?, ?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    "BANAMEX",
-                                    cuenta_bancaria_id,
-                                    fecha_str,
-                                    monto,
-                                    referencia,
-                                    "",  # referencia ampliada
-                                    concepto,
-                                    saldo_post,
-                                    archivo.filename,
-                                    hash_unico,
-                                ),
-                            )
-                            insertados += 1
-
-                # =========================
-                # BANCO: BANORTE (CSV)
-                # =========================
-                elif banco_sel == "BANORTE":
-                    if not filename.endswith(".csv"):
-                        errores.append("Para Banorte usa un archivo CSV.")
-                    else:
-                        import pandas as pd
-                        import hashlib
-
-                        df = pd.read_csv(archivo, encoding="latin1")
-
-                        # columna de depósitos (nombre con acentos raros)
-                        dep_col = [c for c in df.columns if "DEP" in c.upper()][0]
-
-                        df_dep = df[
-                            df[dep_col].notna()
-                            & (df[dep_col].astype(str).str.strip() != "-")
-                        ].copy()
-
-                        def clean_amount(x):
-                            s = str(x)
-                            s = (
-                                s.replace("$", "")
-                                .replace(",", "")
-                                .strip()
-                            )
-                            if not s or s == "-":
-                                return None
-                            return float(s)
-
-                        df_dep["monto"] = df_dep[dep_col].apply(clean_amount)
-                        df_dep["fecha"] = pd.to_datetime(
-                            df_dep["FECHA"], format="%d/%m/%Y"
-                        ).dt.date
-
-                        # Buscar cuenta Banorte (primer cuenta activa)
-                        cur = db.execute(
-                            """
-                            SELECT id FROM cuentas_bancarias
-                            WHERE banco = 'BANORTE' AND activa = 1
-                            ORDER BY id
-                            LIMIT 1
-                            """
-                        )
-                        row_cuenta = cur.fetchone()
-                        cuenta_bancaria_id = row_cuenta["id"] if row_cuenta else None
-
-                        for _, row in df_dep.iterrows():
-                            if row["monto"] is None:
-                                continue
-
-                            fecha_str = row["fecha"].isoformat()
-                            monto = row["monto"]
-                            referencia = str(row.get("REFERENCIA", "")).strip()
-                            concepto = str(row.get("DESCRIPCIÓN", "")).strip()
-                            saldo_post = None  # podríamos parsear 'SALDO' si hace falta
-
-                            raw = f"BANORTE|{cuenta_bancaria_id}|{fecha_str}|{monto}|{referencia}|{concepto}|{saldo_post}"
-                            hash_unico = hashlib.sha256(raw.encode("utf-8")).hexdigest()
-
-                            db.execute(
-                                """
-                                INSERT OR IGNORE INTO pagos_detectados (
-                                    banco, cuenta_bancaria_id, fecha_operacion, hora_operacion,
-                                    monto, referencia, referencia_ampliada, concepto,
-                                    saldo_posterior, fuente_archivo, hash_unico
-                                )
-                                VALUES (?, ?, ?, NULL, ?, ?, ?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    "BANORTE",
-                                    cuenta_bancaria_id,
-                                    fecha_str,
-                                    monto,
-                                    referencia,
-                                    "",
-                                    concepto,
-                                    saldo_post,
-                                    archivo.filename,
-                                    hash_unico,
-                                ),
-                            )
-                            insertados += 1
-
-                else:
-                    errores.append("Banco no reconocido.")
-
+                contenido = archivo.read()
+
+                # Olfateo del encabezado: rechaza en milisegundos un archivo que no es del
+                # banco elegido o cuya cuenta no está dada de alta, antes de parsearlo completo
+                banco, cuenta_olfateada = olfatear_archivo(BytesIO(contenido), archivo.filename)
+                if banco_sel != "AUTO" and banco != banco_sel:
+                    raise ArchivoInvalido(f"El archivo parece de {banco}, no de {banco_sel}.")
+                validar_cuenta(db, banco, cuenta_olfateada)
+
+                # Con el sha, un archivo que ya se había subido sale de la caché de parseo
+                sha = hash_contenido(contenido)
+                cuenta_archivo, registros, info = parsear_archivo(
+                    banco, BytesIO(contenido), archivo.filename, cargar_marcas(db, banco), sha256_archivo=sha
+                )
+                nuevos, duplicados = guardar_lote(
+                    db, banco, cuenta_archivo, registros, archivo.filename, sha, info
+                )
                 db.commit()
+                hubo_carga = True
+                solicitud_procesada()
 
-                try:
-                    run_conciliacion()
-                except Exception as e:
-                    # Para no tronar la carga si algo pasa en conciliación
-                    print(f"Error al ejecutar conciliación automática después de subir movimientos: {e}")
-
-                return redirect(url_for("pagos_detectados_listado"))
-
-                return render_template("pagos_subir.html")
-
-                if insertados > 0:
-                    mensaje_ok = f"Archivo procesado. Pagos detectados insertados (o ignorados si ya existían): {insertados}"
-                elif not errores:
-                    mensaje_ok = "El archivo se procesó pero no se encontraron depósitos nuevos."
-
-                # Ejecutar conciliación automática después de cualquier carga
-                if not errores:
-                    try:
-                        from modules.conciliacion import run_conciliacion
-                        nuevos_matches = run_conciliacion()
-                        if nuevos_matches > 0:
-                            mensaje_ok += f" | Conciliación automática: {nuevos_matches} ventas marcadas como PAGADO."
-                    except Exception as e:
-                        errores.append(f"Error al ejecutar la conciliación automática: {e}")
+                if nuevos > 0:
+                    mensaje = f"{prefijo}Archivo procesado ({banco}). Pagos nuevos: {nuevos} | Ya existían: {duplicados}"
+                else:
+                    mensaje = f"{prefijo}El archivo ({banco}) se procesó pero no se encontraron depósitos nuevos (ya existían: {duplicados})."
+                if info["omitidos_por_marca"]:
+                    mensaje += f" | Movimientos ya importados que se saltaron: {info['omitidos_por_marca']}"
+                mensajes_ok.append(mensaje)
+                if info["aviso"]:
+                    errores.append(prefijo + info["aviso"])
+
+            except ArchivoInvalido as e:
+                db.rollback()
+                errores.append(prefijo + str(e))
+            except Exception as e:
+                db.rollback()
+                errores.append(f"{prefijo}Error al procesar el archivo: {e}")
 
+        # Ejecutar conciliación automática una vez, después de todas las cargas
+        if hubo_carga:
+            try:
+                nuevos_matches = run_conciliacion()
+                if nuevos_matches > 0:
+                    mensajes_ok.append(f"Conciliación automática: {nuevos_matches} ventas marcadas como PAGADO.")
             except Exception as e:
-                errores.append(f"Error al procesar el archivo: {e}")
+                # Para no tronar la carga si algo pasa en conciliación
+                errores.append(f"Error al ejecutar la conciliación automática: {e}")
 
     return render_template(
         "pagos_subir.html",
-        mensaje_ok=mensaje_ok,
+        mensajes_ok=mensajes_ok,
         errores=errores
     )
 
@@ -929,6 +836,7 @@ def pagos_subir():
 
 @app.route("/venta-rapida", methods=["GET", "POST"])
 @role_required("admin","vendedor")
+@idempotente
 def venta_rapida():
     db = get_db()
     mensaje_ok = None
@@ -977,57 +885,33 @@ def venta_rapida():
                 errores.append("El archivo debe ser Excel (.xlsx o .xls).")
             else:
                 try:
-                    import pandas as pd
-                    df = pd.read_excel(archivo)
-
-                    col_cliente = "Receivables Aging Schedule Details"
-                    col_doc = "Unnamed: 2"
-                    col_neto = "Unnamed: 11"
+                    # Solo las columnas que se usan, leídas en streaming; si el mismo reporte
+                    # ya se había subido, las facturas salen de la caché (modules/antiguedad.py)
+                    contenido = archivo.read()
+                    facturas = facturas_antiguedad(
+                        BytesIO(contenido), archivo.filename, sha256_archivo=hash_contenido(contenido)
+                    )
 
-                    if col_cliente not in df.columns or col_doc not in df.columns or col_neto not in df.columns:
+                    if facturas is None:
                         errores.append("El formato del Excel no coincide con el esperado (antigüedad de saldos).")
+                    elif not facturas:
+                        errores.append("No se encontraron facturas en el archivo.")
                     else:
-                        facturas = []
-                        cliente_actual = None
-
-                        for _, row in df.iterrows():
-                            cliente_val = row.get(col_cliente)
-
-                            # Detectar renglón de cliente (ej. '21-100074 JAIME ...')
-                            if isinstance(cliente_val, str) and "-" in cliente_val and "Agente" not in cliente_val and "Organización" not in cliente_val and "Balance" not in cliente_val:
-                                cliente_actual = cliente_val.strip()
-                                continue
-
-                            doc = row.get(col_doc)
-                            neto = row.get(col_neto)
-
-                            # Filtrar filas de factura: doc no nulo, neto numérico positivo
-                            if pd.notna(doc) and pd.notna(neto):
-                                try:
-                                    neto_val = float(neto)
-                                except Exception:
-                                    continue
-                                if neto_val <= 0:
-                                    continue
-
-                                facturas.append({
-                                    "cliente": cliente_actual or "",
-                                    "documento": str(doc).strip(),
-                                    "neto": neto_val,
-                                })
-
-                        if not facturas:
-                            errores.append("No se encontraron facturas en el archivo.")
-                        else:
-                            # Renderizar vista de selección (paso 2)
-                            return render_template(
-                                "venta_rapida_preview.html",
-                                vendedores=vendedores,
-                                cuentas=cuentas,
-                                vendedor_id=vendedor_id,
-                                cuenta_bancaria_id=cuenta_bancaria_id,
-                                facturas=facturas,
-                            )
+                        # Las facturas se quedan en el servidor; la vista previa solo lleva el token
+                        token = guardar_staging(db, facturas, session["user_id"])
+                        db.commit()
+                        solicitud_procesada()
+
+                        # Renderizar vista de selección (paso 2)
+                        return render_template(
+                            "venta_rapida_preview.html",
+                            vendedores=vendedores,
+                            cuentas=cuentas,
+                            vendedor_id=vendedor_id,
+                            cuenta_bancaria_id=cuenta_bancaria_id,
+                            total_facturas=len(facturas),
+                            token=token,
+                        )
                 except Exception as e:
                     errores.append(f"Error al leer el archivo: {e}")
 
@@ -1039,17 +923,15 @@ def venta_rapida():
         if not vendedor_id or not cuenta_bancaria_id:
             errores.append("Falta vendedor o cuenta bancaria al procesar la venta rápida.")
         else:
-            # Reconstruir facturas desde los campos del formulario
-            import json
+            # La selección y los montos editados ya están en la carga en espera (se guardan
+            # desde la vista previa); el formulario solo trae el token
+            token = request.form.get("token", "")
+            facturas = facturas_seleccionadas(db, token, session["user_id"])
 
-            facturas_raw = request.form.get("facturas_json")
-            if not facturas_raw:
-                errores.append("No se recibió el detalle de facturas.")
+            if facturas is None:
+                errores.append("La carga de facturas ya no existe o venció. Vuelve a subir el archivo.")
             else:
-                facturas = json.loads(facturas_raw)
-                seleccion_indices = request.form.getlist("seleccion")
-
-                if not seleccion_indices:
+                if not facturas:
                     errores.append("Debes seleccionar al menos una factura.")
                 else:
                     # Agrupar por cliente
@@ -1057,75 +939,32 @@ def venta_rapida():
 
                     por_cliente = defaultdict(list)
 
-                    for idx_str in seleccion_indices:
-                        idx = int(idx_str)
-                        f = facturas[idx]
-                        # tomar el neto editado
-                        monto_edit_str = request.form.get(f"monto_{idx}")
-                        try:
-                            monto_edit = float(monto_edit_str)
-                        except Exception:
-                            monto_edit = f["neto"]
-
+                    for f in facturas:
                         detalle = {
                             "documento": f["documento"],
                             "neto_original": f["neto"],
-                            "neto_editado": monto_edit,
+                            "neto_editado": f["neto_editado"],
                         }
                         por_cliente[f["cliente"]].append(detalle)
 
-                    creadas = 0
-
-                    from datetime import datetime
-                    ahora = datetime.now().isoformat(sep=" ", timespec="seconds")
-
-                    for cliente, det_list in por_cliente.items():
-                        total_cliente = sum(d["neto_editado"] for d in det_list)
-                        if total_cliente <= 0:
-                            continue
-
-                        # Generar un folio de venta rápida (ej. VR-21100074-20251126-01)
-                        codigo = cliente.split()[0] if cliente else "VR"
-                        codigo = codigo.replace("-", "")
-                        folio = f"VR-{codigo}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-
-                        # Nota con el detalle de facturas
-                        lineas = []
-                        for d in det_list:
-                            lineas.append(f"Doc {d['documento']}: {d['neto_editado']:.2f} (original {d['neto_original']:.2f})")
-                        nota = "Venta rápida.\nCliente: " + (cliente or "SIN NOMBRE") + "\n" + "\n".join(lineas)
-
-                        db.execute(
-                            """
-                            INSERT INTO ventas (
-                                folio, cliente_nombre, monto, cuenta_bancaria_id,
-                                vendedor_id, estado_banco, fecha_creacion, fecha_ultimo_cambio, nota
-                            )
-                            VALUES (?, ?, ?, ?, ?, 'PENDIENTE', ?, ?, ?)
-                            """,
-                            (
-                                folio,
-                                cliente,
-                                total_cliente,
-                                cuenta_bancaria_id,
-                                vendedor_id,
-                                ahora,
-                                ahora,
-                                nota,
-                            ),
-                        )
-                        creadas += 1
-
-                    db.commit()
-
-                    # Ejecutar conciliación automática por si ya existen pagos
+                    # Todas las ventas en una sola transacción, con folios de la secuencia VR
                     try:
-                        from modules.conciliacion import run_conciliacion
-                        run_conciliacion()
-                    except Exception:
-                        pass
+                        creadas = crear_ventas_rapidas(db, por_cliente, cuenta_bancaria_id, vendedor_id)
+                        descartar_staging(db, token)
+                        db.commit()
+                        solicitud_procesada()
+                    except Exception as e:
+                        db.rollback()
+                        errores.append(f"No se crearon las ventas rápidas: {e}")
+                    else:
+                        # Ejecutar conciliación automática por si ya existen pagos
+                        try:
+                            from modules.conciliacion import run_conciliacion
+                            run_conciliacion()
+                        except Exception:
+                            pass
 
-                    mensaje_ok = f"Ventas rápidas creadas: {creadas}"
+                        mensaje_ok = f"Ventas rápidas creadas: {creadas}"
 
     return render_template(
         "venta_rapida_upload.html",
@@ -1136,6 +975,87 @@ def venta_rapida():
     )
 
 
+def _filtros_venta_rapida(fuente) -> dict:
+    def numero(valor):
+        try:
+            return float(str(valor).replace(",", "."))
+        except (TypeError, ValueError):
+            return None
+
+    return {
+        "cliente": (fuente.get("cliente") or "").strip(),
+        "documento": (fuente.get("documento") or "").strip(),
+        "monto_min": numero(fuente.get("monto_min")),
+        "monto_max": numero(fuente.get("monto_max")),
+        "solo_seleccionadas": str(fuente.get("solo_seleccionadas", "")).lower() in ("1", "true", "on"),
+    }
+
+
+@app.route("/venta-rapida/<token>/facturas")
+@role_required("admin", "vendedor")
+def venta_rapida_facturas(token):
+    """Página de facturas de una carga de venta rápida, filtrada, con el resumen de selección."""
+    db = get_db()
+    if not carga_de_usuario(db, token, session["user_id"]):
+        return jsonify({"error": "La carga de facturas ya no existe o venció."}), 404
+
+    pagina = request.args.get("pagina", 1, type=int)
+    por_pagina = min(max(request.args.get("por_pagina", 100, type=int), 1), 500)
+    return jsonify(pagina_facturas(db, token, _filtros_venta_rapida(request.args), pagina, por_pagina))
+
+
+@app.route("/venta-rapida/<token>/seleccion", methods=["POST"])
+@role_required("admin", "vendedor")
+def venta_rapida_seleccion(token):
+    """
+    Guarda cambios de la vista previa. JSON:
+      {"cambios": [{"idx": 3, "seleccionada": true, "neto_editado": 120.5}, ...]}
+    o, para todas las que pasan los filtros actuales:
+      {"filtros": {...}, "seleccionada": true}
+    Devuelve el resumen de selección.
+    """
+    db = get_db()
+    if not carga_de_usuario(db, token, session["user_id"]):
+        return jsonify({"error": "La carga de facturas ya no existe o venció."}), 404
+
+    datos = request.get_json(silent=True) or {}
+    try:
+        if "filtros" in datos:
+            marcar_filtradas(db, token, _filtros_venta_rapida(datos["filtros"]), bool(datos.get("seleccionada")))
+        else:
+            marcar_facturas(db, token, datos.get("cambios", []))
+        db.commit()
+    except (KeyError, TypeError, ValueError) as e:
+        db.rollback()
+        return jsonify({"error": f"Cambio inválido: {e}"}), 400
+
+    return jsonify({"resumen": resumen_seleccion(db, token)})
+
+
+POR_PAGINA_PAGOS = 100
+LIMITE_CONTEO_PAGOS = 10000
+
+
+def _rango_dia(fecha_str):
+    """
+    ("YYYY-MM-DD", "YYYY-MM-DD" del día siguiente) para filtrar un día como rango
+    [inicio, fin) sobre la columna, o None si fecha_str no es una fecha válida.
+    """
+    try:
+        dia = date.fromisoformat(fecha_str)
+    except ValueError:
+        return None
+    return dia.isoformat(), (dia + timedelta(days=1)).isoformat()
+
+
+def _cursor_pagos(valor):
+    """"<fecha_operacion>|<id>" de los enlaces de página -> (fecha, id), o None si no es válido."""
+    fecha, _, pago_id = (valor or "").rpartition("|")
+    if not fecha or not pago_id.isdigit():
+        return None
+    return fecha, int(pago_id)
+
+
 @app.route("/pagos/detectados")
 @role_required("admin")
 def pagos_detectados_listado():
@@ -1148,58 +1068,84 @@ def pagos_detectados_listado():
     fecha_hasta = request.args.get("fecha_hasta", "").strip()
     monto_str = request.args.get("monto", "").strip()
 
-    condiciones = []
-    params = []
-
-    # Armamos WHERE dinámico
-    if banco:
-        condiciones.append("p.banco = ?")
-        params.append(banco)
-
-    if estado:
-        condiciones.append("p.estado_conciliacion = ?")
-        params.append(estado)
-
-    if fecha_desde:
-        condiciones.append("date(p.fecha_operacion) >= date(?)")
-        params.append(fecha_desde)
-
-    if fecha_hasta:
-        condiciones.append("date(p.fecha_operacion) <= date(?)")
-        params.append(fecha_hasta)
+    # Fechas y monto como rangos sobre la columna, para que usen los índices
+    rango_desde = _rango_dia(fecha_desde) if fecha_desde else None
+    rango_hasta = _rango_dia(fecha_hasta) if fecha_hasta else None
 
+    monto_val = None
     if monto_str:
         try:
             monto_val = float(monto_str)
-            # Igualdad con tolerancia de centavos
-            condiciones.append("ABS(p.monto - ?) < 0.01")
-            params.append(monto_val)
         except ValueError:
             # Si no es numérico, ignoramos el filtro
             monto_val = None
 
-    where_clause = ""
-    if condiciones:
-        where_clause = "WHERE " + " AND ".join(condiciones)
-
-    query = f"""
-        SELECT 
-            p.*,
-            c.alias AS cuenta_alias,
-            v.folio AS venta_folio
-        FROM pagos_detectados p
-        LEFT JOIN cuentas_bancarias c ON p.cuenta_bancaria_id = c.id
-        LEFT JOIN ventas v ON p.venta_id = v.id
-        {where_clause}
-        ORDER BY p.fecha_operacion DESC, p.id DESC
-    """
+    # Armamos WHERE dinámico (SQL en modules/consultas.py)
+    condiciones, params = filtros_pagos(
+        banco,
+        estado,
+        rango_desde[0] if rango_desde else None,
+        rango_hasta[1] if rango_hasta else None,
+        monto_val,
+    )
 
-    cur = db.execute(query, params)
+    # Total estimado: se cuenta hasta LIMITE_CONTEO_PAGOS (sin JOIN), no la lista completa
+    total = db.execute(sql_conteo_pagos(condiciones), params + [LIMITE_CONTEO_PAGOS + 1]).fetchone()[0]
+
+    # Paginación por llave (fecha_operacion DESC, id DESC): ?despues=<fecha>|<id> trae la
+    # página siguiente a ese pago y ?antes=<fecha>|<id> la anterior
+    despues = _cursor_pagos(request.args.get("despues"))
+    antes = None if despues else _cursor_pagos(request.args.get("antes"))
+    if despues:
+        condiciones.append(CURSOR_DESPUES)
+        params.extend(despues)
+    elif antes:
+        condiciones.append(CURSOR_ANTES)
+        params.extend(antes)
+    orden = "ASC" if antes else "DESC"
+
+    cur = db.execute(sql_listado_pagos(condiciones, orden), params + [POR_PAGINA_PAGOS + 1])
     pagos = cur.fetchall()
+    hay_mas = len(pagos) > POR_PAGINA_PAGOS
+    pagos = pagos[:POR_PAGINA_PAGOS]
+    if antes:
+        pagos.reverse()
+        hay_anterior, hay_siguiente = hay_mas, True
+    else:
+        hay_anterior, hay_siguiente = despues is not None, hay_mas
+
+    # Los filtros viajan en los enlaces de página
+    filtros = {
+        k: v
+        for k, v in (
+            ("banco", banco),
+            ("estado", estado),
+            ("fecha_desde", fecha_desde),
+            ("fecha_hasta", fecha_hasta),
+            ("monto", monto_str),
+        )
+        if v
+    }
+    url_siguiente = url_anterior = None
+    if pagos and hay_siguiente:
+        ultimo = pagos[-1]
+        url_siguiente = url_for(
+            "pagos_detectados_listado", despues=f"{ultimo['fecha_operacion']}|{ultimo['id']}", **filtros
+        )
+    if pagos and hay_anterior:
+        primero = pagos[0]
+        url_anterior = url_for(
+            "pagos_detectados_listado", antes=f"{primero['fecha_operacion']}|{primero['id']}", **filtros
+        )
 
     return render_template(
         "pagos_detectados.html",
         pagos=pagos,
+        total=total,
+        total_es_minimo=total > LIMITE_CONTEO_PAGOS,
+        limite_conteo=LIMITE_CONTEO_PAGOS,
+        url_siguiente=url_siguiente,
+        url_anterior=url_anterior,
         filtro_banco=banco,
         filtro_estado=estado,
         filtro_fecha_desde=fecha_desde,
@@ -1209,6 +1155,17 @@ def pagos_detectados_listado():
 
 
 
+@app.route("/buscar")
+@role_required("admin")
+def buscar():
+    """Búsqueda de texto completo en pagos (referencias, concepto) y ventas (folio, cliente)."""
+    db = get_db()
+    q = request.args.get("q", "").strip()
+    pagos = buscar_pagos(db, q) if q else []
+    ventas = buscar_ventas(db, q) if q else []
+    return render_template("buscar.html", q=q, pagos=pagos, ventas=ventas)
+
+
 @app.route("/pagos/detectados/<int:pago_id>", methods=["GET", "POST"])
 @role_required("admin")
 def pago_detalle(pago_id):
@@ -1243,16 +1200,8 @@ def pago_detalle(pago_id):
         if pago_row["cuenta_bancaria_id"] is None or pago_row["monto"] is None:
             return []
         cur_local = db.execute(
-            """
-            SELECT *
-            FROM ventas
-            WHERE cuenta_bancaria_id = ?
-            AND estado_banco IN ('PENDIENTE', 'EN_ESPERA_CONCILIACION')
-            AND ABS(monto - ?) < 0.01
-            ORDER BY fecha_creacion DESC
-            LIMIT 30
-            """,
-            (pago_row["cuenta_bancaria_id"], pago_row["monto"]),
+            SQL_CANDIDATOS_PAGO,
+            (pago_row["cuenta_bancaria_id"], pago_row["monto"] - 0.01, pago_row["monto"] + 0.01),
         )
         return cur_local.fetchall()
 
@@ -1260,7 +1209,62 @@ def pago_detalle(pago_id):
         # 1) Caso nuevo: asociar directo desde la lista (por venta_id)
         venta_id_directo = request.form.get("venta_id_directo")
 
-        if venta_id_directo:
+        if request.form.get("crear_desde_factura"):
+            # 0) La conciliación identificó una factura sin venta: se crea la venta con
+            #    los datos de la factura y el pago queda ligado a ella
+            factura = None
+            if pago["factura_id"] and pago["venta_id"] is None:
+                factura = db.execute(
+                    "SELECT * FROM facturas WHERE id = ? AND venta_id IS NULL",
+                    (pago["factura_id"],),
+                ).fetchone()
+            if not factura:
+                errores.append("La factura propuesta ya no está disponible para crear la venta.")
+            elif pago["cuenta_bancaria_id"] is None:
+                errores.append("El pago no tiene cuenta bancaria ligada.")
+            else:
+                ahora = datetime.now().isoformat(sep=" ", timespec="seconds")
+                try:
+                    cur = db.execute(
+                        """
+                        INSERT INTO ventas (
+                            folio, cliente_nombre, monto, cuenta_bancaria_id,
+                            vendedor_id, estado_banco, fecha_creacion, fecha_ultimo_cambio, nota
+                        )
+                        VALUES (?, ?, ?, ?, ?, 'PAGADO', ?, ?, ?)
+                        """,
+                        (
+                            factura["folio"],
+                            factura["cliente_nombre"] or factura["rfc"] or "SIN NOMBRE",
+                            pago["monto"],
+                            pago["cuenta_bancaria_id"],
+                            session["user_id"],
+                            ahora,
+                            ahora,
+                            f"Creada desde la factura {factura['uuid'] or factura['folio']} (pago #{pago_id})",
+                        ),
+                    )
+                except sqlite3.IntegrityError:
+                    db.rollback()
+                    errores.append(f"Ya existe una venta con el folio {factura['folio']}; asócialo por folio.")
+                else:
+                    venta_id = cur.lastrowid
+                    db.execute(
+                        """
+                        UPDATE pagos_detectados
+                        SET estado_conciliacion = 'MATCH',
+                            venta_id = ?
+                        WHERE id = ?
+                        """,
+                        (venta_id, pago_id),
+                    )
+                    db.execute(
+                        "UPDATE facturas SET venta_id = ?, estado = 'PAGADA' WHERE id = ?",
+                        (venta_id, factura["id"]),
+                    )
+                    db.commit()
+                    mensaje_ok = f"Venta {factura['folio']} creada desde la factura y asociada al pago."
+        elif venta_id_directo:
             try:
                 venta_id_directo = int(venta_id_directo)
             except ValueError:
@@ -1359,40 +1363,8 @@ def pago_detalle(pago_id):
         )
         pago = cur.fetchone()
 
-    # --------- Parsear detalle de venta rápida de la venta asociada ---------
-    detalle_venta_rapida = []
-    if pago["venta_id"] and pago["venta_nota"] and "Venta rápida" in pago["venta_nota"]:
-        nota = pago["venta_nota"]
-        lineas = nota.splitlines()
-        for linea in lineas:
-            linea = linea.strip()
-            if not linea.startswith("Doc "):
-                continue
-            # Formato: "Doc XYZ: 123.45 (original 130.00)"
-            try:
-                sin_prefijo = linea[4:]  # quitar "Doc "
-                parte_doc, resto = sin_prefijo.split(":", 1)
-                documento = parte_doc.strip()
-
-                resto = resto.strip()
-                if "(original" in resto:
-                    monto_edit_str, parte_original = resto.split("(original", 1)
-                    monto_edit = float(monto_edit_str.strip())
-                    monto_orig_str = parte_original.replace(")", "").strip()
-                    monto_orig = float(monto_orig_str)
-                else:
-                    monto_edit = float(resto.strip())
-                    monto_orig = monto_edit
-
-                detalle_venta_rapida.append(
-                    {
-                        "documento": documento,
-                        "neto_editado": monto_edit,
-                        "neto_original": monto_orig,
-                    }
-                )
-            except Exception:
-                continue
+    # --------- Detalle de venta rápida de la venta asociada ---------
+    detalle_venta_rapida = documentos_venta(db, pago["venta_id"]) if pago["venta_id"] else []
 
     # Candidatos de venta (sólo si el pago NO está ya asociado)
     if pago["venta_id"] is None:
@@ -1400,6 +1372,14 @@ def pago_detalle(pago_id):
     else:
         candidatos_venta = []
 
+    # Factura que la conciliación encontró en la referencia (ver modules/conciliacion.py)
+    factura_propuesta = None
+    if pago["venta_id"] is None and pago["factura_id"]:
+        factura_propuesta = db.execute(
+            "SELECT * FROM facturas WHERE id = ?",
+            (pago["factura_id"],),
+        ).fetchone()
+
     return render_template(
         "pago_detalle.html",
         pago=pago,
@@ -1407,16 +1387,22 @@ def pago_detalle(pago_id):
         errores=errores,
         candidatos_venta=candidatos_venta,
         detalle_venta_rapida=detalle_venta_rapida,
+        factura_propuesta=factura_propuesta,
     )
 
+# Renglones del corte que se escriben por cada bloque enviado
+FILAS_POR_BLOQUE_CSV = 500
+
 @app.route("/cierre-diario", methods=["GET"])
 @role_required("admin")
 def cierre_diario():
     db = get_db()
 
-    fecha_str = request.args.get("fecha")
-    if not fecha_str:
-        fecha_str = date.today().isoformat()
+    # El día como rango [fecha, día siguiente): sirve con fechas y con fecha-hora
+    rango = _rango_dia(request.args.get("fecha") or "")
+    if not rango:
+        rango = _rango_dia(date.today().isoformat())
+    fecha_str, dia_siguiente = rango
 
     export = request.args.get("export", "").strip()
 
@@ -1425,174 +1411,96 @@ def cierre_diario():
         import csv
         from io import StringIO
 
-        # Pagos en MATCH de ese día, con su venta y cuenta
-        cur = db.execute(
-            """
-            SELECT
-                v.folio AS venta_folio,
-                v.cliente_nombre,
-                v.monto AS monto_venta,
-                v.nota AS venta_nota,
-                v.comprobante_filename AS venta_comprobante
-                c.alias AS cuenta_alias
-            FROM pagos_detectados p
-            JOIN ventas v ON p.venta_id = v.id
-            LEFT JOIN cuentas_bancarias c ON v.cuenta_bancaria_id = c.id
-            WHERE p.estado_conciliacion = 'MATCH'
-              AND date(p.fecha_operacion) = date(?)
-            ORDER BY v.cliente_nombre, v.folio
-            """,
-            (fecha_str,),
-        )
-        rows = cur.fetchall()
-
-        def parse_detalle_venta_rapida(nota):
-            """
-            Devuelve lista de dicts con: documento, neto_editado, neto_original
-            a partir de la nota de una venta rápida.
-            """
-            if not nota or "Venta rápida" not in nota:
-                return []
-            detalle = []
-            for linea in nota.splitlines():
-                linea = linea.strip()
-                if not linea.startswith("Doc "):
-                    continue
-                try:
-                    sin_prefijo = linea[4:]  # quitar "Doc "
-                    parte_doc, resto = sin_prefijo.split(":", 1)
-                    documento = parte_doc.strip()
-
-                    resto = resto.strip()
-                    if "(original" in resto:
-                        monto_edit_str, parte_original = resto.split("(original", 1)
-                        monto_edit = float(monto_edit_str.strip())
-                        monto_orig_str = parte_original.replace(")", "").strip()
-                        monto_orig = float(monto_orig_str)
+        # Pagos en MATCH de ese día, con su venta, cuenta y (si es venta rápida) un
+        # renglón por documento
+        cur = db.execute(SQL_CORTE_DIA, (fecha_str, dia_siguiente))
+
+        # Se manda por bloques mientras se lee el cursor: no se arma el CSV completo en
+        # memoria y la descarga empieza en cuanto sale el primer bloque
+        def generar():
+            output = StringIO()
+            writer = csv.writer(output)
+
+            # Encabezados
+            writer.writerow(["Cliente", "Folio", "Documento", "Cuenta", "Monto"])
+
+            while True:
+                rows = cur.fetchmany(FILAS_POR_BLOQUE_CSV)
+                for r in rows:
+                    cliente = r["cliente_nombre"] or ""
+                    folio = r["venta_folio"] or ""
+                    cuenta = r["cuenta_alias"] or ""
+                    monto_venta = r["monto_venta"] or 0.0
+
+                    if r["documento"] is not None:
+                        # Venta rápida: una fila por documento
+                        writer.writerow([
+                            cliente,
+                            folio,
+                            r["documento"],
+                            cuenta,
+                            f"{r['neto_editado']:.2f}",
+                        ])
                     else:
-                        monto_edit = float(resto.strip())
-                        monto_orig = monto_edit
-
-                    detalle.append(
-                        {
-                            "documento": documento,
-                            "neto_editado": monto_edit,
-                            "neto_original": monto_orig,
-                        }
-                    )
-                except Exception:
-                    continue
-            return detalle
-
-        output = StringIO()
-        writer = csv.writer(output)
-
-        # Encabezados
-        writer.writerow(["Cliente", "Folio", "Documento", "Cuenta", "Monto"])
-
-        for r in rows:
-            cliente = r["cliente_nombre"] or ""
-            folio = r["venta_folio"] or ""
-            cuenta = r["cuenta_alias"] or ""
-            nota = r["venta_nota"] or ""
-            monto_venta = r["monto_venta"] or 0.0
-
-            detalle = parse_detalle_venta_rapida(nota)
-
-            if detalle:
-                # Venta rápida: una fila por documento
-                for d in detalle:
-                    writer.writerow([
-                        cliente,
-                        folio,
-                        d["documento"],
-                        cuenta,
-                        f"{d['neto_editado']:.2f}",
-                    ])
-            else:
-                # Venta normal: una fila única, documento vacío
-                writer.writerow([
-                    cliente,
-                    folio,
-                    "",
-                    cuenta,
-                    f"{monto_venta:.2f}",
-                ])
-
-        csv_data = output.getvalue()
-        output.close()
+                        # Venta normal: una fila única, documento vacío
+                        writer.writerow([
+                            cliente,
+                            folio,
+                            "",
+                            cuenta,
+                            f"{monto_venta:.2f}",
+                        ])
+
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+                if not rows:
+                    break
 
         filename = f"corte_aplicado_{fecha_str}.csv"
         return Response(
-            csv_data,
+            stream_with_context(generar()),
             mimetype="text/csv",
             headers={"Content-Disposition": f"attachment; filename={filename}"},
         )
 
     # --------- MODO NORMAL: mostrar pantalla de cierre diario ---------
 
-    # Ventas del día
-    cur = db.execute(
-        """
-        SELECT *
-        FROM ventas
-        WHERE date(fecha_creacion) = date(?)
-        ORDER BY fecha_creacion ASC
-        """,
-        (fecha_str,),
-    )
-    ventas_dia = cur.fetchall()
-
-    total_ventas = len(ventas_dia)
-    total_monto_ventas = sum(v["monto"] for v in ventas_dia) if ventas_dia else 0.0
+    # Totales del día y de los días anteriores: salen de resumen_diario, que los triggers
+    # mantienen al día, sin recorrer las ventas y pagos
+    resumen = resumen_dia(db, fecha_str)
+    dias = tendencia(db, fecha_str)
 
-    ventas_pagadas = [v for v in ventas_dia if v["estado_banco"] == "PAGADO"]
-    ventas_pendientes = [v for v in ventas_dia if v["estado_banco"] != "PAGADO"]
-
-    total_pagadas = len(ventas_pagadas)
-    total_pendientes = len(ventas_pendientes)
+    # Ventas del día que siguen sin pago
+    cur = db.execute(SQL_VENTAS_PENDIENTES_DIA, (fecha_str, dia_siguiente))
+    ventas_pendientes = cur.fetchall()
 
     # Pagos del día
-    cur = db.execute(
-        """
-        SELECT p.*, v.folio AS venta_folio
-        FROM pagos_detectados p
-        LEFT JOIN ventas v ON p.venta_id = v.id
-        WHERE date(p.fecha_operacion) = date(?)
-        ORDER BY p.fecha_operacion ASC, p.id ASC
-        """,
-        (fecha_str,),
-    )
+    cur = db.execute(SQL_PAGOS_DIA, (fecha_str, dia_siguiente))
     pagos_dia = cur.fetchall()
 
-    total_pagos = len(pagos_dia)
-    total_monto_pagos = sum(p["monto"] for p in pagos_dia) if pagos_dia else 0.0
-
     pagos_con_venta = [p for p in pagos_dia if p["venta_id"] is not None]
     pagos_sin_venta = [p for p in pagos_dia if p["venta_id"] is None]
 
-    total_pagos_con_venta = len(pagos_con_venta)
-    total_pagos_sin_venta = len(pagos_sin_venta)
-
     return render_template(
         "cierre_diario.html",
         fecha_str=fecha_str,
-        total_ventas=total_ventas,
-        total_monto_ventas=total_monto_ventas,
-        ventas_pagadas=ventas_pagadas,
+        total_ventas=resumen["ventas"],
+        total_monto_ventas=resumen["monto_ventas"],
         ventas_pendientes=ventas_pendientes,
-        total_pagadas=total_pagadas,
-        total_pendientes=total_pendientes,
-        total_pagos=total_pagos,
-        total_monto_pagos=total_monto_pagos,
+        total_pagadas=resumen["ventas_pagadas"],
+        total_pendientes=resumen["ventas_pendientes"],
+        total_pagos=resumen["pagos"],
+        total_monto_pagos=resumen["monto_pagos"],
         pagos_con_venta=pagos_con_venta,
         pagos_sin_venta=pagos_sin_venta,
-        total_pagos_con_venta=total_pagos_con_venta,
-        total_pagos_sin_venta=total_pagos_sin_venta,
+        total_pagos_con_venta=resumen["pagos_con_venta"],
+        total_pagos_sin_venta=resumen["pagos_sin_venta"],
+        resumen_cuentas=resumen["cuentas"],
+        dias=dias,
     )
 
 
-
 if __name__ == "__main__":
     app.run(debug=True)
 
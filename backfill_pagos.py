@@ -0,0 +1,176 @@
+"""
+Carga histórica de movimientos bancarios desde una carpeta, sin levantar el servidor web.
+
+Usa los mismos parsers que /pagos/subir (modules/importacion.py):
+  - detecta el banco de cada archivo por su encabezado (olfatear_archivo) y, como
+    /pagos/subir, rechaza los que no parecen de ningún banco o cuya cuenta no está dada
+    de alta (quedan como ERROR en el reporte),
+  - parsea en paralelo (un proceso por archivo); CAMT.053 / MT940 se leen en streaming
+    desde el proceso principal, directo del disco,
+  - inserta en azyco_pagos.db solo los movimientos nuevos,
+  - omite archivos que ya se importaron antes (por hash de contenido),
+  - archiva el estado crudo de cada archivo (ver reprocesar_estados.py),
+  - escribe un reporte CSV y corre UNA conciliación al final.
+
+Uso:
+    python backfill_pagos.py <carpeta> [--workers 4] [--reporte reporte.csv] [--sin-conciliar]
+"""
+import argparse
+import csv
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from io import BytesIO
+
+from modules.conciliacion import run_conciliacion
+from modules.importacion import (
+    EXTENSIONES_BANCO,
+    FORMATOS_MULTICUENTA,
+    ArchivoInvalido,
+    archivo_ya_importado,
+    cargar_marcas,
+    guardar_lote,
+    hash_contenido,
+    olfatear_archivo,
+    parsear_archivo,
+    validar_cuenta,
+)
+
+DB_PATH = "azyco_pagos.db"
+
+EXTENSIONES = tuple(sorted({ext for exts in EXTENSIONES_BANCO.values() for ext in exts}))
+
+
+def listar_archivos(carpeta):
+    rutas = []
+    for raiz, _, archivos in os.walk(carpeta):
+        for nombre in archivos:
+            if nombre.lower().endswith(EXTENSIONES):
+                rutas.append(os.path.join(raiz, nombre))
+    return sorted(rutas)
+
+
+def parsear_ruta(ruta, banco, marcas):
+    """
+    Corre en un proceso del pool: no toca la BD, solo lee y parsea el archivo.
+    marcas: cargar_marcas(...) del banco, leído una vez al arrancar.
+    """
+    nombre = os.path.basename(ruta)
+    with open(ruta, "rb") as f:
+        contenido = f.read()
+
+    cuenta_archivo, registros, info = parsear_archivo(banco, BytesIO(contenido), nombre, marcas)
+    return cuenta_archivo, registros, info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga histórica de movimientos bancarios.")
+    parser.add_argument("carpeta", help="Carpeta con archivos de movimientos (se recorre recursivamente)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos para parsear")
+    parser.add_argument("--reporte", default=None, help="Ruta del reporte CSV")
+    parser.add_argument("--sin-conciliar", action="store_true", help="No correr la conciliación al final")
+    args = parser.parse_args()
+
+    reporte_path = args.reporte or f"backfill_reporte_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
+
+    conn = sqlite3.connect(DB_PATH)
+    resultados = []
+
+    # 1. Omitir lo ya importado antes de gastar en parsear (hash del contenido del archivo)
+    pendientes = {}
+    vistos = set()
+    for ruta in listar_archivos(args.carpeta):
+        with open(ruta, "rb") as f:
+            sha = hash_contenido(f.read())
+        if sha in vistos or archivo_ya_importado(conn, sha):
+            resultados.append([ruta, "", "OMITIDO", 0, 0, "Archivo ya importado"])
+            continue
+        vistos.add(sha)
+        pendientes[ruta] = sha
+
+    def guardar(ruta, banco, cuenta_archivo, registros, info):
+        try:
+            nuevos, duplicados = guardar_lote(
+                conn, banco, cuenta_archivo, registros, os.path.basename(ruta), pendientes[ruta], info
+            )
+            conn.commit()
+            detalle = info["aviso"] or ""
+            if info["omitidos_por_marca"]:
+                detalle = f"Saltados por marca de agua: {info['omitidos_por_marca']} {detalle}".strip()
+            resultados.append([ruta, banco, "IMPORTADO", nuevos, duplicados, detalle])
+            print(f"{ruta}: {banco} nuevos={nuevos} duplicados={duplicados} {detalle}".rstrip())
+        except Exception as e:
+            conn.rollback()
+            resultados.append([ruta, banco, "ERROR", 0, 0, str(e)])
+            print(f"{ruta}: ERROR {e}")
+
+    # Olfateo del encabezado (solo el inicio de cada archivo): banco y cuenta, igual que
+    # /pagos/subir. Un .xml que no es CAMT.053 (p. ej. un CFDI) o una cuenta sin dar de
+    # alta se reportan como ERROR en vez de parsearse o quedar con pagos sin cuenta.
+    bancos = {}
+    for ruta in list(pendientes):
+        banco = ""
+        try:
+            banco, cuenta_olfateada = olfatear_archivo(ruta, os.path.basename(ruta))
+            validar_cuenta(conn, banco, cuenta_olfateada)
+        except ArchivoInvalido as e:
+            del pendientes[ruta]
+            resultados.append([ruta, banco, "ERROR", 0, 0, str(e)])
+            print(f"{ruta}: ERROR {e}")
+            continue
+        bancos[ruta] = banco
+
+    en_pool = [r for r in pendientes if bancos[r] not in FORMATOS_MULTICUENTA]
+    en_streaming = [r for r in pendientes if bancos[r] in FORMATOS_MULTICUENTA]
+
+    # Las marcas de agua se leen una vez; con archivos en paralelo sobre la misma cuenta
+    # alguna puede quedar atrasada, lo cual solo hace que se salte menos (nunca de más)
+    marcas = {banco: cargar_marcas(conn, banco) for banco in EXTENSIONES_BANCO}
+
+    # 2. Parsear en paralelo; insertar en el proceso principal (SQLite tiene un solo escritor)
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futuros = {pool.submit(parsear_ruta, ruta, bancos[ruta], marcas[bancos[ruta]]): ruta for ruta in en_pool}
+        for futuro in as_completed(futuros):
+            ruta = futuros[futuro]
+            try:
+                cuenta_archivo, registros, info = futuro.result()
+            except Exception as e:
+                resultados.append([ruta, bancos[ruta], "ERROR", 0, 0, str(e)])
+                print(f"{ruta}: ERROR {e}")
+                continue
+            guardar(ruta, bancos[ruta], cuenta_archivo, registros, info)
+
+    # Formatos estándar: memoria constante, el parser se consume mientras se inserta
+    for ruta in en_streaming:
+        cuenta_archivo, registros, info = parsear_archivo(bancos[ruta], ruta, os.path.basename(ruta))
+        guardar(ruta, bancos[ruta], cuenta_archivo, registros, info)
+
+    conn.close()
+
+    # 3. Una sola conciliación al final
+    matches = 0
+    if not args.sin_conciliar:
+        matches = run_conciliacion()
+
+    resultados.sort(key=lambda r: r[0])
+    with open(reporte_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Archivo", "Banco", "Estado", "Nuevos", "Duplicados", "Detalle"])
+        writer.writerows(resultados)
+
+    importados = [r for r in resultados if r[2] == "IMPORTADO"]
+    print(
+        f"Archivos: {len(resultados)} | importados: {len(importados)} | "
+        f"omitidos: {sum(1 for r in resultados if r[2] == 'OMITIDO')} | "
+        f"errores: {sum(1 for r in resultados if r[2] == 'ERROR')}"
+    )
+    print(
+        f"Pagos nuevos: {sum(r[3] for r in importados)} | ya existían: {sum(r[4] for r in importados)} | "
+        f"conciliación: {matches} ventas marcadas como PAGADO"
+    )
+    print("Reporte:", reporte_path)
+
+
+if __name__ == "__main__":
+    main()
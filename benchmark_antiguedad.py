@@ -0,0 +1,148 @@
+"""
+Paridad y tiempos de extraer_facturas (modules/antiguedad.py) contra la versión
+original renglón por renglón (df.iterrows), que se conserva aquí como referencia.
+
+Primero corre unos casos armados a mano (renglones de agente / balance, neto como
+texto, fechas, notas de crédito, documentos numéricos) y luego un reporte sintético
+de --renglones líneas. Si alguna lista de facturas difiere, termina con error.
+
+Uso:
+    python benchmark_antiguedad.py [--renglones 50000] [--carpeta bench_estados] [--repeticiones 3]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import generar_estados_sinteticos as sinteticos
+from modules.antiguedad import COL_CLIENTE, COL_DOC, COL_NETO, extraer_facturas, leer_antiguedad
+
+
+def extraer_facturas_iterrows(df):
+    """La implementación anterior, tal cual."""
+    facturas = []
+    cliente_actual = None
+
+    for _, row in df.iterrows():
+        cliente_val = row.get(COL_CLIENTE)
+
+        if isinstance(cliente_val, str) and "-" in cliente_val and "Agente" not in cliente_val and "Organización" not in cliente_val and "Balance" not in cliente_val:
+            cliente_actual = cliente_val.strip()
+            continue
+
+        doc = row.get(COL_DOC)
+        neto = row.get(COL_NETO)
+
+        if pd.notna(doc) and pd.notna(neto):
+            try:
+                neto_val = float(neto)
+            except Exception:
+                continue
+            if neto_val <= 0:
+                continue
+
+            facturas.append({
+                "cliente": cliente_actual or "",
+                "documento": str(doc).strip(),
+                "neto": neto_val,
+            })
+
+    return facturas
+
+
+CASOS = {
+    "encabezados": pd.DataFrame({
+        COL_CLIENTE: ["21-1 ACEROS ", "x", None, "Agente: 2-3", "21-2 COMERCIAL", 5, "Balance-1", "c-d"],
+        COL_DOC: [None, "F1", 3, "F2", " F3 ", 7, "F4", "F5"],
+        COL_NETO: [1, 2.5, np.nan, 3, "12", " 4 ", "x", 0],
+    }),
+    "sin_cliente": pd.DataFrame({
+        COL_CLIENTE: [np.nan] * 4,
+        COL_DOC: ["a", "b", None, "c"],
+        COL_NETO: [1.0, -1, 2, np.nan],
+    }),
+    "neto_texto": pd.DataFrame({
+        COL_CLIENTE: ["1-a", "b", "c"],
+        COL_DOC: [1, 2, 3],
+        COL_NETO: ["nan", "1,000", "nan"],
+    }),
+    "neto_mixto": pd.DataFrame({
+        COL_CLIENTE: ["1-a", "b", "c"],
+        COL_DOC: [1, 2, 3],
+        COL_NETO: [datetime(2024, 1, 1), True, "1e3"],
+    }),
+    "organizacion": pd.DataFrame({
+        COL_CLIENTE: ["1-a", "Organización-x", "z"],
+        COL_DOC: [1.5, 2, 3],
+        COL_NETO: [1, 2, 3],
+    }),
+    "vacio": pd.DataFrame({COL_CLIENTE: pd.Series([], dtype=object), COL_DOC: [], COL_NETO: []}),
+}
+
+
+def iguales(a, b) -> bool:
+    # Como ==, pero con NaN igual a NaN y sin confundir 1 con 1.0 o '1'
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if x.keys() != y.keys():
+            return False
+        for k in x:
+            p, q = x[k], y[k]
+            if type(p) is not type(q):
+                return False
+            if isinstance(p, float) and math.isnan(p) and math.isnan(q):
+                continue
+            if p != q:
+                return False
+    return True
+
+
+def cronometrar(funcion, df, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(df)
+        segundos = time.perf_counter() - inicio
+        mejor = segundos if mejor is None else min(mejor, segundos)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridad y tiempos de extraer_facturas.")
+    parser.add_argument("--renglones", type=int, default=50000, help="Líneas del reporte sintético")
+    parser.add_argument("--carpeta", default="bench_estados", help="Dónde se genera (y reutiliza) el reporte")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Se reporta el mejor tiempo")
+    args = parser.parse_args()
+
+    fallas = 0
+    for nombre, df in CASOS.items():
+        ok = iguales(extraer_facturas_iterrows(df), extraer_facturas(df))
+        fallas += not ok
+        print(f"caso {nombre:<14} {'OK' if ok else 'DIFIERE'}")
+
+    os.makedirs(args.carpeta, exist_ok=True)
+    ruta = os.path.join(args.carpeta, f"sintetico_antiguedad_{args.renglones}.xlsx")
+    if not os.path.exists(ruta):
+        sinteticos.generar("ANTIGUEDAD", args.renglones, ruta)
+    df = leer_antiguedad(ruta, ruta)
+
+    t_iterrows, esperadas = cronometrar(extraer_facturas_iterrows, df, args.repeticiones)
+    t_vector, obtenidas = cronometrar(extraer_facturas, df, args.repeticiones)
+    ok = iguales(esperadas, obtenidas)
+    fallas += not ok
+    print(f"reporte de {len(df)} renglones, {len(esperadas)} facturas: {'OK' if ok else 'DIFIERE'}")
+    print(f"  iterrows    {t_iterrows:8.3f} s")
+    print(f"  vectorizado {t_vector:8.3f} s  ({t_iterrows / t_vector:.1f}x)")
+
+    if fallas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compara la lectura de Excel de pd.read_excel contra la lectura en streaming
+(modules/excel_streaming.py) con los archivos que más pesan al subir:
+  - BBVA: la hoja completa (se archiva cruda, ver modules/archivo_estados.py),
+  - ANTIGUEDAD: reporte de antigüedad de venta rápida, solo las 3 columnas que se usan.
+
+Cada medición corre en un proceso aparte: primero el tiempo y luego, con tracemalloc,
+el pico de memoria. También verifica que los dos caminos den el mismo DataFrame.
+
+Uso:
+    python benchmark_excel.py [--tamanos 1000,100000] [--carpeta bench_estados] [--sin-memoria]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import generar_estados_sinteticos as sinteticos
+from modules.antiguedad import COLUMNAS, leer_antiguedad
+from modules.excel_streaming import leer_excel
+
+LECTORES = {
+    ("BBVA", "pandas"): lambda ruta: pd.read_excel(ruta),
+    ("BBVA", "streaming"): lambda ruta: leer_excel(ruta, ruta),
+    ("ANTIGUEDAD", "pandas"): lambda ruta: pd.read_excel(ruta)[COLUMNAS],
+    ("ANTIGUEDAD", "streaming"): lambda ruta: leer_antiguedad(ruta, ruta),
+}
+
+
+def medir(tipo, camino, ruta, medir_memoria):
+    """Corre en un proceso aparte. Devuelve (segundos, pico_bytes, DataFrame)."""
+    leer = LECTORES[(tipo, camino)]
+    if medir_memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    df = leer(ruta)
+    segundos = time.perf_counter() - inicio
+    pico = None
+    if medir_memoria:
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return segundos, pico, df
+
+
+def _en_proceso(*args):
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(medir, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de lectura de Excel: pandas vs streaming.")
+    parser.add_argument("--tamanos", default="1000,100000", help="Renglones por archivo, separados por coma")
+    parser.add_argument("--carpeta", default="bench_estados", help="Dónde se generan (y reutilizan) los archivos")
+    parser.add_argument("--sin-memoria", action="store_true", help="Solo tiempos (sin la pasada con tracemalloc)")
+    args = parser.parse_args()
+
+    os.makedirs(args.carpeta, exist_ok=True)
+    print(f"{'archivo':<11} {'renglones':>9} {'camino':<10} {'segundos':>9} {'pico MB':>8}")
+    for tipo in ("BBVA", "ANTIGUEDAD"):
+        for tamano in [int(t) for t in args.tamanos.split(",") if t.strip()]:
+            ruta = os.path.join(args.carpeta, f"sintetico_{tipo.lower()}_{tamano}.xlsx")
+            if not os.path.exists(ruta):
+                sinteticos.generar(tipo, tamano, ruta)
+
+            resultados = {}
+            for camino in ("pandas", "streaming"):
+                segundos, _, df = _en_proceso(tipo, camino, ruta, False)
+                pico = None if args.sin_memoria else _en_proceso(tipo, camino, ruta, True)[1]
+                resultados[camino] = df
+                pico_mb = "" if pico is None else f"{pico / 1024 / 1024:.1f}"
+                print(f"{tipo:<11} {tamano:>9} {camino:<10} {segundos:>9.3f} {pico_mb:>8}")
+
+            pd.testing.assert_frame_equal(resultados["pandas"], resultados["streaming"])
+
+
+if __name__ == "__main__":
+    main()
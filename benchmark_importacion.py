@@ -0,0 +1,156 @@
+"""
+Benchmark de la importación de movimientos bancarios (el camino de /pagos/subir).
+
+Para cada banco y tamaño genera (una vez, en --carpeta) un estado sintético con
+generar_estados_sinteticos.py y mide, en un proceso aparte y contra una BD temporal:
+  - parseo:     parsear_archivo (lectura + normalización),
+  - hash:       clave_dedup de todos los registros,
+  - guardar:    guardar_lote (hash + anti-join + inserción + archivado + verificación de saldos),
+  - re-subida:  insertar_pagos_nuevos con los mismos registros (todos duplicados).
+
+El tiempo se mide sin tracemalloc; luego se repite con tracemalloc para el pico de memoria
+de cada fase (lo que Python, numpy y pandas reservan por encima de lo que ya había).
+
+Uso:
+    python benchmark_importacion.py [--tamanos 1000,100000,1000000] [--bancos BBVA,BANAMEX,BANORTE]
+                                    [--carpeta bench_estados] [--sin-memoria] [--reporte bench.csv]
+"""
+import argparse
+import csv
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import generar_estados_sinteticos as sinteticos
+from init_db import schema
+from modules import archivo_estados
+from modules.importacion import clave_dedup, guardar_lote, hash_contenido, insertar_pagos_nuevos, parsear_archivo
+
+FASES = ("parseo", "hash", "guardar", "re-subida")
+
+
+def _bd_temporal(carpeta, banco):
+    db = sqlite3.connect(os.path.join(carpeta, "bench.db"))
+    db.executescript(schema)
+    db.execute(
+        "INSERT INTO cuentas_bancarias (banco, alias, numero_cuenta) VALUES (?, ?, ?)",
+        (banco, f"{banco} benchmark", sinteticos.CUENTA[banco]),
+    )
+    db.commit()
+    return db
+
+
+def _correr_fases(banco, ruta, medir_memoria):
+    """Corre las fases sobre una BD nueva. Devuelve ({fase: (segundos, pico_bytes)}, renglones)."""
+    carpeta = tempfile.mkdtemp(prefix="bench_importacion_")
+    # Los estados crudos se archivan en la carpeta temporal, no en uploads/
+    archivo_estados.CARPETA_ESTADOS = os.path.join(carpeta, "estados")
+    db = _bd_temporal(carpeta, banco)
+    nombre = os.path.basename(ruta)
+    with open(ruta, "rb") as f:
+        sha = hash_contenido(f.read())
+
+    resultados = {}
+    contexto = {}
+
+    def fase_parseo():
+        contexto["cuenta"], contexto["registros"], contexto["info"] = parsear_archivo(banco, ruta, nombre)
+
+    def fase_hash():
+        for r in contexto["registros"]:
+            clave_dedup(r)
+
+    def fase_guardar():
+        guardar_lote(db, banco, contexto["cuenta"], contexto["registros"], nombre, sha, contexto["info"])
+        db.commit()
+
+    def fase_resubida():
+        insertar_pagos_nuevos(db, [dict(r) for r in contexto["registros"]])
+        db.commit()
+
+    try:
+        for fase, funcion in zip(FASES, (fase_parseo, fase_hash, fase_guardar, fase_resubida)):
+            if medir_memoria:
+                tracemalloc.start()
+                base = tracemalloc.get_traced_memory()[0]
+            inicio = time.perf_counter()
+            funcion()
+            segundos = time.perf_counter() - inicio
+            pico = None
+            if medir_memoria:
+                pico = tracemalloc.get_traced_memory()[1] - base
+                tracemalloc.stop()
+            resultados[fase] = (segundos, pico)
+        return resultados, len(contexto["registros"])
+    finally:
+        db.close()
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def medir_caso(banco, ruta, medir_memoria=True):
+    """Corre en un proceso aparte: cada caso empieza con la memoria limpia."""
+    tiempos, renglones = _correr_fases(banco, ruta, medir_memoria=False)
+    if medir_memoria:
+        memoria, _ = _correr_fases(banco, ruta, medir_memoria=True)
+        for fase in FASES:
+            tiempos[fase] = (tiempos[fase][0], memoria[fase][1])
+    return tiempos, renglones
+
+
+def _mb(valor):
+    return "" if valor is None else f"{valor / 1024 / 1024:.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la importación de movimientos bancarios.")
+    parser.add_argument("--tamanos", default="1000,100000,1000000", help="Renglones por archivo, separados por coma")
+    parser.add_argument("--bancos", default=",".join(sinteticos.BANCOS), help="Bancos a medir, separados por coma")
+    parser.add_argument("--carpeta", default="bench_estados", help="Dónde se generan (y reutilizan) los archivos")
+    parser.add_argument("--sin-memoria", action="store_true", help="Solo tiempos (sin la pasada con tracemalloc)")
+    parser.add_argument("--reporte", default=None, help="Ruta de un CSV con los resultados")
+    args = parser.parse_args()
+
+    tamanos = [int(t) for t in args.tamanos.split(",") if t.strip()]
+    bancos = [b.strip().upper() for b in args.bancos.split(",") if b.strip()]
+    os.makedirs(args.carpeta, exist_ok=True)
+
+    filas = []
+    print(f"{'banco':<8} {'renglones':>9} {'abonos':>8} " + " ".join(f"{f + ' s':>12} {f + ' MB':>13}" for f in FASES))
+    for banco in bancos:
+        for tamano in tamanos:
+            ruta = os.path.join(args.carpeta, f"sintetico_{banco.lower()}_{tamano}{sinteticos.EXTENSION[banco]}")
+            if not os.path.exists(ruta):
+                inicio = time.perf_counter()
+                sinteticos.generar(banco, tamano, ruta)
+                print(f"  (generado {ruta} en {time.perf_counter() - inicio:.1f} s)")
+
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                resultados, abonos = pool.submit(medir_caso, banco, ruta, not args.sin_memoria).result()
+
+            fila = [banco, tamano, abonos]
+            for fase in FASES:
+                segundos, pico = resultados[fase]
+                fila += [round(segundos, 3), _mb(pico)]
+            filas.append(fila)
+            print(
+                f"{banco:<8} {tamano:>9} {abonos:>8} "
+                + " ".join(f"{resultados[f][0]:>12.3f} {_mb(resultados[f][1]):>13}" for f in FASES)
+            )
+
+    if args.reporte:
+        with open(args.reporte, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            encabezado = ["Banco", "Renglones", "Abonos"]
+            for fase in FASES:
+                encabezado += [f"{fase} (s)", f"{fase} pico (MB)"]
+            writer.writerow(encabezado)
+            writer.writerows(filas)
+        print("Reporte:", args.reporte)
+
+
+if __name__ == "__main__":
+    main()
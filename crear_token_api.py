@@ -0,0 +1,40 @@
+"""
+Crea un token para la API de carga masiva de ventas (POST /api/ventas/lote).
+
+El token se imprime una sola vez; guárdalo en la configuración del ERP. Las ventas que
+se carguen sin vendedor_id quedan a nombre del usuario dueño del token.
+
+Requiere add_api_tokens_table.py.
+
+Uso:
+    python crear_token_api.py <email del usuario> [--nombre ERP]
+"""
+import argparse
+import sqlite3
+
+from modules.api_tokens import crear_token
+
+DB_PATH = "azyco_pagos.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crea un token para la API de ventas.")
+    parser.add_argument("email", help="Usuario dueño del token (vendedor por omisión)")
+    parser.add_argument("--nombre", default="ERP", help="Para qué se usa el token")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DB_PATH)
+    fila = conn.execute("SELECT id FROM usuarios WHERE email = ? AND activo = 1", (args.email,)).fetchone()
+    if not fila:
+        print(f"No existe un usuario activo con email {args.email}.")
+        conn.close()
+        return
+
+    token = crear_token(conn, fila[0], args.nombre)
+    conn.commit()
+    conn.close()
+    print(f"Token para {args.nombre} ({args.email}):")
+    print(token)
+
+if __name__ == "__main__":
+    main()
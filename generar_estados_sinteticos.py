@@ -0,0 +1,159 @@
+"""
+Genera estados de cuenta sintéticos con el mismo layout que esperan los parsers de
+modules/importacion.py, para pruebas de volumen (ver benchmark_importacion.py):
+  - BBVA (.xlsx): número de cuenta en el encabezado de la segunda columna, encabezado real
+    en la fila siguiente, fechas como número de serie de Excel, del más reciente al más antiguo.
+  - Banamex (.csv, latin1): bloque con datos de la cuenta y después el renglón 'Fecha'.
+  - Banorte (.csv, latin1): encabezado en la primera línea con columna 'DEPÓSITOS'.
+  - ANTIGUEDAD (.xlsx): reporte de antigüedad de saldos de venta rápida (cliente en la
+    primera columna, documento en la tercera y neto en la doceava).
+
+Los movimientos mezclan abonos y cargos con saldo corrido, así que la verificación de
+saldos y la marca de agua de BBVA los procesan igual que un archivo real.
+
+Uso:
+    python generar_estados_sinteticos.py <BBVA|BANAMEX|BANORTE|ANTIGUEDAD> <renglones> [--salida archivo] [--semilla 1]
+"""
+import argparse
+import csv
+import random
+from datetime import date, timedelta
+
+from openpyxl import Workbook
+
+BANCOS = ("BBVA", "BANAMEX", "BANORTE")
+EXTENSION = {"BBVA": ".xlsx", "BANAMEX": ".csv", "BANORTE": ".csv", "ANTIGUEDAD": ".xlsx"}
+CUENTA = {"BBVA": "0102520877", "BANAMEX": "YYYYYYYYYY1", "BANORTE": "ZZZZZZZZZZ1"}
+
+CONCEPTOS_ABONO = ["SPEI RECIBIDO", "DEPOSITO EN EFECTIVO", "PAGO CLIENTE", "TRANSFERENCIA", "DEP CHEQUE"]
+CONCEPTOS_CARGO = ["SPEI ENVIADO", "COMISION", "PAGO PROVEEDOR", "IVA COMISION", "RETIRO"]
+CLIENTES = ["ACEROS DEL NORTE", "COMERCIAL AZ", "DISTRIBUIDORA MX", "GRUPO HERRAJES", "FERRETERA SOL"]
+
+# Base de las fechas seriales de Excel (la misma que usa parsear_bbva)
+_BASE_EXCEL = date(1899, 12, 30)
+
+
+def movimientos(renglones: int, semilla: int = 1, inicio: date = date(2024, 1, 1), descendente: bool = False):
+    """
+    Genera renglones (fecha, concepto, referencia, referencia_ampliada, cargo, abono, saldo),
+    en orden cronológico o, con descendente=True, del más reciente al más antiguo (el saldo
+    se corre hacia atrás, sin tener el archivo completo en memoria).
+    Aproximadamente 60% abonos; unos 40 movimientos por día.
+    """
+    rnd = random.Random(semilla)
+    # Los abonos promedian más que los cargos: el saldo sube ~30,000 por renglón
+    saldo = 250000.00 + (30000.00 * renglones if descendente else 0)
+    indices = range(renglones - 1, -1, -1) if descendente else range(renglones)
+    for i in indices:
+        fecha = inicio + timedelta(days=i // 40)
+        referencia = f"{rnd.randrange(10**9):09d}"
+        if rnd.random() < 0.6:
+            abono = round(rnd.uniform(100, 150000), 2)
+            cargo = None
+            cliente = rnd.choice(CLIENTES)
+            concepto = f"{rnd.choice(CONCEPTOS_ABONO)} {cliente}"
+            ref_amp = f"FACT {rnd.randrange(1, 99999)} {cliente}"
+        else:
+            cargo = round(rnd.uniform(10, 80000), 2)
+            abono = None
+            concepto = rnd.choice(CONCEPTOS_CARGO)
+            ref_amp = ""
+        neto = (abono or 0) - (cargo or 0)
+        if descendente:
+            # saldo es el posterior a este movimiento; el anterior se obtiene deshaciéndolo
+            yield fecha, concepto, referencia, ref_amp, cargo, abono, saldo
+            saldo = round(saldo - neto, 2)
+        else:
+            saldo = round(saldo + neto, 2)
+            yield fecha, concepto, referencia, ref_amp, cargo, abono, saldo
+
+
+def escribir_bbva(ruta: str, renglones: int, semilla: int = 1) -> None:
+    # write_only: openpyxl no arma la hoja en memoria (sirve para el millón de renglones)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Movimientos")
+    ws.append(["Cuenta:", CUENTA["BBVA"], None, None, None, None, None])
+    ws.append(["Fecha Operación", "Concepto", "Referencia", "Referencia Ampliada", "Cargo", "Abono", "Saldo"])
+    # BBVA lista del más reciente al más antiguo
+    for fecha, concepto, referencia, ref_amp, cargo, abono, saldo in movimientos(renglones, semilla, descendente=True):
+        ws.append([(fecha - _BASE_EXCEL).days, concepto, referencia, ref_amp, cargo, abono, saldo])
+    wb.save(ruta)
+
+
+def _monto_csv(valor):
+    return "-" if valor is None else f"${valor:,.2f}"
+
+
+def escribir_banamex(ruta: str, renglones: int, semilla: int = 1) -> None:
+    with open(ruta, "w", newline="", encoding="latin1") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Estado de cuenta", "", "", "", ""])
+        writer.writerow(["Cuenta", CUENTA["BANAMEX"], "", "", ""])
+        writer.writerow(["Fecha", "Descripción", "Depósitos", "Retiros", "Saldo"])
+        for fecha, concepto, _, _, cargo, abono, saldo in movimientos(renglones, semilla):
+            writer.writerow([fecha.strftime("%d/%m/%Y"), concepto, _monto_csv(abono), _monto_csv(cargo), _monto_csv(saldo)])
+
+
+def escribir_banorte(ruta: str, renglones: int, semilla: int = 1) -> None:
+    with open(ruta, "w", newline="", encoding="latin1") as f:
+        writer = csv.writer(f)
+        writer.writerow(["FECHA", "DESCRIPCIÓN", "REFERENCIA", "DEPÓSITOS", "RETIROS", "SALDO"])
+        for fecha, concepto, referencia, _, cargo, abono, saldo in movimientos(renglones, semilla):
+            writer.writerow([fecha.strftime("%d/%m/%Y"), concepto, referencia, _monto_csv(abono), _monto_csv(cargo), _monto_csv(saldo)])
+
+
+def escribir_antiguedad(ruta: str, renglones: int, semilla: int = 1) -> None:
+    rnd = random.Random(semilla)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Aging")
+    vacio = [None] * 11
+    ws.append(["Receivables Aging Schedule Details"] + vacio)
+    ws.append(["Organización: AZYCO"] + vacio)
+    escritos = 2
+    cliente_num = 100000
+    while escritos < renglones:
+        ws.append([f"Agente: {rnd.randrange(1, 40)} AGENTE DEMO"] + vacio)
+        escritos += 1
+        for _ in range(rnd.randrange(5, 20)):
+            cliente_num += 1
+            ws.append([f"21-{cliente_num} {rnd.choice(CLIENTES)}"] + vacio)
+            total = 0.0
+            facturas = rnd.randrange(1, 12)
+            for _ in range(facturas):
+                # Algunas notas de crédito (neto negativo) que la venta rápida ignora
+                neto = round(rnd.uniform(-500, 90000), 2)
+                total += neto
+                ws.append([None, "FAC", f"A{rnd.randrange(10**6):06d}"] + [None] * 8 + [neto])
+            ws.append([f"Balance {cliente_num}"] + vacio[:-1] + [round(total, 2)])
+            escritos += facturas + 2
+    wb.save(ruta)
+
+
+ESCRITORES = {
+    "BBVA": escribir_bbva,
+    "BANAMEX": escribir_banamex,
+    "BANORTE": escribir_banorte,
+    "ANTIGUEDAD": escribir_antiguedad,
+}
+
+
+def generar(banco: str, renglones: int, ruta: str, semilla: int = 1) -> str:
+    ESCRITORES[banco](ruta, renglones, semilla)
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera estados de cuenta sintéticos.")
+    parser.add_argument("banco", choices=list(ESCRITORES))
+    parser.add_argument("renglones", type=int)
+    parser.add_argument("--salida", default=None, help="Ruta del archivo a escribir")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    ruta = args.salida or f"sintetico_{args.banco.lower()}_{args.renglones}{EXTENSION[args.banco]}"
+    generar(args.banco, args.renglones, ruta, args.semilla)
+    print("Archivo generado:", ruta)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Importa facturas CFDI (XML) a la tabla facturas, desde una carpeta (recursiva) o un ZIP.
+
+Los XML se leen en paralelo en un pool de procesos, por lotes, y el proceso principal
+hace el upsert por UUID en la BD (SQLite tiene un solo escritor), un commit por lote.
+Volver a importar el mismo ZIP solo actualiza los datos del CFDI: las facturas ya ligadas
+a una venta conservan su venta_id y estado.
+
+Requiere add_facturas_table.py y add_facturas_uuid_column.py.
+
+Uso:
+    python importar_cfdi.py <carpeta|archivo.zip> [--workers 4] [--lote 500]
+"""
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from modules.cfdi import guardar_facturas, iterar_lotes, leer_lote, listar_xml
+
+DB_PATH = "azyco_pagos.db"
+
+# Errores que se imprimen uno por uno (del resto solo se da el total)
+MAX_ERRORES_DETALLE = 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa facturas CFDI (XML) a la tabla facturas.")
+    parser.add_argument("origen", help="Carpeta con XML o archivo ZIP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos para leer los XML")
+    parser.add_argument("--lote", type=int, default=500, help="XML por tarea del pool (y por commit)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    nombres = listar_xml(args.origen)
+    if not nombres:
+        print(f"No se encontraron XML en {args.origen}.")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    totales = {"facturas": 0, "omitidos": 0, "errores": 0}
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futuros = [pool.submit(leer_lote, args.origen, lote) for lote in iterar_lotes(nombres, args.lote)]
+        for futuro in as_completed(futuros):
+            facturas, omitidos, errores = futuro.result()
+            guardar_facturas(conn, facturas)
+            conn.commit()
+
+            totales["facturas"] += len(facturas)
+            totales["omitidos"] += omitidos
+            for nombre, mensaje in errores:
+                if totales["errores"] < MAX_ERRORES_DETALLE:
+                    print(f"{nombre}: {mensaje}")
+                totales["errores"] += 1
+
+    conn.close()
+    print(
+        f"XML leídos: {len(nombres)} | facturas importadas/actualizadas: {totales['facturas']} | "
+        f"no son de ingreso: {totales['omitidos']} | con error: {totales['errores']} | "
+        f"{time.perf_counter() - inicio:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -21,7 +21,11 @@ CREATE TABLE IF NOT EXISTS cuentas_bancarias (
     clabe           TEXT,
     moneda          TEXT NOT NULL DEFAULT 'MXN',
     activa          INTEGER NOT NULL DEFAULT 1,
-    creado_en       DATETIME DEFAULT CURRENT_TIMESTAMP
+    creado_en       DATETIME DEFAULT CURRENT_TIMESTAMP,
+    -- Marca de agua: último movimiento importado (ver cargar_marcas en modules/importacion.py)
+    ultima_fecha_importada      DATE,
+    ultimo_saldo_importado      REAL,
+    ultima_posicion_importada   INTEGER
 );
 
 CREATE TABLE IF NOT EXISTS ventas (
@@ -38,6 +42,7 @@ CREATE TABLE IF NOT EXISTS ventas (
     fecha_creacion          DATETIME DEFAULT CURRENT_TIMESTAMP,
     fecha_ultimo_cambio     DATETIME DEFAULT CURRENT_TIMESTAMP,
     nota                    TEXT,
+    comprobante_filename    TEXT,         -- ver add_comprobante_column.py
     FOREIGN KEY (cuenta_bancaria_id) REFERENCES cuentas_bancarias(id),
     FOREIGN KEY (vendedor_id)        REFERENCES usuarios(id)
 );
@@ -55,15 +60,326 @@ CREATE TABLE IF NOT EXISTS pagos_detectados (
     concepto                TEXT,
     saldo_posterior         REAL,
     fuente_archivo          TEXT,
-    hash_unico              TEXT UNIQUE,
+    archivo_id              INTEGER,      -- archivos_movimientos.id del que salió
+    factura_id              INTEGER,      -- factura que nombra la referencia (modules/conciliacion.py)
+    hash_unico              BLOB UNIQUE,  -- clave_dedup (16 bytes), ver modules/importacion.py
     estado_conciliacion     TEXT NOT NULL CHECK (
                                 estado_conciliacion IN ('PENDIENTE', 'MATCH', 'REVISAR')
                             ) DEFAULT 'PENDIENTE',
     venta_id                INTEGER,
     creado_en               DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (cuenta_bancaria_id) REFERENCES cuentas_bancarias(id),
-    FOREIGN KEY (venta_id)             REFERENCES ventas(id)
+    FOREIGN KEY (venta_id)             REFERENCES ventas(id),
+    FOREIGN KEY (archivo_id)           REFERENCES archivos_movimientos(id)
+);
+
+CREATE TABLE IF NOT EXISTS facturas (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    folio           TEXT NOT NULL,
+    cliente_nombre  TEXT,
+    rfc             TEXT,
+    monto_total     REAL NOT NULL,
+    moneda          TEXT NOT NULL DEFAULT 'MXN',
+    fecha_emision   DATE NOT NULL,
+    venta_id        INTEGER,
+    estado          TEXT NOT NULL DEFAULT 'EMITIDA',
+    creado_en       DATETIME DEFAULT CURRENT_TIMESTAMP,
+    uuid            TEXT,                 -- UUID del timbre fiscal (importar_cfdi.py)
+    FOREIGN KEY (venta_id) REFERENCES ventas(id)
+);
+
+CREATE TABLE IF NOT EXISTS archivos_movimientos (
+    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre_archivo          TEXT NOT NULL,
+    hash_contenido          TEXT UNIQUE,
+    banco                   TEXT NOT NULL,
+    cuenta_bancaria_id      INTEGER,
+    nuevos                  INTEGER NOT NULL DEFAULT 0,
+    duplicados              INTEGER NOT NULL DEFAULT 0,
+    archivo_crudo           TEXT,         -- estado crudo en uploads/estados (modules/archivo_estados.py)
+    importado_en            DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cuenta_bancaria_id) REFERENCES cuentas_bancarias(id)
+);
+
+CREATE TABLE IF NOT EXISTS salud_cuentas (
+    cuenta_bancaria_id      INTEGER PRIMARY KEY,
+    estado                  TEXT NOT NULL CHECK (estado IN ('OK', 'HUECOS', 'SIN_SALDO')),
+    movimientos             INTEGER NOT NULL DEFAULT 0,
+    huecos                  INTEGER NOT NULL DEFAULT 0,
+    monto_faltante          REAL NOT NULL DEFAULT 0,
+    verificado_en           DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cuenta_bancaria_id) REFERENCES cuentas_bancarias(id)
+);
+
+CREATE TABLE IF NOT EXISTS huecos_saldo (
+    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    cuenta_bancaria_id      INTEGER NOT NULL,
+    desde_fecha             DATE,
+    hasta_fecha             DATE,
+    pago_anterior_id        INTEGER,
+    pago_siguiente_id       INTEGER,
+    monto_faltante          REAL NOT NULL,
+    FOREIGN KEY (cuenta_bancaria_id) REFERENCES cuentas_bancarias(id)
+);
+
+-- Consecutivos de folio (ej. 'VR' para venta rápida, ver reservar_folios)
+CREATE TABLE IF NOT EXISTS secuencias_folio (
+    prefijo                 TEXT PRIMARY KEY,
+    ultimo                  INTEGER NOT NULL DEFAULT 0
+);
+
+-- Documentos de cada venta rápida (antes solo vivían como texto en ventas.nota)
+CREATE TABLE IF NOT EXISTS venta_documentos (
+    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    venta_id                INTEGER NOT NULL,
+    documento               TEXT NOT NULL,
+    neto_editado            REAL NOT NULL,
+    neto_original           REAL NOT NULL,
+    FOREIGN KEY (venta_id) REFERENCES ventas(id)
+);
+
+-- Facturas de venta rápida entre el paso 1 y el paso 2 (ver modules/venta_rapida.py)
+CREATE TABLE IF NOT EXISTS venta_rapida_cargas (
+    token                   TEXT PRIMARY KEY,
+    usuario_id              INTEGER NOT NULL,
+    creado_en               DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+);
+
+CREATE TABLE IF NOT EXISTS venta_rapida_facturas (
+    token                   TEXT NOT NULL,
+    idx                     INTEGER NOT NULL,  -- posición en el reporte
+    cliente                 TEXT NOT NULL,
+    documento               TEXT NOT NULL,
+    neto                    REAL NOT NULL,
+    neto_editado            REAL,              -- NULL = sin editar
+    seleccionada            INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (token, idx),
+    FOREIGN KEY (token) REFERENCES venta_rapida_cargas(token)
 );
+
+CREATE TABLE IF NOT EXISTS api_tokens (
+    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id              INTEGER NOT NULL,     -- vendedor por omisión de lo que se cargue
+    nombre                  TEXT NOT NULL,        -- quién lo usa (ej. "ERP")
+    token_hash              TEXT NOT NULL UNIQUE, -- sha256 del token; el token no se guarda
+    activo                  INTEGER NOT NULL DEFAULT 1,
+    creado_en               DATETIME DEFAULT CURRENT_TIMESTAMP,
+    ultimo_uso              DATETIME,
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+);
+
+CREATE TABLE IF NOT EXISTS solicitudes_idempotentes (
+    usuario_id              INTEGER NOT NULL,
+    ruta                    TEXT NOT NULL,
+    clave                   TEXT NOT NULL,
+    estado                  TEXT NOT NULL CHECK (estado IN ('EN_PROCESO', 'LISTO')) DEFAULT 'EN_PROCESO',
+    status                  INTEGER,              -- respuesta original (cuando está LISTO)
+    mimetype                TEXT,
+    location                TEXT,                 -- destino si fue redirect
+    cuerpo                  BLOB,
+    creado_en               DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (usuario_id, ruta, clave)
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS pagos_fts USING fts5(
+    referencia, referencia_ampliada, concepto,
+    content='pagos_detectados', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS ventas_fts USING fts5(
+    folio, cliente_nombre,
+    content='ventas', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS pagos_fts_ai AFTER INSERT ON pagos_detectados BEGIN
+    INSERT INTO pagos_fts (rowid, referencia, referencia_ampliada, concepto)
+    VALUES (new.id, new.referencia, new.referencia_ampliada, new.concepto);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pagos_fts_ad AFTER DELETE ON pagos_detectados BEGIN
+    INSERT INTO pagos_fts (pagos_fts, rowid, referencia, referencia_ampliada, concepto)
+    VALUES ('delete', old.id, old.referencia, old.referencia_ampliada, old.concepto);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pagos_fts_au AFTER UPDATE OF referencia, referencia_ampliada, concepto ON pagos_detectados BEGIN
+    INSERT INTO pagos_fts (pagos_fts, rowid, referencia, referencia_ampliada, concepto)
+    VALUES ('delete', old.id, old.referencia, old.referencia_ampliada, old.concepto);
+    INSERT INTO pagos_fts (rowid, referencia, referencia_ampliada, concepto)
+    VALUES (new.id, new.referencia, new.referencia_ampliada, new.concepto);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ventas_fts_ai AFTER INSERT ON ventas BEGIN
+    INSERT INTO ventas_fts (rowid, folio, cliente_nombre)
+    VALUES (new.id, new.folio, new.cliente_nombre);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ventas_fts_ad AFTER DELETE ON ventas BEGIN
+    INSERT INTO ventas_fts (ventas_fts, rowid, folio, cliente_nombre)
+    VALUES ('delete', old.id, old.folio, old.cliente_nombre);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ventas_fts_au AFTER UPDATE OF folio, cliente_nombre ON ventas BEGIN
+    INSERT INTO ventas_fts (ventas_fts, rowid, folio, cliente_nombre)
+    VALUES ('delete', old.id, old.folio, old.cliente_nombre);
+    INSERT INTO ventas_fts (rowid, folio, cliente_nombre)
+    VALUES (new.id, new.folio, new.cliente_nombre);
+END;
+
+CREATE TABLE IF NOT EXISTS resumen_diario (
+    fecha                   TEXT NOT NULL,                -- YYYY-MM-DD
+    cuenta_bancaria_id      INTEGER NOT NULL,             -- 0: pagos sin cuenta identificada
+    ventas                  INTEGER NOT NULL DEFAULT 0,
+    monto_ventas            REAL NOT NULL DEFAULT 0,
+    ventas_pagadas          INTEGER NOT NULL DEFAULT 0,
+    ventas_pendientes       INTEGER NOT NULL DEFAULT 0,
+    pagos                   INTEGER NOT NULL DEFAULT 0,
+    monto_pagos             REAL NOT NULL DEFAULT 0,
+    pagos_con_venta         INTEGER NOT NULL DEFAULT 0,
+    monto_pagos_con_venta   REAL NOT NULL DEFAULT 0,
+    pagos_sin_venta         INTEGER NOT NULL DEFAULT 0,
+    monto_pagos_sin_venta   REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, cuenta_bancaria_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS resumen_ventas_ai AFTER INSERT ON ventas BEGIN
+    INSERT INTO resumen_diario (fecha, cuenta_bancaria_id, ventas, monto_ventas, ventas_pagadas, ventas_pendientes)
+    SELECT date(new.fecha_creacion), new.cuenta_bancaria_id, 1, new.monto,
+           new.estado_banco = 'PAGADO', new.estado_banco != 'PAGADO'
+    WHERE date(new.fecha_creacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        ventas = ventas + excluded.ventas,
+        monto_ventas = monto_ventas + excluded.monto_ventas,
+        ventas_pagadas = ventas_pagadas + excluded.ventas_pagadas,
+        ventas_pendientes = ventas_pendientes + excluded.ventas_pendientes;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumen_ventas_ad AFTER DELETE ON ventas BEGIN
+    INSERT INTO resumen_diario (fecha, cuenta_bancaria_id, ventas, monto_ventas, ventas_pagadas, ventas_pendientes)
+    SELECT date(old.fecha_creacion), old.cuenta_bancaria_id, -1, -old.monto,
+           -(old.estado_banco = 'PAGADO'), -(old.estado_banco != 'PAGADO')
+    WHERE date(old.fecha_creacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        ventas = ventas + excluded.ventas,
+        monto_ventas = monto_ventas + excluded.monto_ventas,
+        ventas_pagadas = ventas_pagadas + excluded.ventas_pagadas,
+        ventas_pendientes = ventas_pendientes + excluded.ventas_pendientes;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumen_ventas_au
+AFTER UPDATE OF fecha_creacion, cuenta_bancaria_id, monto, estado_banco ON ventas BEGIN
+    INSERT INTO resumen_diario (fecha, cuenta_bancaria_id, ventas, monto_ventas, ventas_pagadas, ventas_pendientes)
+    SELECT date(old.fecha_creacion), old.cuenta_bancaria_id, -1, -old.monto,
+           -(old.estado_banco = 'PAGADO'), -(old.estado_banco != 'PAGADO')
+    WHERE date(old.fecha_creacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        ventas = ventas + excluded.ventas,
+        monto_ventas = monto_ventas + excluded.monto_ventas,
+        ventas_pagadas = ventas_pagadas + excluded.ventas_pagadas,
+        ventas_pendientes = ventas_pendientes + excluded.ventas_pendientes;
+    INSERT INTO resumen_diario (fecha, cuenta_bancaria_id, ventas, monto_ventas, ventas_pagadas, ventas_pendientes)
+    SELECT date(new.fecha_creacion), new.cuenta_bancaria_id, 1, new.monto,
+           new.estado_banco = 'PAGADO', new.estado_banco != 'PAGADO'
+    WHERE date(new.fecha_creacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        ventas = ventas + excluded.ventas,
+        monto_ventas = monto_ventas + excluded.monto_ventas,
+        ventas_pagadas = ventas_pagadas + excluded.ventas_pagadas,
+        ventas_pendientes = ventas_pendientes + excluded.ventas_pendientes;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumen_pagos_ai AFTER INSERT ON pagos_detectados BEGIN
+    INSERT INTO resumen_diario (
+        fecha, cuenta_bancaria_id, pagos, monto_pagos,
+        pagos_con_venta, monto_pagos_con_venta, pagos_sin_venta, monto_pagos_sin_venta
+    )
+    SELECT date(new.fecha_operacion), COALESCE(new.cuenta_bancaria_id, 0), 1, new.monto,
+           new.venta_id IS NOT NULL, CASE WHEN new.venta_id IS NOT NULL THEN new.monto ELSE 0 END,
+           new.venta_id IS NULL, CASE WHEN new.venta_id IS NULL THEN new.monto ELSE 0 END
+    WHERE date(new.fecha_operacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        pagos = pagos + excluded.pagos,
+        monto_pagos = monto_pagos + excluded.monto_pagos,
+        pagos_con_venta = pagos_con_venta + excluded.pagos_con_venta,
+        monto_pagos_con_venta = monto_pagos_con_venta + excluded.monto_pagos_con_venta,
+        pagos_sin_venta = pagos_sin_venta + excluded.pagos_sin_venta,
+        monto_pagos_sin_venta = monto_pagos_sin_venta + excluded.monto_pagos_sin_venta;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumen_pagos_ad AFTER DELETE ON pagos_detectados BEGIN
+    INSERT INTO resumen_diario (
+        fecha, cuenta_bancaria_id, pagos, monto_pagos,
+        pagos_con_venta, monto_pagos_con_venta, pagos_sin_venta, monto_pagos_sin_venta
+    )
+    SELECT date(old.fecha_operacion), COALESCE(old.cuenta_bancaria_id, 0), -1, -old.monto,
+           -(old.venta_id IS NOT NULL), CASE WHEN old.venta_id IS NOT NULL THEN -old.monto ELSE 0 END,
+           -(old.venta_id IS NULL), CASE WHEN old.venta_id IS NULL THEN -old.monto ELSE 0 END
+    WHERE date(old.fecha_operacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        pagos = pagos + excluded.pagos,
+        monto_pagos = monto_pagos + excluded.monto_pagos,
+        pagos_con_venta = pagos_con_venta + excluded.pagos_con_venta,
+        monto_pagos_con_venta = monto_pagos_con_venta + excluded.monto_pagos_con_venta,
+        pagos_sin_venta = pagos_sin_venta + excluded.pagos_sin_venta,
+        monto_pagos_sin_venta = monto_pagos_sin_venta + excluded.monto_pagos_sin_venta;
+END;
+
+CREATE TRIGGER IF NOT EXISTS resumen_pagos_au
+AFTER UPDATE OF fecha_operacion, cuenta_bancaria_id, monto, venta_id ON pagos_detectados BEGIN
+    INSERT INTO resumen_diario (
+        fecha, cuenta_bancaria_id, pagos, monto_pagos,
+        pagos_con_venta, monto_pagos_con_venta, pagos_sin_venta, monto_pagos_sin_venta
+    )
+    SELECT date(old.fecha_operacion), COALESCE(old.cuenta_bancaria_id, 0), -1, -old.monto,
+           -(old.venta_id IS NOT NULL), CASE WHEN old.venta_id IS NOT NULL THEN -old.monto ELSE 0 END,
+           -(old.venta_id IS NULL), CASE WHEN old.venta_id IS NULL THEN -old.monto ELSE 0 END
+    WHERE date(old.fecha_operacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        pagos = pagos + excluded.pagos,
+        monto_pagos = monto_pagos + excluded.monto_pagos,
+        pagos_con_venta = pagos_con_venta + excluded.pagos_con_venta,
+        monto_pagos_con_venta = monto_pagos_con_venta + excluded.monto_pagos_con_venta,
+        pagos_sin_venta = pagos_sin_venta + excluded.pagos_sin_venta,
+        monto_pagos_sin_venta = monto_pagos_sin_venta + excluded.monto_pagos_sin_venta;
+    INSERT INTO resumen_diario (
+        fecha, cuenta_bancaria_id, pagos, monto_pagos,
+        pagos_con_venta, monto_pagos_con_venta, pagos_sin_venta, monto_pagos_sin_venta
+    )
+    SELECT date(new.fecha_operacion), COALESCE(new.cuenta_bancaria_id, 0), 1, new.monto,
+           new.venta_id IS NOT NULL, CASE WHEN new.venta_id IS NOT NULL THEN new.monto ELSE 0 END,
+           new.venta_id IS NULL, CASE WHEN new.venta_id IS NULL THEN new.monto ELSE 0 END
+    WHERE date(new.fecha_operacion) IS NOT NULL
+    ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+        pagos = pagos + excluded.pagos,
+        monto_pagos = monto_pagos + excluded.monto_pagos,
+        pagos_con_venta = pagos_con_venta + excluded.pagos_con_venta,
+        monto_pagos_con_venta = monto_pagos_con_venta + excluded.monto_pagos_con_venta,
+        pagos_sin_venta = pagos_sin_venta + excluded.pagos_sin_venta,
+        monto_pagos_sin_venta = monto_pagos_sin_venta + excluded.monto_pagos_sin_venta;
+END;
+
+CREATE INDEX IF NOT EXISTS idx_facturas_folio ON facturas(folio);
+CREATE INDEX IF NOT EXISTS idx_facturas_fecha ON facturas(fecha_emision);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_facturas_uuid ON facturas(uuid);
+CREATE INDEX IF NOT EXISTS idx_huecos_saldo_cuenta ON huecos_saldo(cuenta_bancaria_id);
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_archivo ON pagos_detectados(archivo_id);
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_fecha ON pagos_detectados(fecha_operacion, id);
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_estado_fecha ON pagos_detectados(estado_conciliacion, fecha_operacion, id);
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_banco_fecha ON pagos_detectados(banco, fecha_operacion, id);
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_cuenta_fecha ON pagos_detectados(cuenta_bancaria_id, fecha_operacion);
+CREATE INDEX IF NOT EXISTS idx_pagos_detectados_monto ON pagos_detectados(monto);
+CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha_creacion);
+CREATE INDEX IF NOT EXISTS idx_ventas_vendedor_fecha ON ventas(vendedor_id, fecha_creacion);
+CREATE INDEX IF NOT EXISTS idx_ventas_cuenta_monto ON ventas(cuenta_bancaria_id, monto);
+CREATE INDEX IF NOT EXISTS idx_venta_rapida_cargas_creado ON venta_rapida_cargas(creado_en);
+CREATE INDEX IF NOT EXISTS idx_venta_rapida_facturas_neto ON venta_rapida_facturas(token, neto);
+CREATE INDEX IF NOT EXISTS idx_venta_rapida_facturas_sel ON venta_rapida_facturas(token) WHERE seleccionada = 1;
+CREATE INDEX IF NOT EXISTS idx_solicitudes_idempotentes_creado ON solicitudes_idempotentes(creado_en);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ventas_folio ON ventas(folio);
+CREATE INDEX IF NOT EXISTS idx_venta_documentos_venta ON venta_documentos(venta_id);
+CREATE INDEX IF NOT EXISTS idx_venta_documentos_documento ON venta_documentos(documento);
 """
 
 def init_db():
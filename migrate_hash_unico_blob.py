@@ -0,0 +1,209 @@
+"""
+Convierte pagos_detectados.hash_unico a la llave BLOB de 16 bytes (clave_dedup).
+
+SQLite no permite cambiar el tipo de una columna UNIQUE en sitio, así que se reconstruye
+la tabla a partir de su propia definición (sqlite_master): mismas columnas, con
+hash_unico como BLOB, y se vuelven a crear sus índices y triggers (búsqueda, resumen
+diario...). Todo va en una transacción.
+
+Si dos renglones quedan con la misma llave nueva (p. ej. el mismo movimiento cargado dos
+veces con hashes viejos distintos), no se borra ninguno: se cancela la migración, se
+listan los pares y hay que resolverlos a mano antes de volver a correrla.
+
+Antes de tocar azyco_pagos.db siempre corre probar(): la misma migración sobre una base
+en memoria con el esquema completo, incluido el caso de llaves repetidas. Si esa prueba
+falla no se migra nada.
+
+Uso:
+    python migrate_hash_unico_blob.py            # prueba en memoria y migra azyco_pagos.db
+    python migrate_hash_unico_blob.py --probar   # solo la prueba en memoria
+"""
+import argparse
+import re
+import sqlite3
+import sys
+from typing import Optional
+
+from modules.importacion import clave_dedup
+
+DB_PATH = "azyco_pagos.db"
+
+
+class ClavesRepetidas(Exception):
+    """Renglones distintos de pagos_detectados con la misma llave nueva: [(id, id_previo), ...]."""
+
+    def __init__(self, pares):
+        super().__init__(f"{len(pares)} renglones repiten la llave nueva de otro")
+        self.pares = pares
+
+
+def tipo_hash_unico(conn: sqlite3.Connection) -> str:
+    for fila in conn.execute("PRAGMA table_info(pagos_detectados)"):
+        if fila[1] == "hash_unico":
+            return (fila[2] or "").upper()
+    return ""
+
+
+def migrar(conn: sqlite3.Connection) -> Optional[int]:
+    """
+    Reconstruye pagos_detectados con hash_unico BLOB. Devuelve cuántos renglones copió, o
+    None si ya estaba migrada. Si hay llaves repetidas deja todo como estaba y lanza
+    ClavesRepetidas.
+    """
+    if tipo_hash_unico(conn) == "BLOB":
+        return None
+
+    (sql_tabla,) = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'pagos_detectados'"
+    ).fetchone()
+    # Índices explícitos (los de UNIQUE se crean solos) y triggers de la tabla
+    extras = [
+        sql
+        for (sql,) in conn.execute(
+            """
+            SELECT sql FROM sqlite_master
+            WHERE tbl_name = 'pagos_detectados' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+            ORDER BY type, name
+            """
+        )
+    ]
+    columnas = [fila[1] for fila in conn.execute("PRAGMA table_info(pagos_detectados)")]
+
+    sql_nueva, n = re.subn(r"^CREATE TABLE\s+\"?pagos_detectados\"?", "CREATE TABLE pagos_detectados_nueva", sql_tabla)
+    sql_nueva, m = re.subn(r"(\bhash_unico\s+)\w+", r"\1BLOB", sql_nueva, count=1)
+    if not (n and m):
+        raise RuntimeError("No se reconoció la definición de pagos_detectados en sqlite_master.")
+
+    lista = ", ".join(columnas)
+    insert = f"INSERT INTO pagos_detectados_nueva ({lista}) VALUES ({', '.join('?' for _ in columnas)})"
+    i_hash = columnas.index("hash_unico")
+
+    aislamiento = conn.isolation_level
+    conn.isolation_level = None  # transacción explícita: el DDL también se deshace
+    conn.execute("BEGIN")
+    try:
+        conn.execute(sql_nueva)
+        total = 0
+        repetidas = []
+        lector = conn.execute(f"SELECT {lista} FROM pagos_detectados ORDER BY id")
+        while True:
+            filas = lector.fetchmany(5000)
+            if not filas:
+                break
+            for fila in filas:
+                valores = list(fila)
+                valores[i_hash] = clave_dedup(dict(zip(columnas, fila)))
+                try:
+                    conn.execute(insert, valores)
+                except sqlite3.IntegrityError:
+                    (previo,) = conn.execute(
+                        "SELECT id FROM pagos_detectados_nueva WHERE hash_unico = ?", (valores[i_hash],)
+                    ).fetchone()
+                    repetidas.append((fila[columnas.index("id")], previo))
+                total += 1
+        if repetidas:
+            raise ClavesRepetidas(repetidas)
+
+        conn.execute("DROP TABLE pagos_detectados")
+        conn.execute("ALTER TABLE pagos_detectados_nueva RENAME TO pagos_detectados")
+        for sql in extras:
+            conn.execute(sql)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = aislamiento
+    return total
+
+
+def probar() -> None:
+    """Corre la migración sobre una base en memoria con el esquema completo y hash_unico TEXT."""
+    from init_db import schema
+
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(re.sub(r"(\bhash_unico\s+)BLOB", r"\1TEXT", schema, count=1))
+    extras_antes = conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE tbl_name = 'pagos_detectados' AND sql IS NOT NULL ORDER BY 1, 2"
+    ).fetchall()
+    assert tipo_hash_unico(conn) == "TEXT"
+
+    # Mismo movimiento con dos hashes viejos distintos (solo cambia la hora, que no entra en la llave)
+    movimiento = ("BBVA", 1, "2025-01-02", 150.0, "REF1", "FA-1001", "PAGO FA-1001")
+    for hora, hash_viejo in (("10:00", "a" * 64), ("10:05", "b" * 64)):
+        conn.execute(
+            """
+            INSERT INTO pagos_detectados (banco, cuenta_bancaria_id, fecha_operacion, monto, referencia,
+                                          referencia_ampliada, concepto, hora_operacion, hash_unico)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (*movimiento, hora, hash_viejo),
+        )
+    conn.commit()
+
+    try:
+        migrar(conn)
+    except ClavesRepetidas as e:
+        assert e.pares == [(2, 1)], e.pares
+    else:
+        raise AssertionError("La migración debió cancelarse por la llave repetida.")
+    assert tipo_hash_unico(conn) == "TEXT", "La tabla vieja debió quedar intacta"
+    assert conn.execute("SELECT COUNT(*) FROM pagos_detectados").fetchone()[0] == 2
+    assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'pagos_detectados_nueva'").fetchone()
+
+    # Resuelto a mano el duplicado, la migración pasa y conserva índices y triggers
+    conn.execute("DELETE FROM pagos_detectados WHERE id = 2")
+    conn.commit()
+    assert migrar(conn) == 1
+    assert tipo_hash_unico(conn) == "BLOB"
+    extras_despues = conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE tbl_name = 'pagos_detectados' AND sql IS NOT NULL ORDER BY 1, 2"
+    ).fetchall()
+    assert extras_despues == extras_antes, (extras_antes, extras_despues)
+    columnas = conn.execute("SELECT hash_unico, typeof(hash_unico) FROM pagos_detectados").fetchone()
+    assert columnas[1] == "blob" and len(columnas[0]) == 16
+
+    # Ya migrada (aunque la tabla esté vacía) no se vuelve a reconstruir
+    conn.execute("DELETE FROM pagos_detectados")
+    conn.commit()
+    assert migrar(conn) is None
+    conn.close()
+    print("OK: la llave repetida cancela la migración sin borrar renglones; índices y triggers se conservan.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte pagos_detectados.hash_unico a BLOB de 16 bytes.")
+    parser.add_argument("--probar", action="store_true", help="Solo revisa la migración en una base en memoria")
+    args = parser.parse_args()
+
+    # La reconstrucción tira y vuelve a crear pagos_detectados: primero se prueba en memoria
+    try:
+        probar()
+    except AssertionError as e:
+        print(f"La prueba en memoria falló, no se migró {DB_PATH}: {e}")
+        sys.exit(1)
+    if args.probar:
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        total = migrar(conn)
+    except ClavesRepetidas as e:
+        conn.close()
+        print("No se migró: hay renglones que quedarían con la misma llave (id, id con el que choca):")
+        for par in e.pares:
+            print(f"  {par}")
+        print("Revísalos y borra o corrige los duplicados antes de volver a correr la migración.")
+        sys.exit(1)
+
+    if total is None:
+        print("pagos_detectados ya usa hash_unico BLOB, nada que hacer.")
+        conn.close()
+        return
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"pagos_detectados migrada a hash_unico BLOB: {total} renglones.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Llena saldo_posterior de los depósitos de Banamex y Banorte que se importaron cuando sus
+parsers todavía no leían la columna Saldo / SALDO.
+
+saldo_posterior entra en hash_unico (clave_dedup), así que sin esta migración volver a
+subir un estado ya cargado metería otra vez sus depósitos (con saldo, otra llave). Aquí
+cada depósito se vuelve a normalizar, se busca su renglón por la llave vieja (sin saldo)
+y se le ponen el saldo y la llave nueva: no cambia su id, conciliación ni venta ligada.
+
+  - Archivos con estado crudo archivado (uploads/estados): se procesan solos.
+  - Archivos importados antes del archivo de estados: hay que pasar los CSV originales.
+
+Al final se verifica la cadena de saldos de las cuentas tocadas (ver verificacion_saldos).
+Requiere hash_unico BLOB (migrate_hash_unico_blob.py).
+
+Uso:
+    python migrate_saldo_posterior_csv.py [estado_banamex.csv estado_banorte.csv ...]
+"""
+import argparse
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from modules.archivo_estados import cargar_estado
+from modules.importacion import NORMALIZADORES, clave_dedup, olfatear_archivo, parsear_archivo, resolver_cuenta
+from modules.verificacion_saldos import verificar_saldos
+
+DB_PATH = "azyco_pagos.db"
+
+BANCOS = ("BANAMEX", "BANORTE")
+
+
+def rellenar_saldos(
+    db: sqlite3.Connection, cuenta_bancaria_id: Optional[int], registros: Iterable[Dict[str, Any]]
+) -> Tuple[int, int]:
+    """
+    Pone saldo_posterior y la llave nueva a los renglones que se guardaron sin saldo.
+    Devuelve (actualizados, repetidos): repetidos son depósitos que ya se volvieron a
+    importar con saldo, así que el renglón viejo quedó duplicado (se deja y se reporta).
+    """
+    actualizados = repetidos = 0
+    for r in registros:
+        if r.get("saldo_posterior") is None:
+            continue
+        r["cuenta_bancaria_id"] = cuenta_bancaria_id
+        llave_vieja = clave_dedup(dict(r, saldo_posterior=None))
+        try:
+            cur = db.execute(
+                """
+                UPDATE pagos_detectados
+                SET saldo_posterior = ?, hash_unico = ?
+                WHERE hash_unico = ? AND saldo_posterior IS NULL
+                """,
+                (r["saldo_posterior"], clave_dedup(r), llave_vieja),
+            )
+        except sqlite3.IntegrityError:
+            repetidos += 1
+            continue
+        actualizados += cur.rowcount
+    return actualizados, repetidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Llena saldo_posterior de los depósitos de Banamex y Banorte.")
+    parser.add_argument("archivos", nargs="*", help="CSV originales importados antes del archivo de estados")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DB_PATH)
+    actualizados = repetidos = 0
+    cuentas = set()
+
+    archivados = conn.execute(
+        f"""
+        SELECT banco, cuenta_bancaria_id, nombre_archivo, archivo_crudo
+        FROM archivos_movimientos
+        WHERE banco IN ({", ".join("?" for _ in BANCOS)}) AND archivo_crudo IS NOT NULL
+        ORDER BY id
+        """,
+        BANCOS,
+    ).fetchall()
+    for banco, cuenta_id, nombre_archivo, archivo_crudo in archivados:
+        _, normalizar = NORMALIZADORES[banco]
+        try:
+            _, registros, _ = normalizar(cargar_estado(archivo_crudo), nombre_archivo)
+        except Exception as e:
+            print(f"{nombre_archivo}: no se pudo leer el estado archivado ({e}).")
+            continue
+        a, r = rellenar_saldos(conn, cuenta_id, registros)
+        actualizados += a
+        repetidos += r
+        cuentas.add(cuenta_id)
+
+    for ruta in args.archivos:
+        nombre_archivo = os.path.basename(ruta)
+        banco, _ = olfatear_archivo(ruta, nombre_archivo)
+        if banco not in BANCOS:
+            print(f"{nombre_archivo}: no es un estado de Banamex ni de Banorte, se omite.")
+            continue
+        cuenta_id = resolver_cuenta(conn, banco, None)
+        _, registros, _ = parsear_archivo(banco, ruta, nombre_archivo)
+        a, r = rellenar_saldos(conn, cuenta_id, registros)
+        actualizados += a
+        repetidos += r
+        cuentas.add(cuenta_id)
+
+    for cuenta_id in cuentas - {None}:
+        verificar_saldos(conn, cuenta_id)
+    conn.commit()
+
+    (sin_saldo,) = conn.execute(
+        f"""
+        SELECT COUNT(*) FROM pagos_detectados
+        WHERE banco IN ({", ".join("?" for _ in BANCOS)}) AND saldo_posterior IS NULL
+        """,
+        BANCOS,
+    ).fetchone()
+    conn.close()
+
+    print(f"Depósitos con saldo_posterior llenado: {actualizados}.")
+    if repetidos:
+        print(f"Depósitos que ya estaban cargados otra vez con saldo (renglón viejo duplicado): {repetidos}.")
+    if sin_saldo:
+        print(
+            f"Siguen sin saldo {sin_saldo} depósitos de Banamex / Banorte: pasa sus CSV originales "
+            "como argumentos para llenarlos."
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from modules import cache_parseo
+from modules.excel_streaming import leer_excel
+
+# Reporte de antigüedad de saldos (Receivables Aging Schedule) que se sube en venta rápida.
+# Del reporte solo se usan tres columnas: la de cliente (también trae los renglones de
+# agente / organización / balance), la del documento y la del neto.
+
+COL_CLIENTE = "Receivables Aging Schedule Details"
+COL_DOC = "Unnamed: 2"
+COL_NETO = "Unnamed: 11"
+COLUMNAS = [COL_CLIENTE, COL_DOC, COL_NETO]
+
+# Versión de la extracción para la caché de parseo: subirla si cambia lo que regresa extraer_facturas
+VERSION_FACTURAS = 1
+
+
+def leer_antiguedad(archivo, nombre_archivo: str) -> pd.DataFrame:
+    """Lee en streaming solo las columnas del reporte que se usan."""
+    return leer_excel(archivo, nombre_archivo, columnas=COLUMNAS)
+
+
+def formato_valido(df: pd.DataFrame) -> bool:
+    return all(c in df.columns for c in COLUMNAS)
+
+
+def _netos(neto: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    (valor, convertible): el neto como float y si float(neto) habría funcionado.
+    Una columna numérica se convierte completa; en una columna mixta solo los valores
+    que no son número (texto, fechas) pasan uno por uno por float().
+    """
+    if is_numeric_dtype(neto):
+        return neto.astype(float), pd.Series(True, index=neto.index)
+
+    es_numero = neto.map(lambda v: isinstance(v, (int, float, np.number)))
+    valores = pd.to_numeric(neto.where(es_numero), errors="coerce").astype(float)
+    convertible = es_numero.copy()
+
+    otros = neto.notna() & ~es_numero
+    if otros.any():
+        def convertir(v):
+            try:
+                return True, float(v)
+            except Exception:
+                return False, np.nan
+
+        resultado = [convertir(v) for v in neto[otros]]
+        convertible[otros] = [ok for ok, _ in resultado]
+        valores[otros] = [valor for _, valor in resultado]
+    return valores, convertible
+
+
+def extraer_facturas(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Facturas con neto positivo, cada una con el cliente del último renglón de cliente."""
+    if df.empty:
+        return []
+    col_cliente = df[COL_CLIENTE]
+    doc = df[COL_DOC]
+
+    # Renglón de cliente (ej. '21-100074 JAIME ...'): texto con guion que no es de
+    # agente / organización / balance
+    es_texto = col_cliente.map(lambda v: isinstance(v, str))
+    texto = col_cliente.where(es_texto, "").astype(str)
+    es_cliente = (
+        es_texto
+        & texto.str.contains("-", regex=False)
+        & ~texto.str.contains("Agente", regex=False)
+        & ~texto.str.contains("Organización", regex=False)
+        & ~texto.str.contains("Balance", regex=False)
+    )
+    # Cada renglón se queda con el último cliente visto arriba de él (forward-fill por el
+    # número de renglones de cliente acumulados; 0 = todavía no hay cliente -> "")
+    nombres = np.array([""] + texto[es_cliente].str.strip().tolist(), dtype=object)
+    cliente = pd.Series(nombres[es_cliente.cumsum().to_numpy()], index=df.index)
+
+    # Renglones de factura: doc no nulo, neto numérico positivo ("no <= 0" y no "> 0",
+    # igual que el ciclo original, que dejaba pasar un neto 'nan' escrito como texto)
+    neto, convertible = _netos(df[COL_NETO])
+    es_factura = ~es_cliente & doc.notna() & df[COL_NETO].notna() & convertible & ~(neto <= 0)
+
+    return [
+        {"cliente": c, "documento": d, "neto": n}
+        for c, d, n in zip(
+            cliente[es_factura].tolist(),
+            doc[es_factura].astype(str).str.strip().tolist(),
+            neto[es_factura].tolist(),
+        )
+    ]
+
+
+def facturas_antiguedad(archivo, nombre_archivo: str, sha256_archivo: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Facturas del reporte, o None si el Excel no tiene el formato esperado.
+    Con el sha del contenido se usa la caché de parseo (modules/cache_parseo.py).
+    """
+    if sha256_archivo:
+        guardadas = cache_parseo.obtener("ANTIGUEDAD", VERSION_FACTURAS, sha256_archivo)
+        if guardadas is not None:
+            return guardadas.to_dict("records")
+
+    df = leer_antiguedad(archivo, nombre_archivo)
+    if not formato_valido(df):
+        return None
+    facturas = extraer_facturas(df)
+
+    if sha256_archivo:
+        tabla = pd.DataFrame(facturas, columns=["cliente", "documento", "neto"])
+        cache_parseo.guardar("ANTIGUEDAD", VERSION_FACTURAS, sha256_archivo, tabla)
+    return facturas
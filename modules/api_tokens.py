@@ -0,0 +1,44 @@
+import hashlib
+import secrets
+import sqlite3
+from typing import Optional
+
+# Tokens de acceso para integraciones (el ERP) que llaman a /api/... sin sesión.
+#
+# El token se muestra una sola vez al crearlo (crear_token_api.py); en la base solo queda
+# su sha256, que basta para buscarlo porque el token es aleatorio de 32 bytes. Cada token
+# pertenece a un usuario, que es el vendedor por omisión de lo que se cargue con él.
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def crear_token(db: sqlite3.Connection, usuario_id: int, nombre: str) -> str:
+    """Crea un token para `usuario_id` y lo devuelve en claro. No hace commit."""
+    token = secrets.token_urlsafe(32)
+    db.execute(
+        "INSERT INTO api_tokens (usuario_id, nombre, token_hash) VALUES (?, ?, ?)",
+        (usuario_id, nombre, _hash_token(token)),
+    )
+    return token
+
+
+def usuario_de_token(db: sqlite3.Connection, token: str) -> Optional[int]:
+    """usuario_id del token si está activo (y su usuario también), o None. Registra el uso."""
+    if not token:
+        return None
+    fila = db.execute(
+        """
+        SELECT t.id, t.usuario_id
+        FROM api_tokens t
+        JOIN usuarios u ON u.id = t.usuario_id
+        WHERE t.token_hash = ? AND t.activo = 1 AND u.activo = 1
+        """,
+        (_hash_token(token),),
+    ).fetchone()
+    if not fila:
+        return None
+    db.execute("UPDATE api_tokens SET ultimo_uso = CURRENT_TIMESTAMP WHERE id = ?", (fila[0],))
+    db.commit()
+    return fila[1]
@@ -0,0 +1,71 @@
+import gzip
+import os
+import shutil
+from io import BytesIO
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+# Archivo de estados de cuenta crudos (uploads/estados).
+#
+# Al importar un archivo guardamos lo que el banco mandó, no solo los abonos que
+# quedan en pagos_detectados, para poder correr los parsers corregidos sobre cargas
+# viejas sin pedirle los archivos a tesorería (ver reprocesar_estados.py):
+#   - BBVA / Banamex / Banorte: la tabla leída por pandas, todas las celdas como texto,
+#     en Parquet comprimido con zstd (se relee mucho más rápido que el Excel original).
+#   - CAMT.053 / MT940: el archivo original comprimido con gzip (sus parsers ya leen en
+#     streaming, no hay tabla que guardar).
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARPETA_ESTADOS = os.path.join(BASE_DIR, "uploads", "estados")
+
+
+def tabla_cruda(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tabla tal cual la leyó pandas con el encabezado como primera fila y todas las celdas
+    como texto (str(valor), igual que lo que terminan viendo los parsers); vacío = NaN.
+    """
+    encabezado = pd.DataFrame([list(df.columns)], columns=df.columns)
+    crudo = pd.concat([encabezado, df], ignore_index=True)
+    crudo = crudo.astype(str).where(crudo.notna(), np.nan)
+    crudo.columns = [str(i) for i in range(crudo.shape[1])]
+    return crudo
+
+
+def archivar_estado(archivo_id: int, sha256_archivo: Optional[str], crudo: Any) -> str:
+    """
+    Escribe el estado crudo del archivo de archivos_movimientos y devuelve el nombre del
+    archivo dentro de CARPETA_ESTADOS. crudo es la tabla_cruda (DataFrame) o, para los
+    formatos en streaming, la ruta / BytesIO del archivo original.
+    """
+    os.makedirs(CARPETA_ESTADOS, exist_ok=True)
+    base = f"{archivo_id}_{(sha256_archivo or 'sinhash')[:12]}"
+
+    if isinstance(crudo, pd.DataFrame):
+        nombre = base + ".parquet"
+        crudo.to_parquet(os.path.join(CARPETA_ESTADOS, nombre), compression="zstd", index=False)
+        return nombre
+
+    nombre = base + ".gz"
+    with gzip.open(os.path.join(CARPETA_ESTADOS, nombre), "wb") as destino:
+        if isinstance(crudo, str):
+            with open(crudo, "rb") as origen:
+                shutil.copyfileobj(origen, destino)
+        else:
+            destino.write(crudo.getvalue())
+    return nombre
+
+
+def cargar_estado(nombre: str):
+    """
+    Lee un estado archivado: DataFrame (tabla_cruda) para .parquet, BytesIO con el
+    contenido original para .gz.
+    """
+    ruta = os.path.join(CARPETA_ESTADOS, nombre)
+    if nombre.endswith(".parquet"):
+        crudo = pd.read_parquet(ruta).astype(object)
+        # pyarrow regresa None en las celdas vacías; los parsers esperan NaN
+        return crudo.where(crudo.notna(), np.nan)
+    with gzip.open(ruta, "rb") as f:
+        return BytesIO(f.read())
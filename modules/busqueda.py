@@ -0,0 +1,154 @@
+import re
+import sqlite3
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+# Búsqueda de texto completo (FTS5) sobre pagos (referencia, referencia ampliada, concepto)
+# y ventas (folio, cliente). Las tablas pagos_fts y ventas_fts son índices "external
+# content": no guardan el texto, solo apuntan al id de pagos_detectados / ventas, y los
+# triggers de add_busqueda_fts.py las mantienen al día en cada INSERT / UPDATE / DELETE.
+#
+# Lo que se escribe en el buscador se parte en palabras; cada palabra busca por prefijo y
+# todas tienen que aparecer. Una palabra con guiones o puntos ("VR-2110", "A.1234") busca
+# sus partes seguidas, así que los folios se encuentran escribiendo solo su inicio.
+#
+# Candidatos: primero los que tienen todas las palabras completas en la referencia / folio
+# (una búsqueda exacta, sin prefijo, que trae pocos renglones), y después las
+# VENTANA_RANKING coincidencias por prefijo más recientes (id más alto; FTS5 las entrega
+# sin recorrer el resto). Así un folio o referencia viejo escrito completo no se pierde
+# aunque el prefijo coincida con miles de movimientos más nuevos. Los candidatos se ordenan
+# aquí por relevancia: palabra completa antes que inicio de palabra, y en la referencia /
+# folio antes que en el resto; a igual relevancia, la más reciente. No se usa bm25 de FTS5
+# porque necesita contar en cuántos renglones aparece cada palabra, y las que traen casi
+# todos los movimientos ("SPEI", "PAGO") aparecen en millones.
+
+MAX_RESULTADOS = 50
+MAX_PALABRAS = 8
+VENTANA_RANKING = 1000
+
+_PARTES = re.compile(r"\w+", re.UNICODE)
+
+
+def _palabras(texto: str) -> List[List[str]]:
+    """Palabras de la búsqueda, cada una como lista de partes."""
+    palabras = []
+    for palabra in (texto or "").split()[:MAX_PALABRAS]:
+        partes = _PARTES.findall(palabra)
+        # Una letra o dígito suelto coincide con casi todo y no acota nada
+        if partes and len("".join(partes)) > 1:
+            palabras.append(partes)
+    return palabras
+
+
+def consulta_fts(texto: str, prefijo: bool = True, columnas: Sequence[str] = ()) -> Optional[str]:
+    """
+    Expresión MATCH de FTS5 para lo que escribió el usuario, o None si no hay qué buscar.
+    Con prefijo=False cada palabra tiene que aparecer completa; `columnas` limita la
+    búsqueda a esas columnas.
+    """
+    # Las comillas hacen de cada palabra una frase: nada del texto se toma como operador
+    # de FTS5 (AND, NEAR, columnas...)
+    fin = "*" if prefijo else ""
+    frases = ['"' + " ".join(partes) + '"' + fin for partes in _palabras(texto)]
+    if not frases:
+        return None
+    if columnas:
+        return "{" + " ".join(columnas) + "} : (" + " AND ".join(frases) + ")"
+    return " AND ".join(frases)
+
+
+def _normalizar(texto: Optional[str]) -> List[str]:
+    # Igual que el tokenizador (unicode61 remove_diacritics): minúsculas y sin acentos
+    sin_acentos = "".join(
+        c for c in unicodedata.normalize("NFKD", (texto or "").lower()) if not unicodedata.combining(c)
+    )
+    return _PARTES.findall(sin_acentos)
+
+
+def _relevancia(partes: List[str], principales: Sequence[Optional[str]], otros: Sequence[Optional[str]]) -> int:
+    """2 por parte que es palabra completa, 1 si solo es inicio; el doble en las columnas principales."""
+    puntos = 0
+    for peso, columnas in ((2, principales), (1, otros)):
+        tokens = set()
+        for valor in columnas:
+            tokens.update(_normalizar(valor))
+        for parte in partes:
+            if parte in tokens:
+                puntos += 2 * peso
+            elif any(t.startswith(parte) for t in tokens):
+                puntos += peso
+    return puntos
+
+
+def _ids_recientes(db: sqlite3.Connection, tabla: str, consulta: str) -> List[int]:
+    return [
+        rowid
+        for (rowid,) in db.execute(
+            f"SELECT rowid FROM {tabla} WHERE {tabla} MATCH ? ORDER BY rowid DESC LIMIT ?",
+            (consulta, VENTANA_RANKING),
+        )
+    ]
+
+
+def _ids_candidatos(db: sqlite3.Connection, tabla: str, texto: str, principales: Sequence[str]) -> List[int]:
+    """Ids exactos en las columnas principales y luego la ventana por prefijo, sin repetir."""
+    exactos = _ids_recientes(db, tabla, consulta_fts(texto, prefijo=False, columnas=principales))
+    return list(dict.fromkeys(exactos + _ids_recientes(db, tabla, consulta_fts(texto))))
+
+
+def _ordenar(
+    filas: List[Dict[str, Any]],
+    texto: str,
+    principales: Sequence[str],
+    otros: Sequence[str],
+    limite: int,
+) -> List[Dict[str, Any]]:
+    partes = [p for palabra in _palabras(texto) for p in _normalizar(" ".join(palabra))]
+    puntos = {
+        f["id"]: _relevancia(partes, [f[c] for c in principales], [f[c] for c in otros])
+        for f in filas
+    }
+    filas.sort(key=lambda f: (-puntos[f["id"]], -f["id"]))
+    return filas[:limite]
+
+
+def buscar_pagos(db: sqlite3.Connection, texto: str, limite: int = MAX_RESULTADOS) -> List[Dict[str, Any]]:
+    if consulta_fts(texto) is None:
+        return []
+    ids = _ids_candidatos(db, "pagos_fts", texto, ("referencia",))
+    if not ids:
+        return []
+    cur = db.execute(
+        f"""
+        SELECT p.id, p.fecha_operacion, p.monto, p.banco, p.referencia, p.referencia_ampliada,
+               p.concepto, p.estado_conciliacion, c.alias AS cuenta_alias, v.folio AS venta_folio
+        FROM pagos_detectados p
+        LEFT JOIN cuentas_bancarias c ON p.cuenta_bancaria_id = c.id
+        LEFT JOIN ventas v ON p.venta_id = v.id
+        WHERE p.id IN ({",".join("?" * len(ids))})
+        """,
+        ids,
+    )
+    filas = [dict(fila) for fila in cur.fetchall()]
+    return _ordenar(filas, texto, ("referencia",), ("referencia_ampliada", "concepto"), limite)
+
+
+def buscar_ventas(db: sqlite3.Connection, texto: str, limite: int = MAX_RESULTADOS) -> List[Dict[str, Any]]:
+    if consulta_fts(texto) is None:
+        return []
+    ids = _ids_candidatos(db, "ventas_fts", texto, ("folio",))
+    if not ids:
+        return []
+    cur = db.execute(
+        f"""
+        SELECT v.id, v.folio, v.cliente_nombre, v.monto, v.estado_banco, v.fecha_creacion,
+               c.alias AS cuenta_alias, u.nombre AS vendedor_nombre
+        FROM ventas v
+        LEFT JOIN cuentas_bancarias c ON v.cuenta_bancaria_id = c.id
+        LEFT JOIN usuarios u ON v.vendedor_id = u.id
+        WHERE v.id IN ({",".join("?" * len(ids))})
+        """,
+        ids,
+    )
+    filas = [dict(fila) for fila in cur.fetchall()]
+    return _ordenar(filas, texto, ("folio",), ("cliente_nombre",), limite)
@@ -0,0 +1,80 @@
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Caché en disco de archivos ya parseados (uploads/cache_parseo).
+#
+# Es común subir el mismo Excel varias veces seguidas (corregir la selección de la venta
+# rápida, reintentar una carga); con la caché la segunda vez no se vuelve a decodificar el
+# Excel. La llave es (tipo, versión del parser, sha256 del contenido): si cambia el parser
+# se sube su versión y lo viejo simplemente deja de usarse.
+#
+# Se guarda en Parquet (zstd) y el tamaño total se acota con LRU: cada lectura actualiza
+# la fecha de modificación del archivo y al escribir se borran los más viejos hasta
+# quedar bajo TAM_MAX_CACHE.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARPETA_CACHE = os.path.join(BASE_DIR, "uploads", "cache_parseo")
+TAM_MAX_CACHE = 256 * 1024 * 1024
+
+
+def _ruta(tipo: str, version: int, sha256_archivo: str) -> str:
+    return os.path.join(CARPETA_CACHE, f"{tipo.lower()}_v{version}_{sha256_archivo}.parquet")
+
+
+def obtener(tipo: str, version: int, sha256_archivo: str) -> Optional[pd.DataFrame]:
+    """DataFrame guardado para ese contenido, o None si no está (o no se pudo leer)."""
+    ruta = _ruta(tipo, version, sha256_archivo)
+    try:
+        df = pd.read_parquet(ruta)
+        os.utime(ruta)  # LRU: usado ahora
+    except Exception:
+        return None
+    # pyarrow regresa None en las celdas vacías de texto; los parsers esperan NaN
+    return df.where(df.notna(), np.nan)
+
+
+def guardar(tipo: str, version: int, sha256_archivo: str, df: pd.DataFrame) -> None:
+    """Guarda el resultado y recorta la caché. Un error aquí no debe tumbar la carga."""
+    ruta = _ruta(tipo, version, sha256_archivo)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CARPETA_CACHE, exist_ok=True)
+        df.to_parquet(temporal, compression="zstd", index=False)
+        os.replace(temporal, ruta)
+        recortar()
+    except Exception as e:
+        print(f"No se pudo guardar en la caché de parseo ({tipo}): {e}")
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def recortar(tam_max: int = TAM_MAX_CACHE) -> int:
+    """Borra los archivos usados hace más tiempo hasta quedar bajo tam_max. Devuelve cuántos borró."""
+    if not os.path.isdir(CARPETA_CACHE):
+        return 0
+    entradas = []
+    for nombre in os.listdir(CARPETA_CACHE):
+        if not nombre.endswith(".parquet"):
+            continue
+        ruta = os.path.join(CARPETA_CACHE, nombre)
+        try:
+            st = os.stat(ruta)
+        except FileNotFoundError:
+            continue
+        entradas.append((st.st_mtime, st.st_size, ruta))
+
+    total = sum(e[1] for e in entradas)
+    borrados = 0
+    for _, tam, ruta in sorted(entradas):
+        if total <= tam_max:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tam
+        borrados += 1
+    return borrados
@@ -0,0 +1,135 @@
+import os
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Lectura de facturas electrónicas CFDI (4.0; también 3.3) para llenar la tabla facturas.
+#
+# De cada XML se toma lo que sirve para conciliar: UUID del timbre fiscal, serie + folio,
+# RFC y nombre del receptor (el cliente), total, moneda y fecha de emisión. Se recorre con
+# iterparse y cada nodo se libera al cerrarse, así que un CFDI con miles de conceptos no
+# se carga completo. Solo se importan comprobantes de ingreso (TipoDeComprobante = I):
+# los de pago y las notas de crédito no son facturas por cobrar.
+
+_COMPROBANTE = ("{http://www.sat.gob.mx/cfd/4}Comprobante", "{http://www.sat.gob.mx/cfd/3}Comprobante")
+_RECEPTOR = ("{http://www.sat.gob.mx/cfd/4}Receptor", "{http://www.sat.gob.mx/cfd/3}Receptor")
+_TIMBRE = "{http://www.sat.gob.mx/TimbreFiscalDigital}TimbreFiscalDigital"
+
+
+class CfdiInvalido(Exception):
+    """El XML no es un CFDI que se pueda importar (mal formado o sin datos obligatorios)."""
+
+
+def leer_cfdi(archivo) -> Optional[Dict[str, Any]]:
+    """
+    Datos de un CFDI (ruta o archivo abierto). None si no es de ingreso.
+    Lanza CfdiInvalido si el XML no se puede leer o le falta UUID / total / fecha.
+    """
+    comprobante = None
+    receptor = None
+    uuid = None
+    try:
+        for evento, elem in ET.iterparse(archivo, events=("start", "end")):
+            if evento == "start":
+                if elem.tag in _COMPROBANTE:
+                    comprobante = dict(elem.attrib)
+                elif elem.tag in _RECEPTOR:
+                    receptor = dict(elem.attrib)
+                elif elem.tag == _TIMBRE:
+                    uuid = elem.get("UUID")
+            else:
+                elem.clear()
+    except ET.ParseError as e:
+        raise CfdiInvalido(f"XML mal formado: {e}")
+
+    if comprobante is None:
+        raise CfdiInvalido("No es un CFDI (falta cfdi:Comprobante).")
+    if comprobante.get("TipoDeComprobante", "I") != "I":
+        return None
+    if not uuid:
+        raise CfdiInvalido("CFDI sin timbre fiscal (UUID).")
+    try:
+        total = float(comprobante["Total"])
+        fecha = comprobante["Fecha"][:10]
+    except (KeyError, ValueError):
+        raise CfdiInvalido("CFDI sin Total o Fecha válidos.")
+
+    receptor = receptor or {}
+    folio = (comprobante.get("Serie", "") + comprobante.get("Folio", "")).strip()
+    return {
+        "uuid": uuid.strip().upper(),
+        "folio": folio or uuid.strip().upper(),
+        "cliente_nombre": (receptor.get("Nombre") or "").strip() or None,
+        "rfc": (receptor.get("Rfc") or "").strip().upper() or None,
+        "monto_total": total,
+        "moneda": comprobante.get("Moneda") or "MXN",
+        "fecha_emision": fecha,
+    }
+
+
+def listar_xml(origen: str) -> List[str]:
+    """Nombres de los XML de una carpeta (recursivo, rutas completas) o de un ZIP (miembros)."""
+    if zipfile.is_zipfile(origen):
+        with zipfile.ZipFile(origen) as zf:
+            return [n for n in zf.namelist() if n.lower().endswith(".xml")]
+    rutas = []
+    for raiz, _, archivos in os.walk(origen):
+        rutas.extend(os.path.join(raiz, a) for a in archivos if a.lower().endswith(".xml"))
+    return sorted(rutas)
+
+
+def leer_lote(origen: str, nombres: List[str]) -> Tuple[List[Dict[str, Any]], int, List[Tuple[str, str]]]:
+    """
+    Lee un lote de XML de la carpeta o ZIP `origen` (pensado para correr en un proceso del
+    pool). Devuelve (facturas, omitidos, errores) con errores como (nombre, mensaje).
+    """
+    facturas = []
+    omitidos = 0
+    errores = []
+    zf = zipfile.ZipFile(origen) if zipfile.is_zipfile(origen) else None
+    try:
+        for nombre in nombres:
+            try:
+                if zf is not None:
+                    with zf.open(nombre) as f:
+                        datos = leer_cfdi(f)
+                else:
+                    datos = leer_cfdi(nombre)
+            except (CfdiInvalido, OSError) as e:
+                errores.append((nombre, str(e)))
+                continue
+            if datos is None:
+                omitidos += 1
+            else:
+                facturas.append(datos)
+    finally:
+        if zf is not None:
+            zf.close()
+    return facturas, omitidos, errores
+
+
+def iterar_lotes(nombres: List[str], tam: int) -> Iterator[List[str]]:
+    for inicio in range(0, len(nombres), tam):
+        yield nombres[inicio:inicio + tam]
+
+
+def guardar_facturas(db, facturas: List[Dict[str, Any]]) -> int:
+    """
+    Upsert por UUID (índice único idx_facturas_uuid). Una factura que ya existe actualiza
+    sus datos del CFDI sin tocar venta_id ni estado. No hace commit.
+    """
+    db.executemany(
+        """
+        INSERT INTO facturas (uuid, folio, cliente_nombre, rfc, monto_total, moneda, fecha_emision)
+        VALUES (:uuid, :folio, :cliente_nombre, :rfc, :monto_total, :moneda, :fecha_emision)
+        ON CONFLICT(uuid) DO UPDATE SET
+            folio = excluded.folio,
+            cliente_nombre = excluded.cliente_nombre,
+            rfc = excluded.rfc,
+            monto_total = excluded.monto_total,
+            moneda = excluded.moneda,
+            fecha_emision = excluded.fecha_emision
+        """,
+        facturas,
+    )
+    return len(facturas)
@@ -1,9 +1,19 @@
+import re
 import sqlite3
+from collections import defaultdict
 from datetime import datetime, date
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Iterable
 
 DB_PATH = "azyco_pagos.db"
 
+# Facturas (tabla facturas, ver importar_cfdi.py) que se pueden reconocer en la referencia
+# de un depósito: por folio normalizado (serie + folio, solo letras y números) o por el
+# primer bloque del UUID (8 hex). El monto en centavos tiene que coincidir, así que un
+# token que por casualidad se parece a un folio no basta.
+MIN_LARGO_FOLIO = 3
+LARGO_PREFIJO_UUID = 8
+_HEX = re.compile(r"[0-9A-F]+")
+
 
 def _parse_date_yyyy_mm_dd(s: str) -> Optional[date]:
     try:
@@ -77,7 +87,145 @@ def _score_candidate(pago: sqlite3.Row, venta: sqlite3.Row) -> float:
     return score
 
 
-def run_conciliacion() -> int:
+def _normalizar_folio(folio: str) -> str:
+    return re.sub(r"[^0-9A-Z]", "", (folio or "").upper())
+
+
+def _centavos(monto: float) -> int:
+    return int(round(monto * 100))
+
+
+def cargar_indice_facturas(conn: sqlite3.Connection) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """
+    Índice en memoria de las facturas sin pagar: {"folio": {folio: [...]}, "uuid": {prefijo: [...]}}.
+    Se arma una vez por corrida; si la tabla facturas aún no existe queda vacío.
+    """
+    indice = {"folio": defaultdict(list), "uuid": defaultdict(list)}
+    try:
+        cur = conn.execute(
+            """
+            SELECT id, folio, uuid, monto_total, venta_id
+            FROM facturas
+            WHERE estado = 'EMITIDA'
+            """
+        )
+    except sqlite3.OperationalError:
+        return indice
+
+    for factura_id, folio, uuid, monto_total, venta_id in cur:
+        factura = {
+            "id": factura_id,
+            "folio": folio,
+            "venta_id": venta_id,
+            "centavos": _centavos(monto_total),
+        }
+        clave = _normalizar_folio(folio)
+        if len(clave) >= MIN_LARGO_FOLIO:
+            indice["folio"][clave].append(factura)
+        if uuid:
+            indice["uuid"][uuid.upper()[:LARGO_PREFIJO_UUID]].append(factura)
+    return indice
+
+
+def buscar_factura(indice, pago: sqlite3.Row) -> Optional[Dict[str, Any]]:
+    """
+    La factura que nombra la referencia / concepto del pago con el mismo monto, o None si
+    no hay ninguna o hay más de una. Son búsquedas en diccionario, sin recorrer facturas.
+    """
+    if pago["monto"] is None or not (indice["folio"] or indice["uuid"]):
+        return None
+
+    texto = " ".join(pago[c] or "" for c in ("referencia", "referencia_ampliada", "concepto")).upper()
+    tokens = re.findall(r"[0-9A-Z]+", texto)
+    # "A-1234" o "A 1234" llegan partidos: también se prueban pares de tokens seguidos
+    claves = set(tokens) | {a + b for a, b in zip(tokens, tokens[1:])}
+
+    centavos = _centavos(pago["monto"])
+    encontradas = {}
+    for clave in claves:
+        candidatas = list(indice["folio"].get(clave, ()))
+        if len(clave) >= LARGO_PREFIJO_UUID and _HEX.fullmatch(clave):
+            candidatas.extend(indice["uuid"].get(clave[:LARGO_PREFIJO_UUID], ()))
+        for f in candidatas:
+            if f["centavos"] == centavos and not f.get("pagada"):
+                encontradas[f["id"]] = f
+
+    if len(encontradas) != 1:
+        return None
+    return next(iter(encontradas.values()))
+
+
+def _marcar_match(cur: sqlite3.Cursor, pago_id: int, venta_id: int, factura: Optional[Dict[str, Any]]) -> None:
+    cur.execute(
+        """
+        UPDATE pagos_detectados
+        SET estado_conciliacion = 'MATCH',
+            venta_id = ?,
+            factura_id = ?
+        WHERE id = ?
+        """,
+        (venta_id, factura["id"] if factura else None, pago_id),
+    )
+    cur.execute(
+        """
+        UPDATE ventas
+        SET estado_banco = 'PAGADO',
+            fecha_ultimo_cambio = CURRENT_TIMESTAMP
+        WHERE id = ?
+        """,
+        (venta_id,),
+    )
+    if factura:
+        # La factura (de esta misma venta, ver _factura_de_venta) queda pagada; en el
+        # índice de esta corrida ya no se ofrece a otro pago
+        factura["pagada"] = True
+        cur.execute("UPDATE facturas SET estado = 'PAGADA' WHERE id = ?", (factura["id"],))
+
+
+def _factura_de_venta(factura: Optional[Dict[str, Any]], venta_id: int) -> Optional[Dict[str, Any]]:
+    """
+    La factura solo se marca pagada si es de la venta que se ligó al pago. Si el match
+    salió por monto / score con otra venta, o la factura no tiene venta, no se toca: el
+    depósito no la pagó.
+    """
+    if factura and factura["venta_id"] == venta_id:
+        return factura
+    return None
+
+
+def _marcar_revisar(cur: sqlite3.Cursor, pago_id: int, factura: Optional[Dict[str, Any]]) -> None:
+    # Con factura identificada pero sin venta que cuadre, se propone crearla (pago_detalle)
+    cur.execute(
+        """
+        UPDATE pagos_detectados
+        SET estado_conciliacion = 'REVISAR',
+            factura_id = ?
+        WHERE id = ?
+        """,
+        (factura["id"] if factura else None, pago_id),
+    )
+
+
+# Pagos por conciliar; filtro_cuentas es "" o "AND cuenta_bancaria_id IN (?, ...)"
+SQL_PAGOS_PENDIENTES = """
+    SELECT *
+    FROM pagos_detectados
+    WHERE estado_conciliacion = 'PENDIENTE'
+    {filtro_cuentas}
+    ORDER BY fecha_operacion ASC, id ASC
+"""
+
+# Ventas candidatas de un pago: (cuenta_bancaria_id, monto - 0.01, monto + 0.01)
+SQL_VENTAS_CANDIDATAS = """
+    SELECT *
+    FROM ventas
+    WHERE cuenta_bancaria_id = ?
+    AND estado_banco != 'PAGADO'
+    AND monto > ? AND monto < ?
+"""
+
+
+def run_conciliacion(cuentas: Optional[Iterable[int]] = None) -> int:
     """
     Motor de conciliación "inteligente".
     Recorre pagos_detectados PENDIENTES y trata de emparejarlos con ventas.
@@ -87,21 +235,31 @@ def run_conciliacion() -> int:
       - mismo monto (tolerancia centavos)
       - si hay UNA sola venta candidata por monto+cuenta -> MATCH directo
       - si hay varias candidatas -> usamos score (folio en referencia, fechas, etc.)
+
+    Antes de eso se busca si la referencia nombra una factura (buscar_factura): si la
+    factura ya tiene venta pendiente en la misma cuenta, MATCH directo con esa venta; si no
+    tiene venta, el pago queda en REVISAR con la factura propuesta para crearla.
+
+    Con `cuentas` solo se revisan los pagos de esas cuentas bancarias (p. ej. las que
+    recibieron ventas en una carga masiva); una venta solo puede conciliar con pagos de
+    su misma cuenta, así que el resultado es el mismo que revisarlas todas.
     """
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
 
     # 1. Obtener pagos pendientes
-    cur.execute(
-        """
-        SELECT *
-        FROM pagos_detectados
-        WHERE estado_conciliacion = 'PENDIENTE'
-        ORDER BY fecha_operacion ASC, id ASC
-        """
-    )
+    filtro_cuentas = ""
+    params: List[Any] = []
+    if cuentas is not None:
+        params = sorted(set(cuentas))
+        if not params:
+            conn.close()
+            return 0
+        filtro_cuentas = f"AND cuenta_bancaria_id IN ({','.join('?' * len(params))})"
+    cur.execute(SQL_PAGOS_PENDIENTES.format(filtro_cuentas=filtro_cuentas), params)
     pagos = cur.fetchall()
+    facturas = cargar_indice_facturas(conn)
 
     matches = 0
 
@@ -115,47 +273,41 @@ def run_conciliacion() -> int:
         if monto_pago is None:
             continue
 
-        # 2. Buscar ventas candidatas por monto + cuenta + estado != PAGADO
+        # 2. ¿La referencia nombra una factura con este monto?
+        factura = buscar_factura(facturas, p)
+        if factura and factura["venta_id"]:
+            cur.execute(
+                "SELECT cuenta_bancaria_id, estado_banco FROM ventas WHERE id = ?",
+                (factura["venta_id"],),
+            )
+            venta_factura = cur.fetchone()
+            if (
+                venta_factura
+                and venta_factura["estado_banco"] != "PAGADO"
+                and venta_factura["cuenta_bancaria_id"] == cuenta_bancaria_id
+            ):
+                _marcar_match(cur, p["id"], factura["venta_id"], factura)
+                matches += 1
+                continue
+
+        # 3. Buscar ventas candidatas por monto + cuenta + estado != PAGADO
         cur.execute(
-            """
-            SELECT *
-            FROM ventas
-            WHERE cuenta_bancaria_id = ?
-            AND estado_banco != 'PAGADO'
-            AND ABS(monto - ?) < 0.01
-            """,
-            (cuenta_bancaria_id, monto_pago),
+            SQL_VENTAS_CANDIDATAS,
+            (cuenta_bancaria_id, monto_pago - 0.01, monto_pago + 0.01),
         )
         ventas_posibles = cur.fetchall()
 
         if not ventas_posibles:
-            # No hay ninguna venta que coincida en monto + cuenta
+            # No hay ninguna venta que coincida en monto + cuenta; si el pago nombra una
+            # factura sin venta, queda para revisar con la factura propuesta
+            if factura:
+                _marcar_revisar(cur, p["id"], factura)
             continue
 
         # 🔹 CASO 1: Solo hay UNA venta candidata -> MATCH directo (sin score)
         if len(ventas_posibles) == 1:
-            v = ventas_posibles[0]
-
-            cur.execute(
-                """
-                UPDATE pagos_detectados
-                SET estado_conciliacion = 'MATCH',
-                    venta_id = ?
-                WHERE id = ?
-                """,
-                (v["id"], p["id"]),
-            )
-
-            cur.execute(
-                """
-                UPDATE ventas
-                SET estado_banco = 'PAGADO',
-                    fecha_ultimo_cambio = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                (v["id"],),
-            )
-
+            venta_id = ventas_posibles[0]["id"]
+            _marcar_match(cur, p["id"], venta_id, _factura_de_venta(factura, venta_id))
             matches += 1
             continue  # pasar al siguiente pago
 
@@ -174,14 +326,7 @@ def run_conciliacion() -> int:
 
         # Si el mejor score es muy bajo, no tomamos decisión automática
         if mejor_score < MIN_SCORE_AUTOMATICO:
-            cur.execute(
-                """
-                UPDATE pagos_detectados
-                SET estado_conciliacion = 'REVISAR'
-                WHERE id = ?
-                """,
-                (p["id"],),
-            )
+            _marcar_revisar(cur, p["id"], factura)
             continue
 
         # ¿Hay más de un candidato con score cercano?
@@ -189,37 +334,11 @@ def run_conciliacion() -> int:
             segundo_score = scored[1][0]
             if segundo_score >= mejor_score * 0.7:
                 # Ambiguo -> REVISAR
-                cur.execute(
-                    """
-                    UPDATE pagos_detectados
-                    SET estado_conciliacion = 'REVISAR'
-                    WHERE id = ?
-                    """,
-                    (p["id"],),
-                )
+                _marcar_revisar(cur, p["id"], factura)
                 continue
 
         # 4. Si llegamos aquí, tenemos un candidato claro -> MATCH
-        cur.execute(
-            """
-            UPDATE pagos_detectados
-            SET estado_conciliacion = 'MATCH',
-                venta_id = ?
-            WHERE id = ?
-            """,
-            (mejor_venta["id"], p["id"]),
-        )
-
-        cur.execute(
-            """
-            UPDATE ventas
-            SET estado_banco = 'PAGADO',
-                fecha_ultimo_cambio = CURRENT_TIMESTAMP
-            WHERE id = ?
-            """,
-            (mejor_venta["id"],),
-        )
-
+        _marcar_match(cur, p["id"], mejor_venta["id"], _factura_de_venta(factura, mejor_venta["id"]))
         matches += 1
 
     conn.commit()
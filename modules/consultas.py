@@ -0,0 +1,140 @@
+from typing import Any, List, Optional, Tuple
+
+# SQL de las consultas frecuentes de app.py: listado de pagos detectados (filtros, conteo
+# y páginas), candidatos de pago_detalle, cierre diario, "Mis ventas" y venta_detalle.
+#
+# Están aquí y no en cada vista para que verificar_planes.py revise con EXPLAIN QUERY PLAN
+# el mismo texto que corre la app. Las de modules/ viven en su propio módulo (SQL_...).
+
+# ---------- Listado de pagos detectados ----------
+
+# Paginación por llave (fecha_operacion DESC, id DESC), ver pagos_detectados_listado
+CURSOR_DESPUES = "(p.fecha_operacion, p.id) < (?, ?)"
+CURSOR_ANTES = "(p.fecha_operacion, p.id) > (?, ?)"
+
+
+def filtros_pagos(
+    banco: str = "",
+    estado: str = "",
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    monto: Optional[float] = None,
+) -> Tuple[List[str], List[Any]]:
+    """
+    (condiciones, params) de los filtros del listado. `desde` es el inicio del primer día y
+    `hasta` el inicio del día siguiente al último (ver _rango_dia). Fechas y monto van
+    como rangos sobre la columna para que usen los índices.
+    """
+    condiciones: List[str] = []
+    params: List[Any] = []
+    if banco:
+        condiciones.append("p.banco = ?")
+        params.append(banco)
+    if estado:
+        condiciones.append("p.estado_conciliacion = ?")
+        params.append(estado)
+    if desde:
+        condiciones.append("p.fecha_operacion >= ?")
+        params.append(desde)
+    if hasta:
+        condiciones.append("p.fecha_operacion < ?")
+        params.append(hasta)
+    if monto is not None:
+        # Igualdad con tolerancia de centavos
+        condiciones.append("p.monto > ? AND p.monto < ?")
+        params.extend([monto - 0.01, monto + 0.01])
+    return condiciones, params
+
+
+def _where(condiciones: List[str]) -> str:
+    return ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+
+
+def sql_conteo_pagos(condiciones: List[str]) -> str:
+    """Conteo con tope (último parámetro: el tope + 1), sin JOIN."""
+    return f"SELECT COUNT(*) FROM (SELECT 1 FROM pagos_detectados p {_where(condiciones)} LIMIT ?)"
+
+
+def sql_listado_pagos(condiciones: List[str], orden: str = "DESC") -> str:
+    """Una página del listado (último parámetro: el tamaño de página)."""
+    return f"""
+        SELECT
+            p.*,
+            c.alias AS cuenta_alias,
+            v.folio AS venta_folio
+        FROM pagos_detectados p
+        LEFT JOIN cuentas_bancarias c ON p.cuenta_bancaria_id = c.id
+        LEFT JOIN ventas v ON p.venta_id = v.id
+        {_where(condiciones)}
+        ORDER BY p.fecha_operacion {orden}, p.id {orden}
+        LIMIT ?
+    """
+
+
+# ---------- pago_detalle ----------
+
+# (cuenta_bancaria_id, monto - 0.01, monto + 0.01)
+SQL_CANDIDATOS_PAGO = """
+    SELECT *
+    FROM ventas
+    WHERE cuenta_bancaria_id = ?
+    AND estado_banco IN ('PENDIENTE', 'EN_ESPERA_CONCILIACION')
+    AND monto > ? AND monto < ?
+    ORDER BY fecha_creacion DESC
+    LIMIT 30
+"""
+
+# ---------- Ventas ----------
+
+# (vendedor_id,)
+SQL_MIS_VENTAS = """
+    SELECT v.*, c.alias AS cuenta_alias, c.banco
+    FROM ventas v
+    JOIN cuentas_bancarias c ON v.cuenta_bancaria_id = c.id
+    WHERE v.vendedor_id = ?
+    ORDER BY v.fecha_creacion DESC
+"""
+
+# (cuenta_bancaria_id,)
+SQL_ULTIMA_ACTUALIZACION_CUENTA = """
+    SELECT MAX(creado_en) AS ultima_actualizacion
+    FROM pagos_detectados
+    WHERE cuenta_bancaria_id = ?
+"""
+
+# ---------- Cierre diario: (inicio del día, inicio del día siguiente) ----------
+
+SQL_VENTAS_PENDIENTES_DIA = """
+    SELECT *
+    FROM ventas
+    WHERE fecha_creacion >= ? AND fecha_creacion < ?
+      AND estado_banco != 'PAGADO'
+    ORDER BY fecha_creacion ASC
+"""
+
+SQL_PAGOS_DIA = """
+    SELECT p.*, v.folio AS venta_folio
+    FROM pagos_detectados p
+    LEFT JOIN ventas v ON p.venta_id = v.id
+    WHERE p.fecha_operacion >= ? AND p.fecha_operacion < ?
+    ORDER BY p.fecha_operacion ASC, p.id ASC
+"""
+
+# Pagos en MATCH del día, con su venta, cuenta y (si es venta rápida) un renglón por documento
+SQL_CORTE_DIA = """
+    SELECT
+        v.folio AS venta_folio,
+        v.cliente_nombre,
+        v.monto AS monto_venta,
+        d.documento,
+        d.neto_editado,
+        v.comprobante_filename AS venta_comprobante,
+        c.alias AS cuenta_alias
+    FROM pagos_detectados p
+    JOIN ventas v ON p.venta_id = v.id
+    LEFT JOIN venta_documentos d ON d.venta_id = v.id
+    LEFT JOIN cuentas_bancarias c ON v.cuenta_bancaria_id = c.id
+    WHERE p.estado_conciliacion = 'MATCH'
+      AND p.fecha_operacion >= ? AND p.fecha_operacion < ?
+    ORDER BY v.cliente_nombre, v.folio, p.id, d.id
+"""
@@ -0,0 +1,148 @@
+import re
+from typing import Any, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Lectura en streaming de la primera hoja de un Excel (.xlsx con openpyxl en modo
+# read-only, .xlsb con el iterador de renglones de pyxlsb).
+#
+# pd.read_excel junta toda la hoja en una lista de listas y luego la pasa por su parser
+# de texto antes de armar el DataFrame; aquí los renglones se van acomodando en lotes de
+# DataFrame (solo las columnas pedidas) y al final se infieren los tipos una sola vez.
+# El resultado es el mismo DataFrame que daría pd.read_excel(archivo) (header en la
+# primera fila, mismas etiquetas 'Unnamed: n' y mismos tipos), así que los parsers y el
+# hash_unico no cambian.
+
+TAM_LOTE_EXCEL = 5000
+
+
+def _valor(v: Any) -> Any:
+    # Mismas conversiones que pandas: '' es vacío y los números enteros llegan como int
+    if v == "":
+        return None
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def _limpiar(filas) -> Iterator[List[Any]]:
+    """
+    Normaliza los renglones como los ve pandas: sin celdas vacías al final de cada fila y
+    sin filas vacías al final de la hoja (las de en medio se conservan).
+    """
+    vacias = 0
+    for fila in filas:
+        fila = [_valor(v) for v in fila]
+        while fila and fila[-1] is None:
+            fila.pop()
+        if not fila:
+            vacias += 1
+            continue
+        for _ in range(vacias):
+            yield []
+        vacias = 0
+        yield fila
+
+
+def filas_excel(archivo, nombre_archivo: str) -> Iterator[List[Any]]:
+    """Renglones (listas de valores) de la primera hoja, uno por uno."""
+    nombre = nombre_archivo.lower()
+    if nombre.endswith(".xlsb"):
+        from pyxlsb import open_workbook
+
+        with open_workbook(archivo) as wb:
+            with wb.get_sheet(1) as hoja:
+                yield from _limpiar([c.v for c in fila] for fila in hoja.rows())
+    elif nombre.endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            yield from _limpiar(wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+    else:
+        # .xls: xlrd no tiene modo streaming, se lee completo
+        df = pd.read_excel(archivo, header=None)
+        yield from _limpiar(df.astype(object).where(df.notna(), None).values.tolist())
+
+
+def _etiquetas(encabezado: Sequence[Any]) -> List[Any]:
+    # Igual que pandas: vacío -> 'Unnamed: n', repetidos -> 'X.1', 'X.2', ...
+    etiquetas = []
+    vistos = {}
+    for i, v in enumerate(encabezado):
+        etiqueta = f"Unnamed: {i}" if v is None else v
+        if etiqueta in vistos:
+            vistos[etiqueta] += 1
+            etiqueta = f"{etiqueta}.{vistos[etiqueta]}"
+        else:
+            vistos[etiqueta] = 0
+        etiquetas.append(etiqueta)
+    return etiquetas
+
+
+def leer_excel(
+    archivo,
+    nombre_archivo: str,
+    columnas: Optional[Sequence[Any]] = None,
+    tam_lote: int = TAM_LOTE_EXCEL,
+) -> pd.DataFrame:
+    """
+    Equivalente a pd.read_excel(archivo) leyendo la hoja en streaming. Con columnas
+    (etiquetas del encabezado) solo se materializan esas; las que no existan en el
+    archivo no aparecen en el resultado (igual que si se filtrara el DataFrame completo).
+    """
+    filas = filas_excel(archivo, nombre_archivo)
+    etiquetas = _etiquetas(next(filas, []))
+
+    def etiqueta(i: int) -> Any:
+        return etiquetas[i] if i < len(etiquetas) else f"Unnamed: {i}"
+
+    posiciones = None
+    if columnas is not None:
+        posiciones = []
+        for c in columnas:
+            if c in etiquetas:
+                posiciones.append(etiquetas.index(c))
+            else:
+                m = re.fullmatch(r"Unnamed: (\d+)", str(c))
+                if m and int(m.group(1)) >= len(etiquetas):
+                    posiciones.append(int(m.group(1)))
+
+    ancho = len(etiquetas)
+    lotes = []
+    lote = []
+    for fila in filas:
+        ancho = max(ancho, len(fila))
+        if posiciones is not None:
+            fila = [fila[p] if p < len(fila) else None for p in posiciones]
+        lote.append(fila)
+        if len(lote) >= tam_lote:
+            lotes.append(pd.DataFrame(lote, dtype=object))
+            lote = []
+    if lote:
+        lotes.append(pd.DataFrame(lote, dtype=object))
+
+    if posiciones is None:
+        posiciones = list(range(ancho))
+        df = pd.concat(lotes, ignore_index=True) if lotes else pd.DataFrame(dtype=object)
+        df = df.reindex(columns=posiciones)
+    else:
+        df = pd.concat(lotes, ignore_index=True) if lotes else pd.DataFrame(columns=range(len(posiciones)), dtype=object)
+        df = df.reindex(columns=range(len(posiciones)))
+        # Una columna que ningún renglón alcanza no existe para pandas
+        visibles = [i for i, p in enumerate(posiciones) if p < ancho]
+        df = df[visibles]
+        posiciones = [posiciones[i] for i in visibles]
+
+    df.columns = [etiqueta(p) for p in posiciones]
+    # Los tipos se infieren una vez con toda la columna, como lo hace pd.read_excel
+    df = df.infer_objects()
+    df = df.where(df.notna(), np.nan)
+    for i in range(df.shape[1]):
+        # Columna sin ningún valor: pandas la deja como float (NaN)
+        if df.dtypes.iloc[i] == object and df.iloc[:, i].isna().all():
+            df.isetitem(i, df.iloc[:, i].astype(float))
+    return df
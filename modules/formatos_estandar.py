@@ -0,0 +1,218 @@
+import io
+import re
+import xml.etree.ElementTree as ET
+from datetime import date
+from typing import Iterator, Dict, Any, Optional, TextIO
+
+# Parsers en streaming para formatos estándar de estado de cuenta:
+#   - ISO 20022 CAMT.053 (XML)   -> parsear_camt053
+#   - SWIFT MT940 (texto)        -> parsear_mt940
+#
+# A diferencia de los parsers por banco, un archivo puede traer varias cuentas y varios
+# periodos, así que cada registro lleva su propia "cuenta_archivo" (la liga a
+# cuentas_bancarias la hace guardar_lote). Son generadores: nunca tienen en memoria más
+# de un movimiento, así que sirven para estados de cuenta de cualquier tamaño.
+#
+# Solo se emiten abonos (depósitos), igual que en los parsers por banco, pero el saldo se
+# va acumulando con cargos y abonos para llenar saldo_posterior.
+
+
+def _centavos(monto: float) -> int:
+    return int(round(monto * 100))
+
+
+def _local(tag: str) -> str:
+    # '{urn:iso:std:iso:20022:tech:xsd:camt.053.001.08}Ntry' -> 'Ntry'
+    return tag.rsplit("}", 1)[-1]
+
+
+def _saldo_inicial_camt(stmt: ET.Element) -> Optional[int]:
+    for bal in stmt.findall("Bal"):
+        tipo = bal.findtext("Tp/CdOrPrtry/Cd")
+        if tipo not in ("OPBD", "PRCD"):
+            continue
+        monto = bal.findtext("Amt")
+        if monto is None:
+            continue
+        cent = _centavos(float(monto))
+        return -cent if bal.findtext("CdtDbtInd") == "DBIT" else cent
+    return None
+
+
+def parsear_camt053(archivo, nombre_archivo: str) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre un CAMT.053 con iterparse y va liberando cada <Ntry> al terminar de leerlo.
+    """
+    stmt = None
+    cuenta = None
+    moneda_cuenta = None
+    saldo = None
+
+    for evento, elem in ET.iterparse(archivo, events=("start", "end")):
+        if evento == "start":
+            elem.tag = _local(elem.tag)
+            if elem.tag == "Stmt":
+                stmt = elem
+                cuenta = None
+                moneda_cuenta = None
+                saldo = None
+            continue
+
+        if elem.tag == "Acct" and stmt is not None and cuenta is None:
+            cuenta = (elem.findtext("Id/IBAN") or elem.findtext("Id/Othr/Id") or "").strip()
+            moneda_cuenta = elem.findtext("Ccy")
+
+        elif elem.tag == "Bal" and stmt is not None and saldo is None:
+            saldo = _saldo_inicial_camt(stmt)
+
+        elif elem.tag == "Ntry" and stmt is not None:
+            amt = elem.find("Amt")
+            if amt is not None and amt.text:
+                cent = _centavos(float(amt.text))
+                es_abono = elem.findtext("CdtDbtInd") == "CRDT"
+                if saldo is not None:
+                    saldo += cent if es_abono else -cent
+
+                fecha = elem.findtext("BookgDt/Dt") or (elem.findtext("BookgDt/DtTm") or "")[:10]
+                if not fecha:
+                    fecha = elem.findtext("ValDt/Dt") or (elem.findtext("ValDt/DtTm") or "")[:10]
+
+                if es_abono and fecha:
+                    tx = elem.find("NtryDtls/TxDtls")
+                    referencia = elem.findtext("AcctSvcrRef") or ""
+                    ref_amp = ""
+                    if tx is not None:
+                        referencia = referencia or tx.findtext("Refs/EndToEndId") or ""
+                        ref_amp = " ".join(u.text.strip() for u in tx.findall("RmtInf/Ustrd") if u.text)
+                    yield {
+                        "banco": "CAMT053",
+                        "cuenta_archivo": cuenta,
+                        "fecha_operacion": fecha,
+                        "monto": cent / 100.0,
+                        "moneda": amt.get("Ccy") or moneda_cuenta or "MXN",
+                        "referencia": referencia.strip(),
+                        "referencia_ampliada": ref_amp,
+                        "concepto": (elem.findtext("AddtlNtryInf") or "").strip(),
+                        "saldo_posterior": saldo / 100.0 if saldo is not None else None,
+                        "fuente_archivo": nombre_archivo,
+                    }
+
+            # Ntry es hijo directo de Stmt: lo soltamos para que la memoria no crezca
+            stmt.remove(elem)
+
+        elif elem.tag == "Stmt":
+            elem.clear()
+            stmt = None
+
+
+# :61:YYMMDD[MMDD](C|D|RC|RD)[código de fondos]monto(coma decimal)tipo referencia[//ref banco]
+_RE_61 = re.compile(
+    r"^(?P<fecha>\d{6})(?P<asiento>\d{4})?(?P<dc>R?[CD])(?P<fondos>[A-Z])?"
+    r"(?P<monto>\d+,\d*)(?P<tipo>[NFS][A-Z0-9]{3})(?P<ref>.*?)(?://(?P<ref_banco>.*))?$"
+)
+# :60F:/:60M:/:62F: C|D YYMMDD moneda monto
+_RE_SALDO = re.compile(r"^(?P<dc>[CD])(?P<fecha>\d{6})(?P<moneda>[A-Z]{3})(?P<monto>\d+,\d*)")
+
+
+def _fecha_yymmdd(s: str) -> str:
+    yy, mm, dd = int(s[0:2]), int(s[2:4]), int(s[4:6])
+    return date(2000 + yy if yy < 80 else 1900 + yy, mm, dd).isoformat()
+
+
+def _monto_mt940(s: str) -> int:
+    entero, _, dec = s.partition(",")
+    return int(entero) * 100 + int((dec + "00")[:2])
+
+
+def _campos_mt940(lineas: TextIO) -> Iterator[tuple]:
+    """
+    Tokeniza un MT940 en (tag, valor), juntando las líneas de continuación.
+    Un '-' solo en la línea cierra el mensaje (se emite como tag '-').
+    """
+    tag = None
+    valor = []
+    for linea in lineas:
+        linea = linea.rstrip("\r\n")
+        m = re.match(r"^:(\d{2}[A-Z]?):(.*)$", linea)
+        if m or linea.strip() == "-":
+            if tag is not None:
+                yield tag, "\n".join(valor)
+            if m:
+                tag, valor = m.group(1), [m.group(2)]
+            else:
+                yield "-", ""
+                tag, valor = None, []
+        elif tag is not None:
+            valor.append(linea)
+    if tag is not None:
+        yield tag, "\n".join(valor)
+
+
+def parsear_mt940(archivo, nombre_archivo: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lee un MT940 línea por línea (puede traer varios mensajes / cuentas / periodos).
+    El :86: que sigue a un :61: se usa como concepto del movimiento.
+    """
+    propio = isinstance(archivo, str)
+    binario = open(archivo, "rb") if propio else archivo
+    lineas = io.TextIOWrapper(binario, encoding="latin1", newline="")
+
+    cuenta = None
+    moneda = "MXN"
+    saldo = None
+    pendiente = None  # movimiento :61: que espera su :86:
+
+    try:
+        for tag, valor in _campos_mt940(lineas):
+            if pendiente is not None and tag != "86":
+                yield pendiente
+                pendiente = None
+
+            if tag == "25":
+                # 'BIC/cuenta' o 'banco/cuenta': nos quedamos con la cuenta
+                cuenta = valor.strip().rsplit("/", 1)[-1].strip()
+                saldo = None
+            elif tag in ("60F", "60M"):
+                m = _RE_SALDO.match(valor.strip())
+                if m:
+                    moneda = m.group("moneda")
+                    saldo = _monto_mt940(m.group("monto"))
+                    if m.group("dc") == "D":
+                        saldo = -saldo
+            elif tag == "61":
+                primera, _, extra = valor.partition("\n")
+                m = _RE_61.match(primera.strip())
+                if not m:
+                    continue
+                cent = _monto_mt940(m.group("monto"))
+                es_abono = m.group("dc") in ("C", "RD")
+                if saldo is not None:
+                    saldo += cent if es_abono else -cent
+                if es_abono:
+                    referencia = m.group("ref").strip()
+                    if referencia == "NONREF":
+                        referencia = ""
+                    pendiente = {
+                        "banco": "MT940",
+                        "cuenta_archivo": cuenta,
+                        "fecha_operacion": _fecha_yymmdd(m.group("fecha")),
+                        "monto": cent / 100.0,
+                        "moneda": moneda,
+                        "referencia": referencia or (m.group("ref_banco") or "").strip(),
+                        "referencia_ampliada": extra.strip(),
+                        "concepto": "",
+                        "saldo_posterior": saldo / 100.0 if saldo is not None else None,
+                        "fuente_archivo": nombre_archivo,
+                    }
+            elif tag == "86" and pendiente is not None:
+                pendiente["concepto"] = " ".join(p.strip() for p in valor.splitlines() if p.strip())
+                yield pendiente
+                pendiente = None
+
+        if pendiente is not None:
+            yield pendiente
+    finally:
+        if propio:
+            lineas.close()
+        else:
+            lineas.detach()
@@ -0,0 +1,115 @@
+import secrets
+import sqlite3
+import time
+from typing import Optional
+
+# Claves de idempotencia para los POST que crean ventas o procesan archivos
+# (ventas_nueva, pagos_subir, venta_rapida).
+#
+# Cada formulario lleva una clave nueva (campo oculto idempotency_key); un cliente de API
+# puede mandarla en el encabezado Idempotency-Key. La primera solicitud con una clave la
+# reserva en solicitudes_idempotentes (EN_PROCESO) y, si la vista confirmó su trabajo,
+# guarda la respuesta (LISTO). Un reintento con la misma clave (doble clic, un proxy que
+# reenvía un POST lento) devuelve esa respuesta sin volver a procesar; si la original
+# sigue en curso, espera a que termine. Si la solicitud no hizo nada (errores de
+# validación) la clave se libera, para que el formulario corregido sí se procese. Las
+# claves se borran solas después de TTL_IDEMPOTENCIA_HORAS.
+
+TTL_IDEMPOTENCIA_HORAS = 24
+MAX_LARGO_CLAVE = 128
+
+# Cuánto espera un reintento a que termine la solicitud original antes de rendirse
+ESPERA_MAX_SEGUNDOS = 60
+INTERVALO_ESPERA_SEGUNDOS = 0.25
+
+
+def nueva_clave() -> str:
+    return secrets.token_urlsafe(16)
+
+
+# ("-<horas> hours",)
+SQL_LIMPIAR_CLAVES = "DELETE FROM solicitudes_idempotentes WHERE creado_en < datetime('now', ?)"
+
+
+def limpiar_claves(db: sqlite3.Connection, horas: int = TTL_IDEMPOTENCIA_HORAS) -> int:
+    """Borra las claves con más de `horas` de antigüedad. Devuelve cuántas borró."""
+    cur = db.execute(SQL_LIMPIAR_CLAVES, (f"-{int(horas)} hours",))
+    return cur.rowcount
+
+
+def _leer(db: sqlite3.Connection, usuario_id: int, ruta: str, clave: str) -> Optional[sqlite3.Row]:
+    return db.execute(
+        """
+        SELECT estado, status, mimetype, location, cuerpo
+        FROM solicitudes_idempotentes
+        WHERE usuario_id = ? AND ruta = ? AND clave = ?
+        """,
+        (usuario_id, ruta, clave),
+    ).fetchone()
+
+
+def reservar_clave(db: sqlite3.Connection, usuario_id: int, ruta: str, clave: str) -> Optional[sqlite3.Row]:
+    """
+    Reserva la clave para esta solicitud y devuelve None (hay que procesarla), o devuelve
+    el registro de la solicitud que ya la usó. Hace commit para que la reserva se vea
+    desde otras solicitudes.
+    """
+    limpiar_claves(db)
+    cur = db.execute(
+        "INSERT OR IGNORE INTO solicitudes_idempotentes (usuario_id, ruta, clave) VALUES (?, ?, ?)",
+        (usuario_id, ruta, clave),
+    )
+    db.commit()
+    if cur.rowcount == 1:
+        return None
+    return _leer(db, usuario_id, ruta, clave)
+
+
+def esperar_resultado(
+    db: sqlite3.Connection,
+    usuario_id: int,
+    ruta: str,
+    clave: str,
+    segundos: float = ESPERA_MAX_SEGUNDOS,
+) -> Optional[sqlite3.Row]:
+    """
+    Espera a que la solicitud original termine. Devuelve su registro LISTO, o None si no
+    terminó a tiempo o falló (y liberó la clave).
+    """
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        registro = _leer(db, usuario_id, ruta, clave)
+        if registro is None or registro["estado"] == "LISTO":
+            return registro
+        time.sleep(INTERVALO_ESPERA_SEGUNDOS)
+    return None
+
+
+def guardar_respuesta(
+    db: sqlite3.Connection,
+    usuario_id: int,
+    ruta: str,
+    clave: str,
+    status: int,
+    mimetype: Optional[str],
+    location: Optional[str],
+    cuerpo: bytes,
+) -> None:
+    db.execute(
+        """
+        UPDATE solicitudes_idempotentes
+        SET estado = 'LISTO', status = ?, mimetype = ?, location = ?, cuerpo = ?
+        WHERE usuario_id = ? AND ruta = ? AND clave = ?
+        """,
+        (status, mimetype, location, cuerpo, usuario_id, ruta, clave),
+    )
+    db.commit()
+
+
+def liberar_clave(db: sqlite3.Connection, usuario_id: int, ruta: str, clave: str) -> None:
+    """La solicitud falló: se borra la reserva para que un reintento la procese."""
+    db.execute(
+        "DELETE FROM solicitudes_idempotentes WHERE usuario_id = ? AND ruta = ? AND clave = ?",
+        (usuario_id, ruta, clave),
+    )
+    db.commit()
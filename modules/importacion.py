@@ -0,0 +1,948 @@
+import hashlib
+import re
+import sqlite3
+import xml.etree.ElementTree as ET
+import zipfile
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import List, Dict, Any, Tuple, Optional, Iterable
+
+import pandas as pd
+
+from modules import cache_parseo
+from modules.archivo_estados import archivar_estado, tabla_cruda
+from modules.excel_streaming import leer_excel
+from modules.formatos_estandar import parsear_camt053, parsear_mt940
+from modules.verificacion_saldos import verificar_saldos
+
+# Extensiones aceptadas por banco (mismas reglas que el formulario de pagos_subir)
+EXTENSIONES_BANCO = {
+    "BBVA": (".xls", ".xlsx", ".xlsb"),
+    "BANAMEX": (".csv",),
+    "BANORTE": (".csv",),
+    "CAMT053": (".xml",),
+    "MT940": (".sta", ".mt940", ".940", ".txt"),
+}
+
+# Formatos estándar: varias cuentas por archivo, cada registro trae su "cuenta_archivo"
+FORMATOS_MULTICUENTA = {"CAMT053", "MT940"}
+
+# Renglones por executemany al guardar (acota la memoria de los parsers en streaming)
+TAM_LOTE = 5000
+
+
+class ArchivoInvalido(ValueError):
+    """El archivo no corresponde al banco/formato esperado (mensaje listo para el usuario)."""
+
+
+MENSAJE_EXTENSION = {
+    "BBVA": "Para BBVA usa un archivo Excel (.xls, .xlsx o .xlsb).",
+    "BANAMEX": "Para Banamex usa un archivo CSV.",
+    "BANORTE": "Para Banorte usa un archivo CSV.",
+    "CAMT053": "Para CAMT.053 usa el archivo XML del estado de cuenta.",
+    "MT940": "Para MT940 usa el archivo de texto (.sta, .mt940, .940 o .txt).",
+}
+
+# Separador de campos en la codificación canónica (unit separator, no aparece en textos de banco)
+_SEP = "\x1f"
+
+
+def _centavos(valor: Optional[float]) -> str:
+    if valor is None:
+        return ""
+    return str(int(round(float(valor) * 100)))
+
+
+def _texto(valor: Any) -> str:
+    if valor is None:
+        return ""
+    return str(valor).strip()
+
+
+def clave_dedup(registro: Dict[str, Any]) -> bytes:
+    """
+    Llave compacta de deduplicación (hash_unico) de un movimiento bancario: 16 bytes.
+
+    Se calcula sobre una codificación canónica común a todos los bancos, usando solo
+    columnas que se guardan en pagos_detectados (así la migración puede recalcularla):
+      banco, cuenta_bancaria_id, fecha_operacion, monto (centavos), referencia,
+      referencia_ampliada, concepto, saldo_posterior (centavos)
+
+    Es BLAKE2b truncado a 128 bits. La probabilidad de que dos movimientos distintos
+    compartan clave es ~n²/2^129 (menos de 1 en 10^20 con 10 millones de renglones);
+    si llegara a pasar, el segundo movimiento se contaría como duplicado y no se insertaría.
+    """
+    canonico = _SEP.join(
+        [
+            _texto(registro.get("banco")).upper(),
+            _texto(registro.get("cuenta_bancaria_id")),
+            _texto(registro.get("fecha_operacion")),
+            _centavos(registro.get("monto")),
+            _texto(registro.get("referencia")),
+            _texto(registro.get("referencia_ampliada")),
+            _texto(registro.get("concepto")),
+            _centavos(registro.get("saldo_posterior")),
+        ]
+    )
+    return hashlib.blake2b(canonico.encode("utf-8"), digest_size=16).digest()
+
+
+def insertar_pagos_nuevos(db: sqlite3.Connection, registros: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Inserta en bloque en pagos_detectados solo los movimientos que todavía no existen.
+
+    Cada registro es un dict con las columnas de pagos_detectados; hash_unico se calcula
+    aquí con clave_dedup para que todos los bancos usen la misma codificación.
+    En lugar de pagar un INSERT OR IGNORE por renglón, los hashes candidatos se cargan
+    en una tabla temporal y se cruzan contra pagos_detectados en una sola consulta
+    (anti-join). Solo los nuevos se insertan con executemany.
+
+    Devuelve (nuevos, duplicados). No hace commit: eso le toca al llamador.
+    """
+    if not registros:
+        return 0, 0
+
+    for r in registros:
+        r.setdefault("moneda", "MXN")
+        r.setdefault("archivo_id", None)
+        r["hash_unico"] = clave_dedup(r)
+
+    db.execute("CREATE TEMP TABLE IF NOT EXISTS carga_hashes (hash_unico BLOB PRIMARY KEY)")
+    db.execute("DELETE FROM carga_hashes")
+    db.executemany(
+        "INSERT OR IGNORE INTO carga_hashes (hash_unico) VALUES (?)",
+        ((r["hash_unico"],) for r in registros),
+    )
+    cur = db.execute(
+        """
+        SELECT t.hash_unico
+        FROM carga_hashes t
+        WHERE NOT EXISTS (
+            SELECT 1 FROM pagos_detectados p WHERE p.hash_unico = t.hash_unico
+        )
+        """
+    )
+    hashes_nuevos = {row[0] for row in cur.fetchall()}
+    db.execute("DELETE FROM carga_hashes")
+
+    # Un mismo movimiento puede venir repetido dentro del archivo: solo entra la primera vez
+    por_insertar = []
+    for r in registros:
+        h = r["hash_unico"]
+        if h in hashes_nuevos:
+            hashes_nuevos.discard(h)
+            por_insertar.append(r)
+
+    nuevos = 0
+    if por_insertar:
+        # OR IGNORE se queda solo como red de seguridad ante cargas concurrentes
+        cur = db.executemany(
+            """
+            INSERT OR IGNORE INTO pagos_detectados (
+                banco, cuenta_bancaria_id, fecha_operacion, hora_operacion,
+                monto, moneda, referencia, referencia_ampliada, concepto,
+                saldo_posterior, fuente_archivo, archivo_id, hash_unico
+            )
+            VALUES (
+                :banco, :cuenta_bancaria_id, :fecha_operacion, NULL,
+                :monto, :moneda, :referencia, :referencia_ampliada, :concepto,
+                :saldo_posterior, :fuente_archivo, :archivo_id, :hash_unico
+            )
+            """,
+            por_insertar,
+        )
+        nuevos = cur.rowcount
+
+    return nuevos, len(registros) - nuevos
+
+
+# =========================
+# Parsers por banco
+# =========================
+# Cada parser recibe el archivo (ruta o file-like), el nombre original y las marcas de
+# agua por cuenta, y devuelve (cuenta_archivo, registros, info): la cuenta que trae el
+# propio archivo (si la trae), los depósitos normalizados con las columnas de
+# pagos_detectados (sin cuenta_bancaria_id) e info de la marca de agua.
+# No tocan la BD, así que pueden correr en otro proceso (ver backfill_pagos.py).
+#
+# Los de BBVA / Banamex / Banorte van en dos pasos: leer la tabla cruda (tabla_cruda, todo
+# como texto) y normalizarla. info["crudo"] lleva esa tabla para archivarla; el
+# reproceso (reprocesar_estados.py) corre los mismos normalizadores sobre lo archivado.
+
+
+def _sin_marca() -> Dict[str, Any]:
+    return {"marca": None, "omitidos_por_marca": 0, "aviso": None}
+
+
+def _clean_amount(x) -> Optional[float]:
+    s = str(x)
+    s = (
+        s.replace("$", "")
+        .replace(",", "")
+        .strip()
+    )
+    if not s or s == "-":
+        return None
+    return float(s)
+
+
+def _saldo(x) -> Optional[float]:
+    # Celda de saldo de los CSV: vacía (NaN) o "-" = sin saldo
+    if pd.isna(x):
+        return None
+    return _clean_amount(x)
+
+
+def _con_encabezado(crudo: pd.DataFrame) -> pd.DataFrame:
+    # Deshace tabla_cruda: la primera fila vuelve a ser el encabezado de pandas
+    df = crudo.iloc[1:].reset_index(drop=True)
+    df.columns = list(crudo.iloc[0])
+    return df
+
+
+def _buscar_corte(
+    fechas: List[str], saldos: pd.Series, marca: Dict[str, Any]
+) -> Tuple[int, Optional[str]]:
+    """
+    Con los movimientos en orden cronológico, busca (búsqueda binaria sobre la fecha)
+    dónde termina lo ya importado según la marca de la cuenta. Devuelve (corte, aviso):
+    los movimientos [0, corte) ya se habían importado. corte = 0 cuando no hay traslape
+    confiable; en ese caso se procesa todo y la deduplicación por hash hace el resto.
+    """
+    if not fechas:
+        return 0, None
+    # El archivo empieza antes de lo que tenemos en BD: su inicio nunca se importó
+    if marca.get("primera_fecha") and fechas[0] < marca["primera_fecha"]:
+        return 0, None
+    # Archivo completamente anterior o posterior a la marca: no hay costura que buscar
+    if fechas[-1] < marca["fecha"] or fechas[0] > marca["fecha"]:
+        return 0, None
+
+    # Saltar el prefijo supone que la BD ya tiene todo lo anterior a la costura. Si la
+    # cadena de saldos de la cuenta tiene huecos (o no se ha verificado), el archivo
+    # podría traer justo lo que falta: se procesa completo.
+    if marca.get("estado") != "OK":
+        aviso = None
+        if marca.get("estado") == "HUECOS":
+            aviso = "La cuenta tiene huecos en su cadena de saldos; se procesó el archivo completo."
+        return 0, aviso
+
+    inicio_dia = bisect_left(fechas, marca["fecha"])
+    fin_dia = bisect_right(fechas, marca["fecha"])
+    corte = inicio_dia + marca["posicion"]
+    if corte > fin_dia:
+        return 0, f"El archivo no trae los {marca['posicion']} movimientos ya importados del {marca['fecha']}; se procesó completo."
+    # Nada del archivo está antes de la costura: no hay prefijo importado que saltar
+    # (iloc[-1] compararía la marca contra el final del archivo)
+    if corte == 0:
+        return 0, None
+
+    saldo_costura = saldos.iloc[corte - 1]
+    if marca["saldo"] is None or pd.isna(saldo_costura) or abs(float(saldo_costura) - marca["saldo"]) >= 0.005:
+        return 0, f"El saldo no cuadra con la última carga de la cuenta ({marca['fecha']}); se procesó completo."
+    return corte, None
+
+
+def _aplicar_marca(
+    data: pd.DataFrame, marca: Optional[Dict[str, Any]], info: Dict[str, Any]
+) -> pd.DataFrame:
+    """
+    data: todos los movimientos del archivo (cargos incluidos, porque la costura se valida
+    con el saldo) con "fecha" (YYYY-MM-DD) y "saldo" (posterior, NaN si no viene).
+    Si están en orden cronológico, salta el prefijo que ya se importó según la marca de la
+    cuenta y deja en info la marca nueva (último movimiento del archivo). Devuelve lo que
+    queda por procesar.
+    """
+    fechas = data["fecha"].tolist()
+    if not data["fecha"].is_monotonic_increasing:
+        return data
+    if marca:
+        corte, info["aviso"] = _buscar_corte(fechas, data["saldo"], marca)
+        info["omitidos_por_marca"] = corte
+        data = data.iloc[corte:]
+
+    if len(data) > 0 and pd.notna(data["saldo"].iloc[-1]):
+        ultima_fecha = fechas[-1]
+        info["marca"] = {
+            "fecha": ultima_fecha,
+            "saldo": float(data["saldo"].iloc[-1]),
+            "posicion": len(fechas) - bisect_left(fechas, ultima_fecha),
+        }
+    return data
+
+
+def _saldo_posterior(valor) -> Optional[float]:
+    return None if pd.isna(valor) else float(valor)
+
+
+def leer_bbva(archivo, nombre_archivo: str) -> pd.DataFrame:
+    # Leer Excel de BBVA en streaming (mismo DataFrame que pd.read_excel, ver modules/excel_streaming.py)
+    return tabla_cruda(leer_excel(archivo, nombre_archivo))
+
+
+def normalizar_bbva(crudo: pd.DataFrame, nombre_archivo: str, marcas: Optional[Dict[str, Dict[str, Any]]] = None):
+    df = _con_encabezado(crudo)
+
+    # Cuenta de AZYCO (columna 1 en la fila de encabezado original)
+    cuenta_azyco = str(df.columns[1]).strip()
+
+    # Encabezado real está en la fila 0
+    header_row = df.iloc[0]
+    data = df.iloc[1:].copy()
+    data.columns = header_row
+
+    if "Abono" not in data.columns:
+        raise ArchivoInvalido("No se encontró la columna 'Abono' en el archivo de BBVA.")
+
+    info = _sin_marca()
+    if "Fecha Operación" not in data.columns:
+        return cuenta_azyco, [], info
+
+    data["Abono"] = pd.to_numeric(data["Abono"], errors="coerce")
+    data["saldo"] = pd.to_numeric(data.get("Saldo", pd.Series(dtype=float)), errors="coerce")
+
+    # Convertir fecha Excel (número) a fecha real
+    numeros_fecha = pd.to_numeric(data["Fecha Operación"], errors="coerce")
+    data["fecha"] = (pd.Timestamp("1899-12-30") + pd.to_timedelta(numeros_fecha, unit="D")).dt.strftime("%Y-%m-%d")
+    data = data[data["fecha"].notna()]
+
+    # BBVA lista del más reciente al más antiguo: trabajamos en orden cronológico
+    if len(data) > 1 and data["fecha"].iloc[0] > data["fecha"].iloc[-1]:
+        data = data.iloc[::-1]
+
+    # Marca de agua de la cuenta: saltar el prefijo que ya se importó
+    data = _aplicar_marca(data, (marcas or {}).get(cuenta_azyco), info)
+
+    data = data[data["Abono"].notna() & (data["Abono"] > 0)]
+
+    registros = []
+    for _, row in data.iterrows():
+        referencia = str(row.get("Referencia", "")).strip()
+        ref_amp = str(row.get("Referencia Ampliada", "")).strip()
+        concepto = str(row.get("Concepto", "")).strip()
+
+        registros.append({
+            "banco": "BBVA",
+            "fecha_operacion": row["fecha"],
+            "monto": float(row["Abono"]),
+            "referencia": referencia,
+            "referencia_ampliada": ref_amp,
+            "concepto": concepto,
+            "saldo_posterior": _saldo_posterior(row["saldo"]),
+            "fuente_archivo": nombre_archivo,
+        })
+
+    return cuenta_azyco, registros, info
+
+
+def leer_csv(archivo, nombre_archivo: str) -> pd.DataFrame:
+    return tabla_cruda(pd.read_csv(archivo, encoding="latin1"))
+
+
+def normalizar_banamex(crudo: pd.DataFrame, nombre_archivo: str, marcas=None):
+    df = _con_encabezado(crudo)
+
+    col0 = df.columns[0]
+    # fila donde empieza el detalle (la que dice 'Fecha')
+    hdr_idx = df[df[col0] == "Fecha"].index[0]
+    header = df.iloc[hdr_idx]
+    data = df.iloc[hdr_idx + 1 :].copy()
+    data.columns = header
+
+    data = data[data["Fecha"].notna()]
+    data["fecha"] = pd.to_datetime(
+        data["Fecha"], format="%d/%m/%Y", errors="coerce"
+    ).dt.strftime("%Y-%m-%d")
+    data = data[data["fecha"].notna()]
+    data["saldo"] = pd.to_numeric(data.get("Saldo", pd.Series(dtype=object)).map(_saldo), errors="coerce")
+    if len(data) > 1 and data["fecha"].iloc[0] > data["fecha"].iloc[-1]:
+        data = data.iloc[::-1]
+
+    # El CSV de Banamex no trae la cuenta: se usa la primera cuenta activa (marca bajo None)
+    info = _sin_marca()
+    data = _aplicar_marca(data, (marcas or {}).get(None), info)
+
+    # Solo depósitos
+    data = data[
+        data["Depósitos"].notna()
+        & (data["Depósitos"].astype(str).str.strip() != "-")
+    ].copy()
+    data["monto"] = data["Depósitos"].apply(_clean_amount)
+
+    registros = []
+    for _, row in data.iterrows():
+        if row["monto"] is None:
+            continue
+
+        registros.append({
+            "banco": "BANAMEX",
+            "fecha_operacion": row["fecha"],
+            "monto": row["monto"],
+            "referencia": "",  # el CSV no trae referencia corta clara
+            "referencia_ampliada": "",
+            "concepto": str(row.get("Descripción", "")).strip(),
+            "saldo_posterior": _saldo_posterior(row["saldo"]),
+            "fuente_archivo": nombre_archivo,
+        })
+
+    return None, registros, info
+
+
+def normalizar_banorte(crudo: pd.DataFrame, nombre_archivo: str, marcas=None):
+    df = _con_encabezado(crudo)
+
+    # columna de depósitos (nombre con acentos raros)
+    dep_col = [c for c in df.columns if "DEP" in c.upper()][0]
+
+    saldo_col = next((c for c in df.columns if str(c).strip().upper() == "SALDO"), None)
+
+    df = df.copy()
+    df["fecha"] = pd.to_datetime(
+        df["FECHA"], format="%d/%m/%Y", errors="coerce"
+    ).dt.strftime("%Y-%m-%d")
+    df = df[df["fecha"].notna()]
+    df["saldo"] = pd.to_numeric(df[saldo_col].map(_saldo), errors="coerce") if saldo_col else float("nan")
+    if len(df) > 1 and df["fecha"].iloc[0] > df["fecha"].iloc[-1]:
+        df = df.iloc[::-1]
+
+    # El CSV de Banorte no trae la cuenta: se usa la primera cuenta activa (marca bajo None)
+    info = _sin_marca()
+    df = _aplicar_marca(df, (marcas or {}).get(None), info)
+
+    df_dep = df[
+        df[dep_col].notna()
+        & (df[dep_col].astype(str).str.strip() != "-")
+    ].copy()
+
+    df_dep["monto"] = df_dep[dep_col].apply(_clean_amount)
+
+    registros = []
+    for _, row in df_dep.iterrows():
+        if row["monto"] is None:
+            continue
+
+        registros.append({
+            "banco": "BANORTE",
+            "fecha_operacion": row["fecha"],
+            "monto": row["monto"],
+            "referencia": str(row.get("REFERENCIA", "")).strip(),
+            "referencia_ampliada": "",
+            "concepto": str(row.get("DESCRIPCIÓN", "")).strip(),
+            "saldo_posterior": _saldo_posterior(row["saldo"]),
+            "fuente_archivo": nombre_archivo,
+        })
+
+    return None, registros, info
+
+
+# banco -> (lector de la tabla cruda, normalizador)
+NORMALIZADORES = {
+    "BBVA": (leer_bbva, normalizar_bbva),
+    "BANAMEX": (leer_csv, normalizar_banamex),
+    "BANORTE": (leer_csv, normalizar_banorte),
+}
+
+# Versión de cada lector para la caché de parseo (modules/cache_parseo.py): subirla si
+# cambia la tabla cruda que produce leer_bbva / leer_csv.
+VERSION_LECTOR = {
+    "BBVA": 1,
+    "BANAMEX": 1,
+    "BANORTE": 1,
+}
+
+
+def _parser_tabla(banco: str):
+    leer, normalizar = NORMALIZADORES[banco]
+
+    def parsear(archivo, nombre_archivo: str, marcas=None, sha256_archivo: Optional[str] = None):
+        # Con el sha del contenido la tabla cruda sale de la caché si ya se leyó antes
+        # (la normalización sí corre siempre: depende de la marca de agua actual)
+        crudo = None
+        if sha256_archivo:
+            crudo = cache_parseo.obtener(banco, VERSION_LECTOR[banco], sha256_archivo)
+        if crudo is None:
+            crudo = leer(archivo, nombre_archivo)
+            if sha256_archivo:
+                cache_parseo.guardar(banco, VERSION_LECTOR[banco], sha256_archivo, crudo)
+        cuenta, registros, info = normalizar(crudo, nombre_archivo, marcas)
+        info["crudo"] = crudo
+        return cuenta, registros, info
+
+    return parsear
+
+
+parsear_bbva = _parser_tabla("BBVA")
+parsear_banamex = _parser_tabla("BANAMEX")
+parsear_banorte = _parser_tabla("BANORTE")
+
+
+def _parsear_camt053(archivo, nombre_archivo: str, marcas=None):
+    # El "crudo" es el propio archivo: se archiva tal cual después de consumir el generador
+    info = _sin_marca()
+    info["crudo"] = archivo
+    return None, parsear_camt053(archivo, nombre_archivo), info
+
+
+def _parsear_mt940(archivo, nombre_archivo: str, marcas=None):
+    info = _sin_marca()
+    info["crudo"] = archivo
+    return None, parsear_mt940(archivo, nombre_archivo), info
+
+
+PARSERS = {
+    "BBVA": parsear_bbva,
+    "BANAMEX": parsear_banamex,
+    "BANORTE": parsear_banorte,
+    "CAMT053": _parsear_camt053,
+    "MT940": _parsear_mt940,
+}
+
+
+def parsear_archivo(
+    banco: str,
+    archivo,
+    nombre_archivo: str,
+    marcas: Optional[Dict[str, Dict[str, Any]]] = None,
+    sha256_archivo: Optional[str] = None,
+):
+    """
+    Valida la extensión y corre el parser del banco. Devuelve (cuenta_archivo, registros, info).
+    Lanza ArchivoInvalido si el archivo no corresponde al banco.
+    Para CAMT053 / MT940 los registros son un generador (se consumen al guardar).
+
+    marcas (ver cargar_marcas) permite al parser saltarse lo ya importado de la cuenta;
+    info trae la nueva marca, cuántos movimientos se saltaron y un aviso si la costura
+    con la carga anterior no cuadró.
+
+    sha256_archivo (hash_contenido) activa la caché de parseo para BBVA / Banamex / Banorte.
+    """
+    if banco not in PARSERS:
+        raise ArchivoInvalido("Banco no reconocido.")
+    if not nombre_archivo.lower().endswith(EXTENSIONES_BANCO[banco]):
+        raise ArchivoInvalido(MENSAJE_EXTENSION[banco])
+    if banco in NORMALIZADORES:
+        return PARSERS[banco](archivo, nombre_archivo, marcas, sha256_archivo=sha256_archivo)
+    return PARSERS[banco](archivo, nombre_archivo, marcas)
+
+
+def detectar_banco(nombre_archivo: str, primera_linea: str = "") -> Optional[str]:
+    """
+    Adivina el banco por extensión y, para CSV, por el primer renglón:
+    Banorte trae el encabezado real (FECHA, ... DEPÓSITOS) en la primera línea,
+    Banamex trae un bloque de datos de la cuenta antes del renglón 'Fecha'.
+    """
+    nombre = nombre_archivo.lower()
+    if nombre.endswith(EXTENSIONES_BANCO["BBVA"]):
+        return "BBVA"
+    if nombre.endswith(EXTENSIONES_BANCO["CAMT053"]):
+        return "CAMT053"
+    if nombre.endswith(EXTENSIONES_BANCO["MT940"]):
+        return "MT940"
+    if nombre.endswith(".csv"):
+        encabezado = primera_linea.upper()
+        if "FECHA" in encabezado and "DEP" in encabezado:
+            return "BANORTE"
+        return "BANAMEX"
+    return None
+
+
+# Bytes que se leen del inicio de un CSV / XML / MT940 para reconocer el formato
+TAM_OLFATEO = 8192
+
+
+_NS_XLSX = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+def _columna_xlsx(ref: str) -> int:
+    # 'B12' -> 1
+    n = 0
+    for letra in ref:
+        if not letra.isalpha():
+            break
+        n = n * 26 + ord(letra.upper()) - 64
+    return n - 1
+
+
+def _primeras_filas_xlsx(archivo, n: int) -> List[List[Any]]:
+    """
+    Primeras n filas de la primera hoja leyendo el XML del .xlsx directamente: openpyxl
+    (aun en read_only) carga completa la tabla de textos compartidos, que en un estado
+    grande pesa tanto como el archivo. Aquí solo se lee hasta el último texto que usan esas filas.
+    """
+    with zipfile.ZipFile(archivo) as z:
+        libro = ET.fromstring(z.read("xl/workbook.xml"))
+        rel_id = libro.find(f"{_NS_XLSX}sheets/{_NS_XLSX}sheet").get(f"{_NS_REL}id")
+        rels = ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+        destino = next(r.get("Target") for r in rels if r.get("Id") == rel_id)
+        ruta_hoja = destino.lstrip("/") if destino.startswith("/") else "xl/" + destino
+
+        filas = []
+        with z.open(ruta_hoja) as hoja:
+            for _, elem in ET.iterparse(hoja):
+                if elem.tag != f"{_NS_XLSX}row":
+                    continue
+                fila = {}
+                for celda in elem.iter(f"{_NS_XLSX}c"):
+                    tipo = celda.get("t")
+                    if tipo == "inlineStr":
+                        valor = "".join(t.text or "" for t in celda.iter(f"{_NS_XLSX}t"))
+                    else:
+                        valor = celda.findtext(f"{_NS_XLSX}v")
+                        if valor is not None and tipo == "s":
+                            valor = ("s", int(valor))
+                        elif valor is not None and tipo in (None, "n"):
+                            valor = float(valor) if any(ch in valor for ch in ".eE") else int(valor)
+                    fila[_columna_xlsx(celda.get("r", ""))] = valor
+                filas.append([fila.get(i) for i in range(max(fila) + 1)] if fila else [])
+                if len(filas) == n:
+                    break
+
+        indices = {v[1] for fila in filas for v in fila if isinstance(v, tuple)}
+        textos = {}
+        if indices and "xl/sharedStrings.xml" in z.namelist():
+            ultimo = max(indices)
+            with z.open("xl/sharedStrings.xml") as sst:
+                i = 0
+                for _, elem in ET.iterparse(sst):
+                    if elem.tag != f"{_NS_XLSX}si":
+                        continue
+                    if i in indices:
+                        textos[i] = "".join(t.text or "" for t in elem.iter(f"{_NS_XLSX}t"))
+                    if i == ultimo:
+                        break
+                    i += 1
+                    elem.clear()
+
+    return [[textos.get(v[1]) if isinstance(v, tuple) else v for v in fila] for fila in filas]
+
+
+def _primeras_filas_excel(archivo, nombre_archivo: str, n: int) -> List[List[Any]]:
+    # Solo las primeras n filas de la primera hoja (la misma que lee pd.read_excel)
+    nombre = nombre_archivo.lower()
+    if nombre.endswith(".xlsb"):
+        from pyxlsb import open_workbook
+
+        with open_workbook(archivo) as wb:
+            with wb.get_sheet(1) as hoja:
+                return [[c.v for c in fila] for fila in islice(hoja.rows(), n)]
+    if nombre.endswith(".xlsx"):
+        return _primeras_filas_xlsx(archivo, n)
+    df = pd.read_excel(archivo, header=None, nrows=n)
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+
+def _olfatear_csv(prefijo: str) -> Optional[str]:
+    lineas = prefijo.splitlines()
+    if not lineas:
+        return None
+    encabezado = lineas[0].upper()
+    if "FECHA" in encabezado and "DEP" in encabezado:
+        return "BANORTE"
+    # Banamex: bloque de datos de la cuenta y luego el renglón 'Fecha,...,Depósitos,...'
+    for linea in lineas[1:]:
+        if linea.startswith("Fecha,") and "DEP" in linea.upper():
+            return "BANAMEX"
+    return None
+
+
+def olfatear_archivo(archivo, nombre_archivo: str) -> Tuple[str, Optional[str]]:
+    """
+    Reconoce el banco / formato y la cuenta del archivo leyendo solo su inicio (las dos
+    primeras filas del Excel, TAM_OLFATEO bytes del texto), antes del parseo completo.
+    Devuelve (banco, cuenta_archivo) con la misma cuenta que daría el parser (solo BBVA la
+    trae en el encabezado). Lanza ArchivoInvalido si no se parece a ningún formato.
+    archivo: ruta o file-like binario; si es file-like se regresa al inicio.
+    """
+    nombre = nombre_archivo.lower()
+    try:
+        if nombre.endswith(EXTENSIONES_BANCO["BBVA"]):
+            try:
+                filas = _primeras_filas_excel(archivo, nombre_archivo, 2)
+            except Exception as e:
+                raise ArchivoInvalido(f"No se pudo leer el Excel ({e}).")
+            if len(filas) == 2 and "Abono" in filas[1]:
+                cuenta = filas[0][1] if len(filas[0]) > 1 else None
+                return "BBVA", (str(cuenta).strip() if cuenta is not None else None)
+            raise ArchivoInvalido("El Excel no tiene el encabezado de BBVA (cuenta y columna 'Abono').")
+
+        if isinstance(archivo, str):
+            with open(archivo, "rb") as f:
+                prefijo = f.read(TAM_OLFATEO)
+        else:
+            prefijo = archivo.read(TAM_OLFATEO)
+        texto = prefijo.decode("latin1")
+
+        if nombre.endswith(".csv"):
+            banco = _olfatear_csv(texto)
+            if banco:
+                return banco, None
+            raise ArchivoInvalido("El CSV no tiene el encabezado de Banamex ni de Banorte.")
+        if nombre.endswith(EXTENSIONES_BANCO["CAMT053"]):
+            if "camt.053" in texto:
+                return "CAMT053", None
+            raise ArchivoInvalido("El XML no es un estado de cuenta CAMT.053.")
+        if nombre.endswith(EXTENSIONES_BANCO["MT940"]):
+            if re.search(r"^:20:", texto, re.M) and re.search(r"^:25:", texto, re.M):
+                return "MT940", None
+            raise ArchivoInvalido("El archivo no es un estado de cuenta MT940.")
+    finally:
+        if not isinstance(archivo, str):
+            archivo.seek(0)
+
+    raise ArchivoInvalido("Tipo de archivo no reconocido.")
+
+
+def resolver_cuenta(db: sqlite3.Connection, banco: str, cuenta_archivo: Optional[str]) -> Optional[int]:
+    """
+    cuentas_bancarias.id destino del archivo: por numero_cuenta si el archivo lo trae
+    (BBVA), si no la primera cuenta activa del banco.
+    """
+    if cuenta_archivo is not None:
+        cur = db.execute(
+            """
+            SELECT id FROM cuentas_bancarias
+            WHERE banco = ? AND numero_cuenta = ?
+            """,
+            (banco, cuenta_archivo),
+        )
+    else:
+        cur = db.execute(
+            """
+            SELECT id FROM cuentas_bancarias
+            WHERE banco = ? AND activa = 1
+            ORDER BY id
+            LIMIT 1
+            """,
+            (banco,),
+        )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def validar_cuenta(db: sqlite3.Connection, banco: str, cuenta_archivo: Optional[str]) -> None:
+    """
+    Lanza ArchivoInvalido si el archivo (de una sola cuenta) no tiene a dónde ligarse: sus
+    pagos quedarían sin cuenta_bancaria_id y la conciliación no los vería. Los formatos
+    multicuenta se ligan renglón por renglón en guardar_lote.
+    """
+    if banco in FORMATOS_MULTICUENTA or resolver_cuenta(db, banco, cuenta_archivo) is not None:
+        return
+    detalle = f"la cuenta {cuenta_archivo}" if cuenta_archivo else "ninguna cuenta activa"
+    raise ArchivoInvalido(f"{banco} no tiene {detalle} registrada en cuentas bancarias.")
+
+
+def _normalizar_cuenta(cuenta: Optional[str]) -> str:
+    # Solo dígitos/letras y sin ceros a la izquierda: '0102520877' == '102520877'
+    return re.sub(r"[^0-9A-Z]", "", (cuenta or "").upper()).lstrip("0")
+
+
+def mapa_cuentas(db: sqlite3.Connection) -> Dict[str, Tuple[int, str]]:
+    """
+    {identificador normalizado: (cuentas_bancarias.id, banco)} con numero_cuenta y clabe.
+    De una CLABE (18 dígitos) también se registra el número de cuenta que trae dentro
+    (posiciones 7 a 17), para ligar estados que identifican la cuenta por cualquiera de los dos.
+    """
+    mapa = {}
+    cur = db.execute("SELECT id, banco, numero_cuenta, clabe FROM cuentas_bancarias ORDER BY activa DESC, id")
+    for row in cur.fetchall():
+        cuenta_id, banco, numero, clabe = row[0], row[1], row[2], row[3]
+        for ident in (numero, clabe):
+            clave = _normalizar_cuenta(ident)
+            if clave:
+                mapa.setdefault(clave, (cuenta_id, banco))
+    return mapa
+
+
+def buscar_cuenta(mapa: Dict[str, Tuple[int, str]], cuenta_archivo: Optional[str]) -> Optional[Tuple[int, str]]:
+    clave = _normalizar_cuenta(cuenta_archivo)
+    if not clave:
+        return None
+    if clave in mapa:
+        return mapa[clave]
+    digitos = re.sub(r"\D", "", cuenta_archivo or "")
+    if len(digitos) == 18:
+        return mapa.get(digitos[6:17].lstrip("0"))
+    return None
+
+
+# (banco,)
+SQL_MARCAS = """
+    SELECT c.numero_cuenta,
+           c.ultima_fecha_importada,
+           c.ultimo_saldo_importado,
+           c.ultima_posicion_importada,
+           (SELECT MIN(p.fecha_operacion) FROM pagos_detectados p
+            WHERE p.cuenta_bancaria_id = c.id) AS primera_fecha,
+           s.estado,
+           c.id
+    FROM cuentas_bancarias c
+    LEFT JOIN salud_cuentas s ON s.cuenta_bancaria_id = c.id
+    WHERE c.banco = ? AND c.ultima_fecha_importada IS NOT NULL
+"""
+
+
+def cargar_marcas(db: sqlite3.Connection, banco: str) -> Dict[Optional[str], Dict[str, Any]]:
+    """
+    Marcas de agua de las cuentas del banco, por numero_cuenta: último movimiento importado
+    (fecha, saldo y posición dentro de ese día), la primera fecha que tenemos en BD y el
+    estado de su cadena de saldos (salud_cuentas). La de la cuenta que toman los archivos
+    sin cuenta (Banamex / Banorte, ver resolver_cuenta) va también bajo None.
+    """
+    por_defecto = resolver_cuenta(db, banco, None)
+    cur = db.execute(SQL_MARCAS, (banco,))
+    marcas = {}
+    for row in cur.fetchall():
+        marcas[row[0]] = {
+            "fecha": row[1],
+            "saldo": row[2],
+            "posicion": row[3] or 0,
+            "primera_fecha": row[4],
+            "estado": row[5],
+        }
+        if row[6] == por_defecto:
+            marcas[None] = marcas[row[0]]
+    return marcas
+
+
+def hash_contenido(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def archivo_ya_importado(db: sqlite3.Connection, sha256_archivo: str) -> bool:
+    cur = db.execute(
+        "SELECT 1 FROM archivos_movimientos WHERE hash_contenido = ?",
+        (sha256_archivo,),
+    )
+    return cur.fetchone() is not None
+
+
+def registrar_archivo(
+    db: sqlite3.Connection,
+    nombre_archivo: str,
+    sha256_archivo: Optional[str],
+    banco: str,
+    cuenta_bancaria_id: Optional[int],
+) -> Tuple[int, bool]:
+    """
+    Renglón del archivo en archivos_movimientos. Devuelve (id, es_nuevo): si el mismo
+    contenido ya estaba registrado se reutiliza su renglón.
+    """
+    cur = db.execute(
+        """
+        INSERT OR IGNORE INTO archivos_movimientos (
+            nombre_archivo, hash_contenido, banco, cuenta_bancaria_id
+        )
+        VALUES (?, ?, ?, ?)
+        """,
+        (nombre_archivo, sha256_archivo, banco, cuenta_bancaria_id),
+    )
+    if cur.rowcount:
+        return cur.lastrowid, True
+    row = db.execute(
+        "SELECT id FROM archivos_movimientos WHERE hash_contenido = ?",
+        (sha256_archivo,),
+    ).fetchone()
+    return row[0], False
+
+
+def guardar_lote(
+    db: sqlite3.Connection,
+    banco: str,
+    cuenta_archivo: Optional[str],
+    registros: Iterable[Dict[str, Any]],
+    nombre_archivo: str,
+    sha256_archivo: Optional[str] = None,
+    info: Optional[Dict[str, Any]] = None,
+    archivo_id: Optional[int] = None,
+) -> Tuple[int, int]:
+    """
+    Liga los registros a su cuenta, los inserta (solo nuevos) en lotes de TAM_LOTE y deja
+    constancia del archivo en archivos_movimientos, con su estado crudo archivado
+    (info["crudo"], ver modules/archivo_estados.py). Si el parser calculó una marca de agua
+    (info["marca"]) la cuenta avanza hasta ahí. Al final se verifica la cadena de saldos
+    de las cuentas tocadas. Devuelve (nuevos, duplicados). No hace commit.
+
+    En los formatos multicuenta (CAMT053 / MT940) cada registro se liga por su
+    "cuenta_archivo" y toma el banco de la cuenta encontrada.
+
+    archivo_id: al reprocesar un archivo ya registrado, los registros se ligan a ese
+    renglón y no se vuelve a registrar ni a archivar.
+    """
+    multicuenta = banco in FORMATOS_MULTICUENTA
+    if multicuenta:
+        cuentas = mapa_cuentas(db)
+        cuenta_bancaria_id = None
+    else:
+        cuenta_bancaria_id = resolver_cuenta(db, banco, cuenta_archivo)
+
+    archivo_nuevo = False
+    if archivo_id is None:
+        archivo_id, archivo_nuevo = registrar_archivo(db, nombre_archivo, sha256_archivo, banco, cuenta_bancaria_id)
+
+    nuevos = duplicados = 0
+    cuentas_tocadas = set()
+    registros = iter(registros)
+    while True:
+        lote = list(islice(registros, TAM_LOTE))
+        if not lote:
+            break
+        for r in lote:
+            if multicuenta:
+                cuenta = buscar_cuenta(cuentas, r.pop("cuenta_archivo", None))
+                if cuenta:
+                    r["cuenta_bancaria_id"], r["banco"] = cuenta
+                else:
+                    r["cuenta_bancaria_id"] = None
+            else:
+                r["cuenta_bancaria_id"] = cuenta_bancaria_id
+            r["archivo_id"] = archivo_id
+            cuentas_tocadas.add(r["cuenta_bancaria_id"])
+        n, d = insertar_pagos_nuevos(db, lote)
+        nuevos += n
+        duplicados += d
+
+    marca = (info or {}).get("marca")
+    if marca and cuenta_bancaria_id is not None:
+        # Solo avanza: un archivo viejo no regresa la marca
+        db.execute(
+            """
+            UPDATE cuentas_bancarias
+            SET ultima_fecha_importada = ?,
+                ultimo_saldo_importado = ?,
+                ultima_posicion_importada = ?
+            WHERE id = ?
+              AND (
+                ultima_fecha_importada IS NULL
+                OR ultima_fecha_importada < ?
+                OR (ultima_fecha_importada = ? AND ultima_posicion_importada <= ?)
+              )
+            """,
+            (
+                marca["fecha"], marca["saldo"], marca["posicion"], cuenta_bancaria_id,
+                marca["fecha"], marca["fecha"], marca["posicion"],
+            ),
+        )
+
+    if archivo_nuevo:
+        archivo_crudo = None
+        crudo = (info or {}).get("crudo")
+        if crudo is not None:
+            # El archivado no debe tumbar la importación: sin él solo se pierde el reproceso
+            try:
+                archivo_crudo = archivar_estado(archivo_id, sha256_archivo, crudo)
+            except Exception as e:
+                print(f"No se pudo archivar el estado crudo de {nombre_archivo}: {e}")
+        db.execute(
+            """
+            UPDATE archivos_movimientos
+            SET nuevos = ?, duplicados = ?, archivo_crudo = ?
+            WHERE id = ?
+            """,
+            (nuevos, duplicados, archivo_crudo, archivo_id),
+        )
+
+    for cuenta_id in cuentas_tocadas - {None}:
+        verificar_saldos(db, cuenta_id)
+
+    return nuevos, duplicados
@@ -0,0 +1,269 @@
+import csv
+import json
+import math
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Carga masiva de ventas desde el ERP (POST /api/ventas/lote).
+#
+# El cuerpo llega como NDJSON (un objeto por línea) o CSV con encabezados, y se lee por
+# línea sin cargarlo completo. Cada registro se valida por separado y por cada línea se
+# devuelve un resultado (ok con venta_id, o los errores). Los válidos se insertan por
+# lotes de TAM_LOTE líneas con executemany, un commit por lote, así que un error en una
+# línea no tira las demás y lo ya confirmado no se pierde si la conexión se corta.
+#
+# Un folio repetido (ya en la base o antes en la misma carga) es error de esa línea; el
+# índice único de ventas.folio cubre además las cargas simultáneas.
+
+TAM_LOTE = 1000
+
+CAMPOS = ("folio", "cliente_nombre", "monto", "cuenta_bancaria_id", "vendedor_id", "moneda", "fecha", "nota")
+MAX_LARGO_FOLIO = 64
+
+
+class LineaInvalida(Exception):
+    """La línea no se pudo leer como registro (JSON mal formado, no es un objeto...)."""
+
+
+def leer_registros(lineas: Iterable[str], formato: str) -> Iterator[Tuple[int, Any]]:
+    """
+    (número de línea, registro) por cada registro del cuerpo. Si una línea no se puede
+    leer, en lugar del registro va un LineaInvalida. Las líneas vacías se saltan.
+    """
+    if formato == "csv":
+        lector = csv.DictReader(lineas)
+        for fila in lector:
+            if None in fila:
+                yield lector.line_num, LineaInvalida("La línea trae más columnas que el encabezado.")
+            else:
+                yield lector.line_num, fila
+        return
+
+    for n, linea in enumerate(lineas, start=1):
+        if not linea.strip():
+            continue
+        try:
+            registro = json.loads(linea)
+        except ValueError as e:
+            yield n, LineaInvalida(f"JSON inválido: {e}")
+            continue
+        if not isinstance(registro, dict):
+            yield n, LineaInvalida("Cada línea debe ser un objeto JSON.")
+        else:
+            yield n, registro
+
+
+def _texto(valor: Any) -> str:
+    return "" if valor is None else str(valor).strip()
+
+
+def _entero(valor: Any) -> Optional[int]:
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, int):
+        return valor
+    texto = _texto(valor)
+    return int(texto) if texto.isdigit() else None
+
+
+def validar_registro(
+    registro: Dict[str, Any],
+    cuentas: Set[int],
+    vendedores: Set[int],
+    vendedor_default: int,
+    ahora: str,
+) -> Tuple[Optional[Tuple], List[str]]:
+    """
+    Convierte un registro en la tupla de INSERT de ventas, o devuelve sus errores.
+    `cuentas` y `vendedores` son los ids activos (se leen una vez por carga).
+    """
+    errores = []
+
+    desconocidos = set(registro) - set(CAMPOS)
+    if desconocidos:
+        errores.append("Campos desconocidos: " + ", ".join(sorted(map(str, desconocidos))) + ".")
+
+    folio = _texto(registro.get("folio"))
+    if not folio:
+        errores.append("El folio es obligatorio.")
+    elif len(folio) > MAX_LARGO_FOLIO:
+        errores.append(f"El folio no puede pasar de {MAX_LARGO_FOLIO} caracteres.")
+
+    cliente_nombre = _texto(registro.get("cliente_nombre"))
+    if not cliente_nombre:
+        errores.append("El nombre del cliente es obligatorio.")
+
+    monto = registro.get("monto")
+    if isinstance(monto, bool) or monto is None or _texto(monto) == "":
+        errores.append("El monto es obligatorio.")
+        monto = None
+    else:
+        try:
+            monto = float(monto)
+        except (TypeError, ValueError):
+            errores.append("El monto debe ser numérico.")
+            monto = None
+        else:
+            if not math.isfinite(monto) or monto <= 0:
+                errores.append("El monto debe ser mayor a cero.")
+
+    cuenta_bancaria_id = _entero(registro.get("cuenta_bancaria_id"))
+    if cuenta_bancaria_id is None:
+        errores.append("cuenta_bancaria_id es obligatorio y debe ser entero.")
+    elif cuenta_bancaria_id not in cuentas:
+        errores.append(f"La cuenta bancaria {cuenta_bancaria_id} no existe o no está activa.")
+
+    vendedor_id = vendedor_default
+    if _texto(registro.get("vendedor_id")):
+        vendedor_id = _entero(registro.get("vendedor_id"))
+        if vendedor_id not in vendedores:
+            errores.append(f"El vendedor {registro.get('vendedor_id')} no existe o no está activo.")
+
+    moneda = _texto(registro.get("moneda")).upper() or "MXN"
+    if len(moneda) != 3 or not moneda.isalpha():
+        errores.append("La moneda debe ser un código de 3 letras (ej. MXN).")
+
+    fecha = ahora
+    if _texto(registro.get("fecha")):
+        try:
+            fecha = datetime.fromisoformat(_texto(registro.get("fecha"))).isoformat(sep=" ", timespec="seconds")
+        except ValueError:
+            errores.append("La fecha debe ser YYYY-MM-DD o YYYY-MM-DD HH:MM:SS.")
+
+    if errores:
+        return None, errores
+    nota = _texto(registro.get("nota")) or None
+    return (folio, cliente_nombre, monto, moneda, cuenta_bancaria_id, vendedor_id, fecha, ahora, nota), []
+
+
+def _folios_existentes(db: sqlite3.Connection, folios: List[str]) -> Set[str]:
+    existentes = set()
+    for inicio in range(0, len(folios), 500):
+        bloque = folios[inicio:inicio + 500]
+        marcadores = ",".join("?" * len(bloque))
+        existentes.update(
+            f for (f,) in db.execute(f"SELECT folio FROM ventas WHERE folio IN ({marcadores})", bloque)
+        )
+    return existentes
+
+
+def _ids_por_folio(db: sqlite3.Connection, folios: List[str]) -> Dict[str, int]:
+    ids = {}
+    for inicio in range(0, len(folios), 500):
+        bloque = folios[inicio:inicio + 500]
+        marcadores = ",".join("?" * len(bloque))
+        ids.update(db.execute(f"SELECT folio, id FROM ventas WHERE folio IN ({marcadores})", bloque).fetchall())
+    return ids
+
+
+_INSERT_VENTA = """
+    INSERT INTO ventas (
+        folio, cliente_nombre, monto, moneda, cuenta_bancaria_id,
+        vendedor_id, estado_banco, fecha_creacion, fecha_ultimo_cambio, nota
+    )
+    VALUES (?, ?, ?, ?, ?, ?, 'PENDIENTE', ?, ?, ?)
+"""
+
+
+def _insertar_lote(db: sqlite3.Connection, filas: List[Tuple]) -> Set[str]:
+    """Inserta el lote y hace commit. Devuelve los folios que chocaron con otra carga."""
+    try:
+        db.executemany(_INSERT_VENTA, filas)
+        db.commit()
+        return set()
+    except sqlite3.IntegrityError:
+        # Otra carga metió alguno de estos folios entre la revisión y el INSERT: se repite
+        # el lote registro por registro para saber cuáles
+        db.rollback()
+
+    chocaron = set()
+    for fila in filas:
+        try:
+            db.execute(_INSERT_VENTA, fila)
+        except sqlite3.IntegrityError:
+            chocaron.add(fila[0])
+    db.commit()
+    return chocaron
+
+
+def ingerir_ventas(
+    db: sqlite3.Connection,
+    registros: Iterable[Tuple[int, Any]],
+    vendedor_default: int,
+    tam_lote: int = TAM_LOTE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Valida e inserta los registros de leer_registros. Produce un resultado por línea, en
+    orden y por lotes (después del commit de cada lote), y al final un
+    {"resumen": {...}} con los totales y las cuentas que recibieron ventas.
+    """
+    cuentas = {i for (i,) in db.execute("SELECT id FROM cuentas_bancarias WHERE activa = 1")}
+    vendedores = {i for (i,) in db.execute("SELECT id FROM usuarios WHERE activo = 1")}
+    ahora = datetime.now().isoformat(sep=" ", timespec="seconds")
+
+    vistos: Set[str] = set()
+    cuentas_tocadas: Set[int] = set()
+    total = insertadas = 0
+
+    def procesar(lote: List[Tuple[int, Any]]) -> List[Dict[str, Any]]:
+        nonlocal insertadas
+        resultados = []
+        pendientes = []  # (resultado, fila) de los registros válidos
+        for linea, registro in lote:
+            if isinstance(registro, LineaInvalida):
+                resultados.append({"linea": linea, "ok": False, "errores": [str(registro)]})
+                continue
+            fila, errores = validar_registro(registro, cuentas, vendedores, vendedor_default, ahora)
+            if fila and fila[0] in vistos:
+                errores = [f"El folio {fila[0]} viene repetido en la carga."]
+            resultado = {"linea": linea, "ok": not errores, "folio": fila[0] if fila else _texto(registro.get("folio"))}
+            if errores:
+                resultado["errores"] = errores
+            else:
+                vistos.add(fila[0])
+                pendientes.append((resultado, fila))
+            resultados.append(resultado)
+
+        if pendientes:
+            existentes = _folios_existentes(db, [f[0] for _, f in pendientes])
+            filas = []
+            for resultado, fila in pendientes:
+                if fila[0] in existentes:
+                    resultado["ok"] = False
+                    resultado["errores"] = [f"Ya existe una venta con el folio {fila[0]}."]
+                else:
+                    filas.append(fila)
+
+            chocaron = _insertar_lote(db, filas) if filas else set()
+            ids = _ids_por_folio(db, [f[0] for f in filas if f[0] not in chocaron])
+            for resultado, fila in pendientes:
+                if not resultado["ok"]:
+                    continue
+                if fila[0] in chocaron:
+                    resultado["ok"] = False
+                    resultado["errores"] = [f"Ya existe una venta con el folio {fila[0]}."]
+                else:
+                    resultado["venta_id"] = ids[fila[0]]
+                    cuentas_tocadas.add(fila[4])
+                    insertadas += 1
+        return resultados
+
+    lote = []
+    for linea, registro in registros:
+        total += 1
+        lote.append((linea, registro))
+        if len(lote) >= tam_lote:
+            yield from procesar(lote)
+            lote = []
+    if lote:
+        yield from procesar(lote)
+
+    yield {
+        "resumen": {
+            "registros": total,
+            "insertadas": insertadas,
+            "con_error": total - insertadas,
+            "cuentas": sorted(cuentas_tocadas),
+        }
+    }
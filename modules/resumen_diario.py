@@ -0,0 +1,107 @@
+import sqlite3
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+# Totales por día y cuenta para el cierre diario (tabla resumen_diario).
+#
+# Los triggers de add_resumen_diario.py suman y restan cada venta y cada pago en su
+# renglón (fecha, cuenta) al insertarlo, cambiarlo o borrarlo, así que el cierre lee unos
+# cuantos renglones en lugar de recorrer las ventas y pagos del día. La fecha es la de
+# creación de la venta y la de operación del pago; los pagos sin cuenta identificada van
+# en la cuenta 0.
+#
+# reconstruir_resumen() lo recalcula desde cero (lo usa la migración; sirve también si se
+# cargaron datos con los triggers apagados, p. ej. al recrear una tabla).
+
+TOTALES = (
+    "ventas",
+    "monto_ventas",
+    "ventas_pagadas",
+    "ventas_pendientes",
+    "pagos",
+    "monto_pagos",
+    "pagos_con_venta",
+    "monto_pagos_con_venta",
+    "pagos_sin_venta",
+    "monto_pagos_sin_venta",
+)
+
+DIAS_TENDENCIA = 14
+
+_SUMAS = ", ".join(f"COALESCE(SUM(r.{t}), 0) AS {t}" for t in TOTALES)
+
+# (fecha,)
+SQL_RESUMEN_DIA = f"""
+    SELECT r.cuenta_bancaria_id, c.alias AS cuenta_alias, {", ".join("r." + t for t in TOTALES)}
+    FROM resumen_diario r
+    LEFT JOIN cuentas_bancarias c ON r.cuenta_bancaria_id = c.id
+    WHERE r.fecha = ? AND (r.ventas != 0 OR r.pagos != 0)
+    ORDER BY c.alias IS NULL, c.alias
+"""
+
+# (desde, hasta)
+SQL_TENDENCIA = f"""
+    SELECT r.fecha, {_SUMAS}
+    FROM resumen_diario r
+    WHERE r.fecha >= ? AND r.fecha <= ?
+    GROUP BY r.fecha
+"""
+
+
+def reconstruir_resumen(db: sqlite3.Connection) -> None:
+    """Recalcula resumen_diario completo a partir de ventas y pagos_detectados (sin commit)."""
+    db.execute("DELETE FROM resumen_diario")
+    db.execute(
+        """
+        INSERT INTO resumen_diario (fecha, cuenta_bancaria_id, ventas, monto_ventas, ventas_pagadas, ventas_pendientes)
+        SELECT date(fecha_creacion), cuenta_bancaria_id, COUNT(*), SUM(monto),
+               SUM(estado_banco = 'PAGADO'), SUM(estado_banco != 'PAGADO')
+        FROM ventas
+        WHERE date(fecha_creacion) IS NOT NULL
+        GROUP BY 1, 2
+        """
+    )
+    db.execute(
+        """
+        INSERT INTO resumen_diario (
+            fecha, cuenta_bancaria_id, pagos, monto_pagos,
+            pagos_con_venta, monto_pagos_con_venta, pagos_sin_venta, monto_pagos_sin_venta
+        )
+        SELECT date(fecha_operacion), COALESCE(cuenta_bancaria_id, 0), COUNT(*), SUM(monto),
+               SUM(venta_id IS NOT NULL), TOTAL(CASE WHEN venta_id IS NOT NULL THEN monto END),
+               SUM(venta_id IS NULL), TOTAL(CASE WHEN venta_id IS NULL THEN monto END)
+        FROM pagos_detectados
+        WHERE date(fecha_operacion) IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT (fecha, cuenta_bancaria_id) DO UPDATE SET
+            pagos = excluded.pagos,
+            monto_pagos = excluded.monto_pagos,
+            pagos_con_venta = excluded.pagos_con_venta,
+            monto_pagos_con_venta = excluded.monto_pagos_con_venta,
+            pagos_sin_venta = excluded.pagos_sin_venta,
+            monto_pagos_sin_venta = excluded.monto_pagos_sin_venta
+        """
+    )
+
+
+def resumen_dia(db: sqlite3.Connection, fecha: str) -> Dict[str, Any]:
+    """
+    Totales del día (`fecha` = YYYY-MM-DD): los del día completo más "cuentas", con el
+    desglose por cuenta (las que tuvieron movimiento).
+    """
+    cuentas = [dict(fila) for fila in db.execute(SQL_RESUMEN_DIA, (fecha,))]
+    totales = {t: sum(c[t] for c in cuentas) for t in TOTALES}
+    totales["cuentas"] = cuentas
+    return totales
+
+
+def tendencia(db: sqlite3.Connection, hasta: str, dias: int = DIAS_TENDENCIA) -> List[Dict[str, Any]]:
+    """Totales de cada uno de los `dias` días que terminan en `hasta`, del más reciente al más antiguo."""
+    desde = (date.fromisoformat(hasta) - timedelta(days=dias - 1)).isoformat()
+    por_fecha = {fila["fecha"]: dict(fila) for fila in db.execute(SQL_TENDENCIA, (desde, hasta))}
+    fin = date.fromisoformat(hasta)
+    dias_lista = []
+    for i in range(dias):
+        fecha = (fin - timedelta(days=i)).isoformat()
+        dias_lista.append(por_fecha.get(fecha) or dict({t: 0 for t in TOTALES}, fecha=fecha))
+    return dias_lista
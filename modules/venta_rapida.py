@@ -0,0 +1,349 @@
+import secrets
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Facturas de venta rápida en espera (entre el paso 1 y el paso 2) y documentos de las
+# ventas rápidas ya creadas.
+#
+# El reporte de antigüedad ya parseado se guarda en venta_rapida_facturas bajo un token
+# de carga. La vista previa pide las facturas por página (con filtros) a un endpoint JSON
+# y cada selección o monto editado se guarda en la misma tabla, así que el navegador solo
+# tiene una página a la vez y el paso 2 solo manda el token. Las cargas que nadie confirmó
+# se borran solas después de TTL_STAGING_HORAS (al guardar una carga nueva).
+#
+# Las ventas rápidas de un lote se crean en una sola transacción (crear_ventas_rapidas) y
+# toman su folio de la secuencia VR de secuencias_folio (reservar_folios), así que dos
+# lotes simultáneos nunca repiten folio; el índice único de ventas.folio lo garantiza.
+#
+# Cada venta rápida guarda sus documentos (documento, neto editado, neto original) en
+# venta_documentos; la nota de la venta conserva el mismo detalle como texto, pero las
+# pantallas y el corte leen la tabla.
+
+TTL_STAGING_HORAS = 24
+
+
+def limpiar_staging(db: sqlite3.Connection, horas: int = TTL_STAGING_HORAS) -> int:
+    """Borra las cargas con más de `horas` de antigüedad. Devuelve cuántas borró."""
+    vencidas = [
+        row[0]
+        for row in db.execute(
+            "SELECT token FROM venta_rapida_cargas WHERE creado_en < datetime('now', ?)",
+            (f"-{int(horas)} hours",),
+        )
+    ]
+    for token in vencidas:
+        descartar_staging(db, token)
+    return len(vencidas)
+
+
+def guardar_staging(db: sqlite3.Connection, facturas: List[Dict[str, Any]], usuario_id: int) -> str:
+    """Guarda las facturas parseadas (índice = posición en la lista) y devuelve el token."""
+    limpiar_staging(db)
+    token = secrets.token_urlsafe(16)
+    db.execute(
+        "INSERT INTO venta_rapida_cargas (token, usuario_id) VALUES (?, ?)",
+        (token, usuario_id),
+    )
+    db.executemany(
+        """
+        INSERT INTO venta_rapida_facturas (token, idx, cliente, documento, neto)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        ((token, i, f["cliente"], f["documento"], f["neto"]) for i, f in enumerate(facturas)),
+    )
+    return token
+
+
+def carga_de_usuario(db: sqlite3.Connection, token: str, usuario_id: int) -> bool:
+    """True si la carga existe (no ha vencido) y es del usuario."""
+    return db.execute(
+        "SELECT 1 FROM venta_rapida_cargas WHERE token = ? AND usuario_id = ?",
+        (token, usuario_id),
+    ).fetchone() is not None
+
+
+def _patron_like(texto: str) -> str:
+    # Búsqueda "contiene", escapando los comodines de LIKE
+    texto = texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{texto}%"
+
+
+def _filtros_sql(token: str, filtros: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """
+    WHERE para las facturas de una carga. filtros: cliente, documento (contiene, sin
+    distinguir mayúsculas), monto_min / monto_max (sobre el neto original) y
+    solo_seleccionadas. Todo va acotado por el token (llave primaria token, idx) y el
+    rango de montos usa el índice (token, neto).
+    """
+    condiciones = ["token = ?"]
+    params: List[Any] = [token]
+    if filtros.get("cliente"):
+        condiciones.append("cliente LIKE ? ESCAPE '\\'")
+        params.append(_patron_like(filtros["cliente"]))
+    if filtros.get("documento"):
+        condiciones.append("documento LIKE ? ESCAPE '\\'")
+        params.append(_patron_like(filtros["documento"]))
+    if filtros.get("monto_min") is not None:
+        condiciones.append("neto >= ?")
+        params.append(filtros["monto_min"])
+    if filtros.get("monto_max") is not None:
+        condiciones.append("neto <= ?")
+        params.append(filtros["monto_max"])
+    if filtros.get("solo_seleccionadas"):
+        condiciones.append("seleccionada = 1")
+    return " AND ".join(condiciones), params
+
+
+def resumen_seleccion(db: sqlite3.Connection, token: str) -> Dict[str, Any]:
+    """Documentos seleccionados y sus totales (original y editado) de toda la carga."""
+    documentos, original, editado = db.execute(
+        """
+        SELECT COUNT(*), COALESCE(SUM(neto), 0), COALESCE(SUM(COALESCE(neto_editado, neto)), 0)
+        FROM venta_rapida_facturas
+        WHERE token = ? AND seleccionada = 1
+        """,
+        (token,),
+    ).fetchone()
+    return {"documentos": documentos, "neto_original": original, "neto_editado": editado}
+
+
+# where: el de _filtros_sql; parámetros: los suyos, por_pagina y offset
+SQL_PAGINA_FACTURAS = """
+    SELECT idx, cliente, documento, neto, COALESCE(neto_editado, neto), seleccionada
+    FROM venta_rapida_facturas
+    WHERE {where}
+    ORDER BY idx
+    LIMIT ? OFFSET ?
+"""
+
+
+def pagina_facturas(
+    db: sqlite3.Connection, token: str, filtros: Dict[str, Any], pagina: int = 1, por_pagina: int = 100
+) -> Dict[str, Any]:
+    """Una página de facturas filtradas (en el orden del reporte) más el resumen de selección."""
+    where, params = _filtros_sql(token, filtros)
+    (total,) = db.execute(f"SELECT COUNT(*) FROM venta_rapida_facturas WHERE {where}", params).fetchone()
+    paginas = max(1, -(-total // por_pagina))
+    pagina = min(max(1, pagina), paginas)
+    cur = db.execute(
+        SQL_PAGINA_FACTURAS.format(where=where),
+        (*params, por_pagina, (pagina - 1) * por_pagina),
+    )
+    facturas = [
+        {
+            "idx": idx,
+            "cliente": cliente,
+            "documento": documento,
+            "neto": neto,
+            "neto_editado": editado,
+            "seleccionada": bool(seleccionada),
+        }
+        for idx, cliente, documento, neto, editado, seleccionada in cur.fetchall()
+    ]
+    return {
+        "facturas": facturas,
+        "total": total,
+        "pagina": pagina,
+        "paginas": paginas,
+        "resumen": resumen_seleccion(db, token),
+    }
+
+
+def marcar_facturas(db: sqlite3.Connection, token: str, cambios: Iterable[Dict[str, Any]]) -> None:
+    """
+    Aplica cambios de la vista previa: cada uno trae idx y opcionalmente "seleccionada"
+    (bool) y/o "neto_editado" (número, o None para volver al original).
+    """
+    for cambio in cambios:
+        idx = int(cambio["idx"])
+        if "seleccionada" in cambio:
+            db.execute(
+                "UPDATE venta_rapida_facturas SET seleccionada = ? WHERE token = ? AND idx = ?",
+                (1 if cambio["seleccionada"] else 0, token, idx),
+            )
+        if "neto_editado" in cambio:
+            editado = cambio["neto_editado"]
+            db.execute(
+                "UPDATE venta_rapida_facturas SET neto_editado = ? WHERE token = ? AND idx = ?",
+                (None if editado is None else float(editado), token, idx),
+            )
+
+
+def marcar_filtradas(db: sqlite3.Connection, token: str, filtros: Dict[str, Any], seleccionada: bool) -> int:
+    """Selecciona (o quita) todas las facturas que pasan los filtros. Devuelve cuántas tocó."""
+    where, params = _filtros_sql(token, filtros)
+    cur = db.execute(
+        f"UPDATE venta_rapida_facturas SET seleccionada = ? WHERE {where}",
+        (1 if seleccionada else 0, *params),
+    )
+    return cur.rowcount
+
+
+def facturas_seleccionadas(db: sqlite3.Connection, token: str, usuario_id: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    Facturas seleccionadas de la carga, en el orden del reporte, con su neto editado.
+    None si el token no existe, ya venció o es de otro usuario.
+    """
+    if not carga_de_usuario(db, token, usuario_id):
+        return None
+    cur = db.execute(
+        """
+        SELECT cliente, documento, neto, COALESCE(neto_editado, neto)
+        FROM venta_rapida_facturas
+        WHERE token = ? AND seleccionada = 1
+        ORDER BY idx
+        """,
+        (token,),
+    )
+    return [
+        {"cliente": cliente, "documento": documento, "neto": neto, "neto_editado": editado}
+        for cliente, documento, neto, editado in cur.fetchall()
+    ]
+
+
+def descartar_staging(db: sqlite3.Connection, token: str) -> None:
+    db.execute("DELETE FROM venta_rapida_facturas WHERE token = ?", (token,))
+    db.execute("DELETE FROM venta_rapida_cargas WHERE token = ?", (token,))
+
+
+def reservar_folios(db: sqlite3.Connection, prefijo: str, cantidad: int) -> int:
+    """
+    Reserva `cantidad` números consecutivos de la secuencia `prefijo` y devuelve el primero.
+    El UPDATE toma el candado de escritura, así que la reserva vale hasta el commit.
+    """
+    db.execute("INSERT OR IGNORE INTO secuencias_folio (prefijo, ultimo) VALUES (?, 0)", (prefijo,))
+    (ultimo,) = db.execute(
+        "UPDATE secuencias_folio SET ultimo = ultimo + ? WHERE prefijo = ? RETURNING ultimo",
+        (cantidad, prefijo),
+    ).fetchone()
+    return ultimo - cantidad + 1
+
+
+def crear_ventas_rapidas(
+    db: sqlite3.Connection,
+    por_cliente: Dict[str, List[Dict[str, Any]]],
+    cuenta_bancaria_id: int,
+    vendedor_id: int,
+) -> int:
+    """
+    Crea una venta por cliente (los clientes con total <= 0 se omiten) con sus documentos.
+    No hace commit: el llamador decide. Devuelve cuántas ventas creó.
+    """
+    ahora = datetime.now()
+    fecha = ahora.isoformat(sep=" ", timespec="seconds")
+    clientes = [
+        (cliente, det_list, sum(d["neto_editado"] for d in det_list))
+        for cliente, det_list in por_cliente.items()
+    ]
+    clientes = [c for c in clientes if c[2] > 0]
+    if not clientes:
+        return 0
+
+    # Folio: VR-<código de cliente>-<fecha>-<consecutivo> (ej. VR-21100074-20251126-000042)
+    primero = reservar_folios(db, "VR", len(clientes))
+    ventas = []
+    documentos = []
+    for n, (cliente, det_list, total_cliente) in enumerate(clientes, start=primero):
+        codigo = cliente.split()[0].replace("-", "") if cliente else "VR"
+        folio = f"VR-{codigo}-{ahora:%Y%m%d}-{n:06d}"
+
+        # Nota con el detalle de facturas
+        lineas = [
+            f"Doc {d['documento']}: {d['neto_editado']:.2f} (original {d['neto_original']:.2f})"
+            for d in det_list
+        ]
+        nota = "Venta rápida.\nCliente: " + (cliente or "SIN NOMBRE") + "\n" + "\n".join(lineas)
+
+        ventas.append((folio, cliente, total_cliente, cuenta_bancaria_id, vendedor_id, fecha, fecha, nota))
+        documentos.extend((folio, d) for d in det_list)
+
+    db.executemany(
+        """
+        INSERT INTO ventas (
+            folio, cliente_nombre, monto, cuenta_bancaria_id,
+            vendedor_id, estado_banco, fecha_creacion, fecha_ultimo_cambio, nota
+        )
+        VALUES (?, ?, ?, ?, ?, 'PENDIENTE', ?, ?, ?)
+        """,
+        ventas,
+    )
+
+    # executemany no regresa los ids: se buscan por folio (índice único)
+    folios = [v[0] for v in ventas]
+    ids = {}
+    for inicio in range(0, len(folios), 500):
+        bloque = folios[inicio:inicio + 500]
+        marcadores = ",".join("?" * len(bloque))
+        ids.update(db.execute(f"SELECT folio, id FROM ventas WHERE folio IN ({marcadores})", bloque).fetchall())
+    guardar_documentos(db, ((ids[folio], d) for folio, d in documentos))
+    return len(ventas)
+
+
+def guardar_documentos(db: sqlite3.Connection, documentos: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+    """Inserta en bloque los documentos, como pares (venta_id, detalle)."""
+    db.executemany(
+        """
+        INSERT INTO venta_documentos (venta_id, documento, neto_editado, neto_original)
+        VALUES (?, ?, ?, ?)
+        """,
+        (
+            (venta_id, d["documento"], d["neto_editado"], d["neto_original"])
+            for venta_id, d in documentos
+        ),
+    )
+
+
+SQL_DOCUMENTOS_VENTA = """
+    SELECT documento, neto_editado, neto_original
+    FROM venta_documentos
+    WHERE venta_id = ?
+    ORDER BY id
+"""
+
+
+def documentos_venta(db: sqlite3.Connection, venta_id: int) -> List[Dict[str, Any]]:
+    """Documentos de una venta rápida en el orden en que se capturaron ([] si no es rápida)."""
+    cur = db.execute(SQL_DOCUMENTOS_VENTA, (venta_id,))
+    return [
+        {"documento": documento, "neto_editado": editado, "neto_original": original}
+        for documento, editado, original in cur.fetchall()
+    ]
+
+
+def parsear_detalle_nota(nota: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Detalle de una venta rápida a partir de su nota (líneas "Doc X: 1.00 (original 2.00)").
+    Solo lo usa el backfill de venta_documentos para las ventas creadas antes de la tabla.
+    """
+    if not nota or "Venta rápida" not in nota:
+        return []
+    detalle = []
+    for linea in nota.splitlines():
+        linea = linea.strip()
+        if not linea.startswith("Doc "):
+            continue
+        try:
+            sin_prefijo = linea[4:]  # quitar "Doc "
+            parte_doc, resto = sin_prefijo.split(":", 1)
+            documento = parte_doc.strip()
+
+            resto = resto.strip()
+            if "(original" in resto:
+                monto_edit_str, parte_original = resto.split("(original", 1)
+                monto_edit = float(monto_edit_str.strip())
+                monto_orig = float(parte_original.replace(")", "").strip())
+            else:
+                monto_edit = float(resto.strip())
+                monto_orig = monto_edit
+        except Exception:
+            continue
+
+        detalle.append(
+            {
+                "documento": documento,
+                "neto_editado": monto_edit,
+                "neto_original": monto_orig,
+            }
+        )
+    return detalle
@@ -0,0 +1,196 @@
+import sqlite3
+from bisect import bisect_left, bisect_right
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Verificación de la cadena de saldos por cuenta.
+#
+# En pagos_detectados solo guardamos abonos, pero los que traen saldo_posterior (BBVA,
+# Banamex, Banorte, CAMT.053, MT940) permiten revisar que no falte ninguno: entre dos
+# abonos consecutivos
+#     saldo_actual = saldo_anterior + monto_actual - (cargos intermedios)
+# Los cargos solo pueden bajar el saldo, así que si
+#     saldo_actual - saldo_anterior - monto_actual > 0
+# entró dinero que no tenemos registrado: falta al menos un depósito por esa diferencia.
+
+TOLERANCIA = 0.005
+
+
+SQL_MOVIMIENTOS = """
+    SELECT id, cuenta_bancaria_id, fecha_operacion, monto, saldo_posterior, fuente_archivo
+    FROM pagos_detectados
+    WHERE cuenta_bancaria_id IS NOT NULL
+"""
+FILTRO_CUENTA = " AND cuenta_bancaria_id = ?"
+
+
+def _cargar_movimientos(db: sqlite3.Connection, cuenta_bancaria_id: Optional[int]) -> pd.DataFrame:
+    sql = SQL_MOVIMIENTOS
+    params: List[Any] = []
+    if cuenta_bancaria_id is not None:
+        sql += FILTRO_CUENTA
+        params.append(cuenta_bancaria_id)
+    cur = db.execute(sql, params)
+    return pd.DataFrame.from_records(
+        cur.fetchall(),
+        columns=["id", "cuenta_bancaria_id", "fecha_operacion", "monto", "saldo_posterior", "fuente_archivo"],
+    )
+
+
+def _ordenar(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Orden cronológico por cuenta. Dentro de un mismo día el orden es el de inserción, pero
+    los archivos que se cargaron antes de importar en orden cronológico quedaron del más
+    reciente al más antiguo: por archivo, si en orden de id las fechas bajan más veces de
+    las que suben, ese archivo se invierte (por mayoría: un renglón que se insertó después
+    no voltea el archivo completo).
+    """
+    df = df.sort_values("id", kind="mergesort")
+    df["archivo"] = df.groupby(["cuenta_bancaria_id", "fuente_archivo"], dropna=False, sort=False).ngroup()
+    fecha_previa = df.groupby("archivo")["fecha_operacion"].shift()
+    votos = pd.DataFrame(
+        {"sube": df["fecha_operacion"] > fecha_previa, "baja": df["fecha_operacion"] < fecha_previa}
+    ).groupby(df["archivo"]).transform("sum")
+    df["orden"] = np.where(votos["baja"] > votos["sube"], -df["id"], df["id"])
+    return _reubicar_tardios(df.sort_values(["cuenta_bancaria_id", "fecha_operacion", "orden"], kind="mergesort"))
+
+
+def _reubicar_tardios(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Un depósito que llenó un hueco (el archivo se volvió a subir después) tiene un id mayor
+    que los de días posteriores de su archivo, así que el id no dice en qué lugar de su día
+    va. Esos pocos se acomodan dentro de su día donde la cadena de saldos cuadra: la
+    posición que deja menos huecos y, entre esas, la de menos cargos intermedios.
+    """
+    archivo = df["archivo"]
+    # En orden cronológico "orden" sube dentro de cada archivo. El que se insertó después
+    # tiene el id más alto: en un archivo normal queda por arriba de lo que le sigue, en uno
+    # invertido (orden = -id) por debajo de lo que le precede.
+    al_reves = df["orden"].iloc[::-1]
+    menor_despues = al_reves.groupby(archivo).cummin().groupby(archivo).shift()[df.index]
+    mayor_antes = df["orden"].groupby(archivo).cummax().groupby(archivo).shift()
+    tardio = np.where(df["orden"] < 0, df["orden"] < mayor_antes, df["orden"] > menor_despues)
+    tardios = list(df.index[tardio])
+    if not tardios:
+        return df
+
+    saldo = df["saldo_posterior"].to_dict()
+    monto = df["monto"].to_dict()
+    filas = list(df.index[~tardio])
+    claves = list(zip(df.loc[filas, "cuenta_bancaria_id"], df.loc[filas, "fecha_operacion"]))
+
+    def faltante(anterior, siguiente) -> float:
+        return round(saldo[siguiente] - saldo[anterior] - monto[siguiente], 2)
+
+    for t in tardios:
+        clave = (df.at[t, "cuenta_bancaria_id"], df.at[t, "fecha_operacion"])
+        mejor = None
+        for pos in range(bisect_left(claves, clave), bisect_right(claves, clave) + 1):
+            anterior = filas[pos - 1] if pos > 0 and claves[pos - 1][0] == clave[0] else None
+            siguiente = filas[pos] if pos < len(filas) and claves[pos][0] == clave[0] else None
+            antes = faltante(anterior, t) if anterior is not None else 0.0
+            despues = faltante(t, siguiente) if siguiente is not None else 0.0
+            # El hueco que ya había entre anterior y siguiente deja de contar
+            previo = faltante(anterior, siguiente) if anterior is not None and siguiente is not None else 0.0
+            huecos = (antes > TOLERANCIA) + (despues > TOLERANCIA) - (previo > TOLERANCIA)
+            costo = (huecos, abs(antes))
+            if mejor is None or costo < mejor[0]:
+                mejor = (costo, pos)
+        filas.insert(mejor[1], t)
+        claves.insert(mejor[1], clave)
+    return df.loc[filas]
+
+
+def calcular_huecos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Recibe los abonos con saldo de una o varias cuentas y devuelve un renglón por hueco:
+    cuenta, desde/hasta (fechas de los abonos que lo rodean), ids de esos abonos y el monto
+    que falta por explicar. Todo vectorizado: sirve para millones de renglones.
+    """
+    df = df[df["saldo_posterior"].notna()].reset_index(drop=True)
+    if df.empty:
+        return pd.DataFrame(
+            columns=["cuenta_bancaria_id", "desde_fecha", "hasta_fecha", "pago_anterior_id", "pago_siguiente_id", "monto_faltante"]
+        )
+
+    df = _ordenar(df)
+    misma_cuenta = df["cuenta_bancaria_id"].eq(df["cuenta_bancaria_id"].shift())
+    saldo_anterior = df["saldo_posterior"].shift()
+    faltante = (df["saldo_posterior"] - saldo_anterior - df["monto"]).round(2)
+    mask = misma_cuenta & (faltante > TOLERANCIA)
+
+    return pd.DataFrame(
+        {
+            "cuenta_bancaria_id": df["cuenta_bancaria_id"][mask].astype(int),
+            "desde_fecha": df["fecha_operacion"].shift()[mask],
+            "hasta_fecha": df["fecha_operacion"][mask],
+            "pago_anterior_id": df["id"].shift()[mask].astype(int),
+            "pago_siguiente_id": df["id"][mask],
+            "monto_faltante": faltante[mask],
+        }
+    ).reset_index(drop=True)
+
+
+def verificar_saldos(db: sqlite3.Connection, cuenta_bancaria_id: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Corre la verificación (de una cuenta o de todas) y guarda el resultado en
+    salud_cuentas / huecos_saldo para el panel de admin. No hace commit.
+    Devuelve {cuenta_bancaria_id: {"estado", "movimientos", "huecos", "monto_faltante"}}.
+    """
+    df = _cargar_movimientos(db, cuenta_bancaria_id)
+    huecos = calcular_huecos(df)
+
+    if cuenta_bancaria_id is not None:
+        cuentas = [cuenta_bancaria_id]
+    else:
+        cuentas = [row[0] for row in db.execute("SELECT id FROM cuentas_bancarias").fetchall()]
+
+    # Como dict: con la Serie, .get(int) sobre un índice vacío (dtype object) cae en búsqueda por posición
+    con_saldo = df[df["saldo_posterior"].notna()].groupby("cuenta_bancaria_id").size().to_dict()
+    por_cuenta = huecos.groupby("cuenta_bancaria_id")["monto_faltante"].agg(["size", "sum"]).to_dict()
+
+    resultado = {}
+    for cuenta_id in cuentas:
+        movimientos = int(con_saldo.get(cuenta_id, 0))
+        n_huecos = int(por_cuenta["size"].get(cuenta_id, 0))
+        faltante = float(por_cuenta["sum"].get(cuenta_id, 0.0))
+        if movimientos == 0:
+            estado = "SIN_SALDO"
+        elif n_huecos:
+            estado = "HUECOS"
+        else:
+            estado = "OK"
+        resultado[cuenta_id] = {
+            "estado": estado,
+            "movimientos": movimientos,
+            "huecos": n_huecos,
+            "monto_faltante": round(faltante, 2),
+        }
+
+    placeholders = ", ".join("?" for _ in cuentas)
+    db.execute(f"DELETE FROM huecos_saldo WHERE cuenta_bancaria_id IN ({placeholders})", cuentas)
+    db.executemany(
+        """
+        INSERT INTO huecos_saldo (
+            cuenta_bancaria_id, desde_fecha, hasta_fecha,
+            pago_anterior_id, pago_siguiente_id, monto_faltante
+        )
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        huecos.astype(object).itertuples(index=False, name=None),
+    )
+    db.executemany(
+        """
+        INSERT OR REPLACE INTO salud_cuentas (
+            cuenta_bancaria_id, estado, movimientos, huecos, monto_faltante, verificado_en
+        )
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """,
+        [
+            (cuenta_id, r["estado"], r["movimientos"], r["huecos"], r["monto_faltante"])
+            for cuenta_id, r in resultado.items()
+        ],
+    )
+    return resultado
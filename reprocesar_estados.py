@@ -0,0 +1,173 @@
+"""
+Reprocesa los estados de cuenta archivados (uploads/estados) con los parsers actuales,
+sin pedir otra vez los archivos a tesorería ni volver a leer los Excel.
+
+Para cada archivo de archivos_movimientos que tiene estado crudo:
+  - corre el normalizador del banco sobre la tabla archivada (Parquet), en paralelo;
+    CAMT.053 / MT940 se vuelven a leer en streaming desde el proceso principal,
+  - inserta los movimientos que ahora salen distintos (solo nuevos, por hash_unico),
+  - borra los movimientos de ese archivo que el parser ya no produce, siempre que sigan
+    PENDIENTE y sin venta ligada (los conciliados se dejan y se reportan),
+  - corre UNA conciliación al final.
+
+Uso:
+    python reprocesar_estados.py [--banco BBVA] [--archivo-id 12] [--workers 4] [--sin-conciliar]
+"""
+import argparse
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from modules.archivo_estados import cargar_estado
+from modules.conciliacion import run_conciliacion
+from modules.importacion import FORMATOS_MULTICUENTA, NORMALIZADORES, PARSERS, guardar_lote
+from modules.verificacion_saldos import verificar_saldos
+
+DB_PATH = "azyco_pagos.db"
+
+
+def normalizar_archivado(banco, nombre_archivo, archivo_crudo):
+    """
+    Corre en un proceso del pool: no toca la BD, solo lee el Parquet y normaliza.
+    Sin marcas de agua: se reprocesa el archivo completo.
+    """
+    _, normalizar = NORMALIZADORES[banco]
+    return normalizar(cargar_estado(archivo_crudo), nombre_archivo)
+
+
+def borrar_obsoletos(db, archivo_id, hashes):
+    """
+    Quita los movimientos del archivo cuyo hash ya no produce el parser. Los que ya se
+    conciliaron no se tocan. Devuelve (borrados, conciliados_obsoletos, cuentas).
+    """
+    db.execute("CREATE TEMP TABLE IF NOT EXISTS reproceso_hashes (hash_unico BLOB PRIMARY KEY)")
+    db.execute("DELETE FROM reproceso_hashes")
+    db.executemany("INSERT OR IGNORE INTO reproceso_hashes (hash_unico) VALUES (?)", ((h,) for h in hashes))
+
+    obsoletos = """
+        FROM pagos_detectados p
+        WHERE p.archivo_id = ?
+          AND NOT EXISTS (SELECT 1 FROM reproceso_hashes t WHERE t.hash_unico = p.hash_unico)
+    """
+    libres = " AND p.estado_conciliacion = 'PENDIENTE' AND p.venta_id IS NULL"
+
+    cuentas = [
+        row[0]
+        for row in db.execute(f"SELECT DISTINCT p.cuenta_bancaria_id {obsoletos} {libres}", (archivo_id,))
+        if row[0] is not None
+    ]
+    borrados = db.execute(
+        f"DELETE FROM pagos_detectados WHERE id IN (SELECT p.id {obsoletos} {libres})",
+        (archivo_id,),
+    ).rowcount
+    conciliados = db.execute(f"SELECT COUNT(*) {obsoletos}", (archivo_id,)).fetchone()[0]
+    db.execute("DELETE FROM reproceso_hashes")
+    return borrados, conciliados, cuentas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocesa los estados de cuenta archivados.")
+    parser.add_argument("--banco", default=None, help="Solo archivos de este banco (BBVA, BANAMEX, ...)")
+    parser.add_argument("--archivo-id", type=int, default=None, help="Solo este archivos_movimientos.id")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos para normalizar")
+    parser.add_argument("--sin-conciliar", action="store_true", help="No correr la conciliación al final")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+
+    sql = """
+        SELECT id, nombre_archivo, hash_contenido, banco, archivo_crudo
+        FROM archivos_movimientos
+        WHERE archivo_crudo IS NOT NULL
+    """
+    params = []
+    if args.banco:
+        sql += " AND banco = ?"
+        params.append(args.banco.upper())
+    if args.archivo_id:
+        sql += " AND id = ?"
+        params.append(args.archivo_id)
+    archivos = conn.execute(sql + " ORDER BY id", params).fetchall()
+
+    totales = {"archivos": 0, "errores": 0, "nuevos": 0, "borrados": 0, "conciliados": 0}
+
+    def reaplicar(archivo, cuenta_archivo, registros, info):
+        # Guardamos referencia a cada registro para conocer su hash_unico después de insertar
+        vistos = []
+
+        def registrar(regs):
+            for r in regs:
+                vistos.append(r)
+                yield r
+
+        try:
+            nuevos, duplicados = guardar_lote(
+                conn, archivo["banco"], cuenta_archivo, registrar(registros),
+                archivo["nombre_archivo"], archivo["hash_contenido"], info, archivo_id=archivo["id"],
+            )
+            borrados, conciliados, cuentas = borrar_obsoletos(conn, archivo["id"], {r["hash_unico"] for r in vistos})
+            for cuenta_id in cuentas:
+                verificar_saldos(conn, cuenta_id)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            totales["errores"] += 1
+            print(f"{archivo['nombre_archivo']} (#{archivo['id']}): ERROR {e}")
+            return
+
+        totales["archivos"] += 1
+        totales["nuevos"] += nuevos
+        totales["borrados"] += borrados
+        totales["conciliados"] += conciliados
+        detalle = f" | conciliados que el parser ya no produce: {conciliados}" if conciliados else ""
+        print(
+            f"{archivo['nombre_archivo']} (#{archivo['id']}): nuevos={nuevos} "
+            f"sin cambio={duplicados} borrados={borrados}{detalle}"
+        )
+
+    en_pool = [a for a in archivos if a["banco"] in NORMALIZADORES]
+    en_streaming = [a for a in archivos if a["banco"] in FORMATOS_MULTICUENTA]
+
+    # Normalizar en paralelo; insertar en el proceso principal (SQLite tiene un solo escritor)
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futuros = {
+            pool.submit(normalizar_archivado, a["banco"], a["nombre_archivo"], a["archivo_crudo"]): a
+            for a in en_pool
+        }
+        for futuro in as_completed(futuros):
+            archivo = futuros[futuro]
+            try:
+                cuenta_archivo, registros, info = futuro.result()
+            except Exception as e:
+                totales["errores"] += 1
+                print(f"{archivo['nombre_archivo']} (#{archivo['id']}): ERROR {e}")
+                continue
+            reaplicar(archivo, cuenta_archivo, registros, info)
+
+    for archivo in en_streaming:
+        try:
+            contenido = cargar_estado(archivo["archivo_crudo"])
+        except Exception as e:
+            totales["errores"] += 1
+            print(f"{archivo['nombre_archivo']} (#{archivo['id']}): ERROR {e}")
+            continue
+        cuenta_archivo, registros, info = PARSERS[archivo["banco"]](contenido, archivo["nombre_archivo"])
+        reaplicar(archivo, cuenta_archivo, registros, info)
+
+    conn.close()
+
+    matches = 0
+    if not args.sin_conciliar:
+        matches = run_conciliacion()
+
+    print(
+        f"Archivos reprocesados: {totales['archivos']} | errores: {totales['errores']} | "
+        f"pagos nuevos: {totales['nuevos']} | borrados: {totales['borrados']} | "
+        f"conciliados a revisar: {totales['conciliados']} | "
+        f"conciliación: {matches} ventas marcadas como PAGADO"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Revisa con EXPLAIN QUERY PLAN las consultas frecuentes (listado de pagos, cierre diario,
+conciliación, Mis ventas, venta rápida...) y termina con error si alguna recorre una
+tabla completa (SCAN sin índice) o, en las paginadas, ordena con un B-tree temporal en
+lugar de seguir un índice.
+
+Por omisión usa una base en memoria con el esquema de init_db.py, así que sirve para
+revisar el esquema antes de migrar; con --db revisa una base real (ya migrada y con
+ANALYZE, el planificador puede elegir otros índices).
+
+Las consultas se importan de donde las corre la app (modules/consultas.py para las de
+app.py, constantes SQL_... de cada módulo), así que se revisa el mismo texto.
+
+Uso:
+    python verificar_planes.py [--db azyco_pagos.db] [-v]
+"""
+import argparse
+import re
+import sqlite3
+import sys
+
+from init_db import schema
+from modules.conciliacion import SQL_PAGOS_PENDIENTES, SQL_VENTAS_CANDIDATAS
+from modules.consultas import (
+    CURSOR_DESPUES,
+    SQL_CANDIDATOS_PAGO,
+    SQL_CORTE_DIA,
+    SQL_MIS_VENTAS,
+    SQL_PAGOS_DIA,
+    SQL_ULTIMA_ACTUALIZACION_CUENTA,
+    SQL_VENTAS_PENDIENTES_DIA,
+    filtros_pagos,
+    sql_conteo_pagos,
+    sql_listado_pagos,
+)
+from modules.idempotencia import SQL_LIMPIAR_CLAVES
+from modules.importacion import SQL_MARCAS
+from modules.resumen_diario import SQL_RESUMEN_DIA, SQL_TENDENCIA
+from modules.venta_rapida import SQL_DOCUMENTOS_VENTA, SQL_PAGINA_FACTURAS, _filtros_sql
+from modules.verificacion_saldos import FILTRO_CUENTA, SQL_MOVIMIENTOS
+
+# Tablas de catálogo (pocas filas) que sí se pueden recorrer completas, por nombre o alias
+TABLAS_CHICAS = {"cuentas_bancarias", "c", "usuarios", "salud_cuentas"}
+
+DIA = ("2025-01-02", "2025-01-03")
+
+
+def _listado(nombre, condiciones, params, orden_por_indice=True):
+    """Una página del listado de pagos con las condiciones de filtros_pagos."""
+    return (nombre, sql_listado_pagos(condiciones), (*params, 101), orden_por_indice)
+
+
+_WHERE_VR, _PARAMS_VR = _filtros_sql("t", {"monto_min": 100.0, "monto_max": 500.0})
+
+# (nombre, sql, params, orden_por_indice)
+CONSULTAS = [
+    _listado("listado pagos: primera página", *filtros_pagos()),
+    _listado("listado pagos: página siguiente", [CURSOR_DESPUES], ("2025-01-31", 1000)),
+    _listado("listado pagos: estado", *filtros_pagos(estado="PENDIENTE")),
+    _listado("listado pagos: banco", *filtros_pagos(banco="BBVA")),
+    _listado("listado pagos: banco y estado", *filtros_pagos(banco="BBVA", estado="PENDIENTE")),
+    _listado("listado pagos: rango de fechas", *filtros_pagos(desde="2025-01-01", hasta="2025-02-01")),
+    _listado("listado pagos: monto", *filtros_pagos(monto=100.0), orden_por_indice=False),
+    (
+        "listado pagos: conteo estimado",
+        sql_conteo_pagos(filtros_pagos(estado="REVISAR")[0]),
+        ("REVISAR", 10001),
+        False,
+    ),
+    (
+        "listado pagos: conteo estimado por banco",
+        sql_conteo_pagos(filtros_pagos(banco="BBVA")[0]),
+        ("BBVA", 10001),
+        False,
+    ),
+    (
+        "listado pagos: conteo estimado por banco y estado",
+        sql_conteo_pagos(filtros_pagos(banco="BBVA", estado="PENDIENTE")[0]),
+        ("BBVA", "PENDIENTE", 10001),
+        False,
+    ),
+    ("pago_detalle: ventas candidatas", SQL_CANDIDATOS_PAGO, (1, 99.99, 100.01), False),
+    (
+        "conciliación: pagos pendientes",
+        SQL_PAGOS_PENDIENTES.format(filtro_cuentas="AND cuenta_bancaria_id IN (?, ?)"),
+        (1, 2),
+        False,
+    ),
+    ("conciliación: ventas por cuenta y monto", SQL_VENTAS_CANDIDATAS, (1, 99.99, 100.01), False),
+    ("cierre diario: ventas pendientes del día", SQL_VENTAS_PENDIENTES_DIA, DIA, True),
+    ("cierre diario: pagos del día", SQL_PAGOS_DIA, DIA, True),
+    ("cierre diario: corte", SQL_CORTE_DIA, DIA, False),
+    ("cierre diario: resumen por cuenta", SQL_RESUMEN_DIA, ("2025-01-02",), False),
+    ("cierre diario: tendencia", SQL_TENDENCIA, ("2024-12-20", "2025-01-02"), True),
+    ("Mis ventas", SQL_MIS_VENTAS, (2,), True),
+    ("venta_detalle: última actualización de la cuenta", SQL_ULTIMA_ACTUALIZACION_CUENTA, (1,), False),
+    ("importación: primera fecha por cuenta (marcas)", SQL_MARCAS, ("BBVA",), False),
+    ("verificación de saldos: movimientos de una cuenta", SQL_MOVIMIENTOS + FILTRO_CUENTA, (1,), False),
+    (
+        "venta rápida: página de facturas",
+        SQL_PAGINA_FACTURAS.format(where=_WHERE_VR),
+        (*_PARAMS_VR, 100, 0),
+        False,
+    ),
+    ("venta rápida: documentos de una venta", SQL_DOCUMENTOS_VENTA, (1,), False),
+    ("idempotencia: limpieza por antigüedad", SQL_LIMPIAR_CLAVES, ("-24 hours",), False),
+]
+
+# Recorrido completo sin índice: "SCAN p" (SQLite 3.36+) o "SCAN TABLE pagos_detectados AS p"
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$")
+
+
+def problemas(conn, sql, params, orden_por_indice):
+    """(detalles del plan, lista de problemas encontrados)."""
+    detalles = [fila[3] for fila in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    encontrados = []
+    for detalle in detalles:
+        m = _SCAN.match(detalle)
+        if m and not TABLAS_CHICAS.intersection(m.groups()):
+            encontrados.append(f"recorre la tabla completa ({detalle})")
+        if orden_por_indice and detalle.startswith("USE TEMP B-TREE FOR"):
+            encontrados.append(f"ordena sin índice ({detalle})")
+    return detalles, encontrados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Revisa los planes de las consultas frecuentes.")
+    parser.add_argument("--db", help="Base a revisar (por omisión, el esquema de init_db.py en memoria)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Imprime el plan de cada consulta")
+    args = parser.parse_args()
+
+    if args.db:
+        conn = sqlite3.connect(args.db)
+    else:
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(schema)
+
+    fallas = 0
+    for nombre, sql, params, orden_por_indice in CONSULTAS:
+        try:
+            detalles, encontrados = problemas(conn, sql, params, orden_por_indice)
+        except sqlite3.OperationalError as e:
+            detalles, encontrados = [], [f"no se pudo revisar: {e}"]
+        fallas += bool(encontrados)
+        print(f"{'FALLA' if encontrados else 'OK   '} {nombre}")
+        for p in encontrados:
+            print(f"        {p}")
+        if args.verbose:
+            for d in detalles:
+                print(f"          {d}")
+
+    conn.close()
+    print(f"{len(CONSULTAS)} consultas, {fallas} con problemas.")
+    if fallas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()